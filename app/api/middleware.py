@@ -0,0 +1,147 @@
+import functools
+import inspect
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+from ..core.config import settings
+from ..utils.metrics import REGISTRY, REQUEST_SECONDS, REQUEST_STAGES
+from ..utils.profiling import CURRENT_PROFILE, Profile, ProfileStore, SlowRequestLog, call_profiled
+
+TRUTHY = (b"1", b"true", b"yes", b"on")
+
+
+class MetricsMiddleware:
+    """
+    Records every HTTP request in txn_http_request_seconds, labelled with the
+    route template (/transaction/{txid}, not the concrete path) so label
+    cardinality stays bounded. Plain ASGI, so streamed bodies are timed to the
+    last chunk; with metrics disabled requests pass straight through.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REGISTRY.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, scope["method"], route, str(status))
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.strip().lower() in TRUTHY
+    return any(v.lower() in TRUTHY for v in parse_qs(scope["query_string"]).get(b"profile", ()))
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in diagnostics for live traffic:
+    - with PROFILING_ENABLED, a request sent with `X-Profile: 1` (or
+      `?profile=1`) is stack-sampled while its endpoint runs; the collapsed
+      profile lands in `profiles` and its id in the X-Profile-Id header;
+    - with a non-empty `slow` log, every request's duration and per-stage
+      timings (the `stage`/`timed` timers) are offered to it.
+    Requests that need neither pass straight through.
+    """
+    def __init__(self, app, profiles: ProfileStore, slow: SlowRequestLog):
+        self.app = app
+        self.profiles = profiles
+        self.slow = slow
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = Profile(settings.PROFILE_SAMPLE_INTERVAL_S) if settings.PROFILING_ENABLED and _wants_profile(scope) else None
+        if profile is None and not self.slow.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        REGISTRY.begin_trace()
+        stages: Dict[str, float] = {}
+        stages_token = REQUEST_STAGES.set(stages)
+        profile_token = CURRENT_PROFILE.set(profile)
+        status = 500
+        started_at = datetime.now(timezone.utc)
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile is not None:
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        if profile is not None:
+            profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - t0
+            REGISTRY.end_trace()
+            if profile is not None:
+                profile.stop()
+            REQUEST_STAGES.reset(stages_token)
+            CURRENT_PROFILE.reset(profile_token)
+            record = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(scope.get("route"), "path", "unmatched"),
+                "status": status,
+                "started_at": started_at.isoformat(),
+                "duration_ms": round(duration * 1e3, 3),
+                "stages_ms": {k: round(v * 1e3, 3) for k, v in sorted(stages.items(), key=lambda kv: -kv[1])},
+                "profile_id": profile.id if profile is not None else None,
+            }
+            if profile is not None:
+                self.profiles.add({**record, "samples": profile.samples, "idle_samples": profile.idle}, profile.collapsed())
+            self.slow.offer(record)
+
+
+def _profiled(fn):
+    """Wraps an endpoint so the request's profile (if any) samples the thread running it."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def call(*args, **kwargs):
+            profile = CURRENT_PROFILE.get()
+            if profile is None:
+                return await fn(*args, **kwargs)
+            with profile.attach(sys._getframe()):
+                return await fn(*args, **kwargs)
+    else:
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            return call_profiled(fn, *args, **kwargs)
+    return call
+
+
+class ProfiledRoute(APIRoute):
+    """
+    APIRoute whose endpoint call can be profiled. Sync endpoints run in the
+    threadpool, out of sight of anything wrapped around the ASGI app, so the
+    hook sits on the endpoint itself (FastAPI reads the signature through
+    functools.wraps, so parameters and docs are unchanged).
+    """
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
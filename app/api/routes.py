@@ -1,131 +1,578 @@
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Iterator, Literal, Optional, Tuple
+import orjson
 
 from ..core.config import settings
-from ..core.store import TransactionStore
-from ..core.classifier import Agent
-from ..core.errors import NotFoundError, DataSourceError
-from fastapi import UploadFile, File
-import shutil
+from ..core.store import TransactionStore, check_export_dir
+from ..core.classifier import Agent, restamp, stuck_anchor, stuck_deadline
+from ..core.cache import DecisionCache
+from ..core.batch import BatchClassifier
+from ..core.parallel import ParallelClassifier
+from ..core.summary import GROUP_KEYS, SummaryFilters, summarize
+from ..core.stuck import StuckScanner, decode_cursor, encode_cursor
+from ..core.errors import BusyError, NotFoundError, DataSourceError
+from ..connectors.upload import staging_path, spool, upload_chunks
+from fastapi import UploadFile, File, Request
 from pathlib import Path
+from datetime import datetime, timezone
+import time
 
-router = APIRouter()
+from ..utils.logging import get_logger
+from ..utils.metrics import REGISTRY, count_rules, stage
+from ..utils.profiling import ProfileStore, SlowRequestLog
+from .middleware import ProfiledRoute
+from .workloads import WorkloadPool
+
+router = APIRouter(route_class=ProfiledRoute)
+logger = get_logger(__name__)
 
 # Ensure data dir exists
 settings.ensure_dirs()
 
 agent = Agent(settings.MAPPINGS_PATH, settings.SYNONYMS_PATH, settings.RULES_PATH)
-store = TransactionStore(settings.DUCKDB_PATH)
+store = TransactionStore(settings.DUCKDB_PATH, read_pool_size=settings.READ_POOL_SIZE, mapper=agent.mapper,
+                         keep_generations=settings.KEEP_GENERATIONS, read_timeout_s=settings.READ_TIMEOUT_S)
+engine = BatchClassifier(agent.mapper, agent.rulebook)
+parallel = ParallelClassifier(engine, settings.PARALLEL_WORKERS)
+decision_cache = DecisionCache(settings.DECISION_CACHE_SIZE, settings.DECISION_CACHE_TTL_S)
+REGISTRY.enabled = settings.METRICS_ENABLED
+profiles = ProfileStore(settings.PROFILES_KEEP)
+slow_requests = SlowRequestLog(settings.SLOW_REQUESTS_KEEP)
+# Store work runs on one sized pool per workload class, so cheap point lookups
+# never wait behind batch classification or an ingest.
+point_pool = WorkloadPool("point", settings.POINT_WORKERS, settings.POINT_QUEUE, settings.RETRY_AFTER_S)
+# An open stream waits on its client between chunks; cap them so they cannot
+# outnumber the readers point lookups need.
+batch_pool = WorkloadPool("batch", settings.BATCH_WORKERS, settings.BATCH_QUEUE, settings.RETRY_AFTER_S,
+                          streams=settings.READ_POOL_SIZE)
+ingest_pool = WorkloadPool("ingest", settings.INGEST_WORKERS, settings.INGEST_QUEUE, settings.RETRY_AFTER_S)
+workloads = (point_pool, batch_pool, ingest_pool)
+stuck_scanner = StuckScanner(
+    lambda now, since: store.stuck_counts(engine, agent.version, now, since), settings.STUCK_SCAN_INTERVAL_S
+)
+
+
+def _refresh_decisions(incremental: bool = False):
+    if settings.MATERIALIZE_DECISIONS:
+        store.materialize(engine, agent.version, incremental=incremental)
+
+
+def _refresh_decisions_later():
+    """
+    Re-materializes on the ingest pool, so the request that noticed a rules
+    change isn't held up; lookups classify live until it is done.
+    """
+    if not settings.MATERIALIZE_DECISIONS:
+        return
+
+    def refresh():
+        try:
+            _refresh_decisions()
+        except Exception as e:
+            logger.warning("decisions refresh failed, serving live classifications: %s", e)
+    try:
+        ingest_pool.submit(refresh)
+    except HTTPException:
+        logger.warning("ingest workload saturated; decisions refresh on the next reload or ingest")
+
+
+_rules_checked_at = 0.0
+
+
+def _watch_rules():
+    """
+    Picks up edited synonyms/rules files every RULES_WATCH_INTERVAL_S seconds.
+    The swap is atomic; a file that fails to load keeps the current rules live.
+    """
+    global _rules_checked_at
+    interval = settings.RULES_WATCH_INTERVAL_S
+    now = time.monotonic()
+    if interval <= 0 or now - _rules_checked_at < interval:
+        return
+    _rules_checked_at = now
+    try:
+        changed = agent.rulebook.reload_if_changed()
+    except Exception as e:
+        logger.warning("rules reload failed, keeping version %s: %s", agent.rulebook.version, e)
+        return
+    if changed:
+        logger.info("rules reloaded: version %s", agent.rulebook.version)
+        _refresh_decisions_later()
 
 
 class BatchRequest(BaseModel):
     transaction_ids: List[str]
 
 
+def _busy(e: BusyError) -> HTTPException:
+    """503 for a call that timed out waiting for a reader (see READ_TIMEOUT_S)."""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(settings.RETRY_AFTER_S)})
+
+
+def _request_ids(req: BatchRequest) -> List[str]:
+    ids = [str(x).strip() for x in req.transaction_ids if str(x).strip()]
+    if not ids:
+        raise HTTPException(status_code=400, detail="transaction_ids is empty")
+    return ids
+
+
 @router.get("/health")
 def health():
     return {"ok": True}
 
 
 @router.post("/ingest")
-def ingest(data_path: str = Query(..., description="Path to CSV/JSON/NDJSON/Parquet")):
+async def ingest(
+    data_path: List[str] = Query(..., description="CSV/JSON/NDJSON/Parquet file, directory or glob; repeatable"),
+    mode: Literal["replace", "upsert"] = Query("replace", description="replace the table, or upsert by transaction_id"),
+    partition_dir: Optional[str] = Query(None, description="also write the table as Parquet partitioned by provider/date "
+                                                           "into this directory under EXPORT_ROOT"),
+):
+    out_dir = _export_dir(partition_dir) if partition_dir else None
+    return await ingest_pool.run(_ingest, data_path, mode, out_dir)
+
+
+def _export_dir(name: str) -> Path:
+    """`name` resolved under EXPORT_ROOT; a path escaping it or holding other data is a 400."""
+    root = Path(settings.EXPORT_ROOT).resolve()
+    out_dir = (root / name).resolve()
+    if out_dir == root or not out_dir.is_relative_to(root):
+        raise HTTPException(status_code=400, detail=f"partition_dir must be a directory under {settings.EXPORT_ROOT}")
     try:
-        store.ingest(data_path)
-        return {"ok": True, "stats": store.stats()}
+        return check_export_dir(out_dir)
+    except DataSourceError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _ingest(data_path: List[str], mode: str, out_dir: Optional[Path]):
+    try:
+        result = store.ingest(data_path, mode=mode)
+        _refresh_decisions(incremental=mode == "upsert")
+        if out_dir is not None:
+            result["partitioned"] = store.export_partitioned(str(out_dir))
+        return {"ok": True, "ingest": result, "stats": store.stats()}
     except DataSourceError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ingest failed: {e}")
 
 
+@router.post("/admin/reload")
+async def admin_reload():
+    """
+    Recompiles status_synonyms.yaml + rules.yaml and swaps them in atomically.
+    Stored decisions computed under the previous rules are invalidated.
+    """
+    return await ingest_pool.run(_reload)
+
+
+def _reload():
+    before = agent.rulebook.version
+    try:
+        agent.rulebook.load()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Reload failed, rules {before} still active: {e}")
+    changed = agent.rulebook.version != before
+    # Also rebuilds decisions left stale by a watched reload whose refresh never ran.
+    if changed or store.decisions_version() != agent.version:
+        _refresh_decisions()
+    return {"ok": True, "changed": changed, "rules_version": agent.rulebook.version, "previous_version": before}
+
+
+@router.get("/admin/generations")
+def admin_generations():
+    """Kept generations of the transactions table; `live` is the one being served."""
+    return {"generations": store.generations()}
+
+
+@router.post("/admin/rollback")
+async def admin_rollback(generation: Optional[int] = Query(None, description="kept generation to serve; default: the previous one")):
+    """
+    Swaps a kept generation back in (upserts since it was built are not carried over).
+    Cached and stored decisions of the replaced generation are dropped.
+    """
+    return await ingest_pool.run(_rollback, generation)
+
+
+def _rollback(generation: Optional[int]):
+    try:
+        result = store.rollback(generation=generation)
+    except NotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    _refresh_decisions()
+    return {"ok": True, "rollback": result, "stats": store.stats()}
+
+
 @router.get("/transaction/{txid}")
-def get_transaction(txid: str):
+async def get_transaction(
+    txid: str,
+    include_raw: bool = Query(False, description="also return every stored column of the row under `raw`"),
+):
+    return await point_pool.run(_get_transaction, txid, include_raw)
+
+
+def _get_transaction(txid: str, include_raw: bool):
+    _watch_rules()
+    generation, version = store.generation, agent.version
+    row = None
     try:
-        row = store.lookup(txid)
-        decision = agent.evaluate(row)
-        return decision.model_dump()
+        cached = decision_cache.get(txid, generation, version)
+        if cached is not None:
+            decision, anchor = cached
+            decision = restamp(decision, anchor, agent.rulebook)
+        else:
+            stored = store.lookup_decision(txid, version) if settings.MATERIALIZE_DECISIONS else None
+            if stored is not None:
+                decision, anchor = stored
+                decision = restamp(decision, anchor, agent.rulebook)
+            else:
+                # Only the mapped columns are fetched unless the client wants the raw row anyway.
+                row = store.lookup(txid, include_raw=include_raw)
+                decision = agent.evaluate(row, store.sources())
+                anchor = stuck_anchor(decision)
+            decision_cache.put(txid, generation, version, decision, anchor,
+                               stuck_deadline(decision, anchor, agent.rulebook))
+        # Once per decision served, whether cached, stored or just computed.
+        count_rules((decision.rules_fired,))
+        with stage("serialize"):
+            out = decision.model_dump()
+            if include_raw:
+                out["raw"] = row if row is not None else store.lookup(txid, include_raw=True)
+            return JSONResponse(jsonable_encoder(out))
     except NotFoundError:
         raise HTTPException(status_code=404, detail="Transaction not found")
+    except BusyError as e:
+        raise _busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/admin/cache")
+def cache_stats():
+    """
+    Decision cache counters for tuning DECISION_CACHE_SIZE / DECISION_CACHE_TTL_S.
+    """
+    return {**decision_cache.stats(), "generation": store.generation, "version": agent.version}
+
+
+def _cache_samples(key: str):
+    return [({}, decision_cache.stats()[key])]
+
+
+REGISTRY.collector("txn_decision_cache_size", "gauge", "Entries in the decision cache.",
+                   lambda: _cache_samples("size"))
+for _key in ("hits", "misses", "evictions", "expirations", "invalidations"):
+    REGISTRY.collector(f"txn_decision_cache_{_key}_total", "counter", f"Decision cache {_key}.",
+                       lambda key=_key: _cache_samples(key))
+
+
+def _workload_samples(key: str):
+    return [({"workload": pool.name}, pool.stats()[key]) for pool in workloads]
+
+
+REGISTRY.collector("txn_workload_running", "gauge", "Calls running on each workload pool.",
+                   lambda: _workload_samples("running"))
+REGISTRY.collector("txn_workload_queued", "gauge", "Calls waiting for a workload pool thread.",
+                   lambda: _workload_samples("queued"))
+REGISTRY.collector("txn_workload_rejected_total", "counter", "Calls refused with 503 because the pool was full.",
+                   lambda: _workload_samples("rejected"))
+
+
+@router.get("/admin/workloads")
+def workloads_stats():
+    """
+    Per workload pool (point / batch / ingest): threads, queue limit, calls
+    running and queued now, and how many were refused with 503 or completed.
+    """
+    return {pool.name: pool.stats() for pool in workloads}
+
+
+@router.get("/metrics")
+def metrics():
+    """
+    Prometheus text exposition: txn_stage_seconds and txn_http_request_seconds
+    histograms, rows ingested, rules fired and decision cache counters.
+    Timings and counters are only collected with METRICS_ENABLED.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/admin/slow-requests")
+def slow_requests_list():
+    """
+    The SLOW_REQUESTS_KEEP slowest requests since the last clear, slowest first,
+    with time per stage (nested stages overlap, so they need not add up).
+    """
+    return {"keep": slow_requests.keep, "requests": slow_requests.snapshot()}
+
+
+@router.delete("/admin/slow-requests")
+def slow_requests_clear():
+    slow_requests.clear()
+    return {"status": "cleared"}
+
+
+@router.get("/admin/profiles")
+def profiles_list():
+    """Recent profiled requests (send `X-Profile: 1` with PROFILING_ENABLED), newest first."""
+    return {"enabled": settings.PROFILING_ENABLED, "profiles": profiles.list()}
+
+
+@router.get("/admin/profiles/{profile_id}")
+def profile_get(profile_id: str):
+    """Collapsed stacks ("frame;frame;... samples"), ready for flamegraph.pl or speedscope."""
+    collapsed = profiles.get(profile_id)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(collapsed)
+
+
 @router.post("/transactions/status")
-def batch_status(req: BatchRequest):
+async def batch_status(req: BatchRequest):
     """
     Batch status lookup for many transaction IDs.
-    Uses one SQL query (fast) and then classifies each returned row.
+    Uses one SQL query (fast) that both fetches and classifies the returned rows.
     """
-    ids = [str(x).strip() for x in req.transaction_ids if str(x).strip()]
-    if not ids:
-        raise HTTPException(status_code=400, detail="transaction_ids is empty")
+    return await batch_pool.run(_batch_status, _request_ids(req))
+
+
+def _batch_status(ids: List[str]):
+    _watch_rules()
 
     try:
-        # placeholders = ",".join(["?"] * len(ids))
-        # q = f"SELECT * FROM txns WHERE CAST(transaction_id AS VARCHAR) IN ({placeholders})"
+        found_ids = set()
+        found = 0
+        parts: List[bytes] = []
+        query = store.ids_query()  # before borrowing: it may read the catalog on a cold cache
+        sources = store.sources()
+        with store.reader() as cur:
+            for txids, part in _classify_encoded(cur, query, ids, sources):
+                found_ids.update(txids)
+                found += len(txids)
+                if part:
+                    parts.append(part)
 
-        # cur = store.con.execute(q, ids)
-        # rows = cur.fetchall()
+        missing = [txid for txid in ids if txid not in found_ids]
 
-        # cols = [d[0] for d in cur.description]
-        store.con.execute("CREATE TEMP TABLE req_ids(txid VARCHAR)")
-        store.con.executemany("INSERT INTO req_ids VALUES (?)",[(x,) for x in ids])
-        cur = store.con.execute("""
-            SELECT t.*
-            FROM txns t
-            JOIN req_ids r
-              ON CAST(t.transaction_id AS VARCHAR) = r.txid
-        """)
+        # Records serialize straight to JSON; no per-result pydantic model or encoder pass.
+        with stage("serialize"):
+            head = orjson.dumps({
+                "requested": len(ids),
+                "found": found,
+                "missing": missing[:1000],  # safety limit to avoid huge responses
+            })
+            body = head[:-1] + b',"results":[' + b",".join(parts) + b"]}"
+        return Response(content=body, media_type="application/json")
 
-        rows = cur.fetchall()
-        cols = [d[0] for d in cur.description]
+    except BusyError as e:
+        raise _busy(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-# Cleanup
-        store.con.execute("DROP TABLE req_ids")
-        
 
+def _classify_encoded(cur, query: str, ids: List[str],
+                      sources: Dict[str, str]) -> Iterator[Tuple[List[str], bytes]]:
+    """
+    (transaction_ids, comma-joined decision JSON) chunks for `ids` (bound to
+    the store's ids_query `query`, traced back to its `sources`). At or above
+    PARALLEL_BATCH_THRESHOLD ids the rows are decoded and encoded in worker processes.
+    """
+    threshold = settings.PARALLEL_BATCH_THRESHOLD
+    if threshold and len(ids) >= threshold and parallel.workers > 1:
+        yield from parallel.iter_encoded(cur, query, [ids], sep=b",", sources=sources)
+        return
+    decisions = engine.classify(cur, query, [ids], sources=sources)
+    with stage("serialize"):
+        body = b",".join(d.to_json() for d in decisions)
+    yield [d.transaction_id for d in decisions], body
 
-        results: List[Dict[str, Any]] = []
-        found_ids = set()
 
-        for r in rows:
-            row_dict = dict(zip(cols, r))
-            d = agent.evaluate(row_dict)
-            results.append(d.model_dump())
-            found_ids.add(d.transaction_id)
+@router.post("/transactions/status/stream")
+async def batch_status_stream(req: BatchRequest):
+    """
+    Streaming variant of /transactions/status for very large ID sets.
+    Emits one decision per line (application/x-ndjson) as each fetched chunk is
+    classified, then a trailing {"summary": {requested, found, missing}} line.
+    """
+    ids = _request_ids(req)
+    return StreamingResponse(batch_pool.stream(_stream_decisions(ids)), media_type="application/x-ndjson")
+
+
+def _stream_decisions(ids: List[str]) -> Iterator[bytes]:
+    _watch_rules()
+    found_ids = set()
+    found = 0
+    try:
+        query, sources = store.ids_query(), store.sources()
+        size = engine.chunk_size
+        for start in range(0, len(ids), size):
+            # A reader per chunk, returned before the yield: a client that reads
+            # slowly (or stops) never keeps one from point lookups.
+            with store.reader() as cur:
+                decisions = engine.classify(cur, query, [ids[start:start + size]], sources=sources)
+            if not decisions:
+                continue
+            found_ids.update(d.transaction_id for d in decisions)
+            found += len(decisions)
+            yield b"\n".join(d.to_json() for d in decisions) + b"\n"
+    except Exception as e:
+        # Headers are already sent; report the failure in-band instead of a 500.
+        yield orjson.dumps({"error": str(e)}) + b"\n"
+        return
+
+    missing = [txid for txid in ids if txid not in found_ids]
+    yield orjson.dumps({"summary": {"requested": len(ids), "found": found, "missing": missing[:1000]}}) + b"\n"
 
-        missing = [txid for txid in ids if txid not in found_ids]
 
-        return {
-            "requested": len(ids),
-            "found": len(results),
-            "missing": missing[:1000],  # safety limit to avoid huge responses
-            "results": results
-        }
+@router.get("/transactions/summary")
+async def transactions_summary(
+    provider: Optional[List[str]] = Query(None, description="only these providers (repeatable)"),
+    currency: Optional[List[str]] = Query(None, description="only these currencies (repeatable)"),
+    created_after: Optional[datetime] = Query(None),
+    created_before: Optional[datetime] = Query(None),
+    updated_after: Optional[datetime] = Query(None),
+    updated_before: Optional[datetime] = Query(None),
+    last_minutes: Optional[int] = Query(None, ge=1, description="last activity (updated_at, else created_at) within N minutes"),
+    group_by: List[Literal[GROUP_KEYS]] = Query(list(GROUP_KEYS)),
+):
+    """
+    Counts, amount sums and amount percentiles per provider / currency / status.
+    Classification runs inside one DuckDB GROUP BY; no row is classified in Python.
+    """
+    filters = SummaryFilters(
+        provider=provider or [],
+        currency=currency or [],
+        created_after=created_after,
+        created_before=created_before,
+        updated_after=updated_after,
+        updated_before=updated_before,
+        last_minutes=last_minutes,
+    )
+    return await batch_pool.run(_summary, filters, group_by)
+
 
+def _summary(filters: SummaryFilters, group_by: List[str]):
+    _watch_rules()
+    try:
+        with store.reader() as cur:
+            return summarize(engine, cur, "txns", filters, group_by)
+    except BusyError as e:
+        raise _busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/ingest/upload")
-def ingest_upload(file: UploadFile = File(...)):
+def _utc(dt: datetime) -> str:
+    return dt.replace(tzinfo=timezone.utc).isoformat()
+
+
+@router.get("/transactions/stuck")
+async def transactions_stuck(
+    limit: int = Query(1000, ge=1, le=10_000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    provider: Optional[List[str]] = Query(None, description="only these providers (repeatable)"),
+):
     """
-    Upload a data file (CSV/JSON/NDJSON/Parquet), save it, then ingest.
+    Transactions that are STUCK now, oldest first, with keyset pagination.
+    Served from a stuck_at-sorted index of non-final rows (per-provider
+    thresholds applied), so no table-wide classification runs per request.
     """
     try:
-        settings.ensure_dirs()
-        upload_dir = Path("data") / "uploads"
-        upload_dir.mkdir(parents=True, exist_ok=True)
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await batch_pool.run(_stuck, limit, after, provider)
+
 
-        dest = upload_dir / file.filename
-        with dest.open("wb") as f:
-            shutil.copyfileobj(file.file, f)
+def _stuck(limit: int, after: Optional[Tuple[datetime, str]], provider: Optional[List[str]]):
+    _watch_rules()
+    now = datetime.now(timezone.utc)
+    try:
+        rows, total = store.stuck(engine, agent.version, now, limit, after, provider)
+    except BusyError as e:
+        raise _busy(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    next_cursor = encode_cursor(rows[-1]["stuck_at"], rows[-1]["transaction_id"]) if len(rows) == limit else None
+    for r in rows:
+        r["last_activity"] = _utc(r["last_activity"])
+        r["stuck_at"] = _utc(r["stuck_at"])
+    return {"as_of": now.isoformat(), "total": total, "count": len(rows), "items": rows, "next_cursor": next_cursor}
+
+
+@router.get("/transactions/stuck/scan")
+async def stuck_scan():
+    """
+    Latest background scan (STUCK per provider, newly stuck since the previous
+    scan). Runs a scan on demand when STUCK_SCAN_INTERVAL_S is 0.
+    """
+    last = stuck_scanner.last if stuck_scanner.enabled else None
+    if last is None:
+        last = await batch_pool.run(stuck_scanner.run_once)
+    return {"interval_s": stuck_scanner.interval, "last": last}
 
-        store.ingest(str(dest))
-        return {"ok": True, "saved_as": str(dest), "stats": store.stats()}
 
+@router.post("/ingest/upload")
+async def ingest_upload(
+    file: UploadFile = File(...),
+    mode: Literal["replace", "upsert"] = Query("replace", description="replace the table, or upsert by transaction_id"),
+):
+    """
+    Upload a data file (CSV/JSON/NDJSON/Parquet, text formats optionally .gz/.zst), then ingest.
+    The file is staged under a unique name and removed once ingested.
+    """
+    ingest_pool.check()
+    dest = staging_path(file.filename)
+    try:
+        size = await spool(upload_chunks(file), dest)
+        return await _ingest_staged(dest, file.filename, size, mode)
+    except HTTPException:
+        raise
     except DataSourceError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload ingest failed: {e}")
+    finally:
+        dest.unlink(missing_ok=True)
+
+
+@router.post("/ingest/stream")
+async def ingest_stream(
+    request: Request,
+    filename: str = Query(..., description="Original file name; its suffix selects the format, e.g. hourly.ndjson.gz"),
+    mode: Literal["replace", "upsert"] = Query("replace", description="replace the table, or upsert by transaction_id"),
+):
+    """
+    Ingest a raw (non-multipart) request body streamed in chunks. Send gzip/zstd
+    bodies either with a .gz/.zst filename or a Content-Encoding header; DuckDB
+    decompresses while reading, so the body is written to disk once, still compressed.
+    """
+    ingest_pool.check()
+    dest = staging_path(filename, request.headers.get("content-encoding"))
+    try:
+        size = await spool(request.stream(), dest)
+        return await _ingest_staged(dest, filename, size, mode)
+    except HTTPException:
+        raise
+    except DataSourceError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Stream ingest failed: {e}")
+    finally:
+        dest.unlink(missing_ok=True)
+
+
+async def _ingest_staged(dest: Path, filename: str, size: int, mode: str) -> Dict[str, Any]:
+    # DuckDB work is blocking; keep it off the event loop.
+    result, stats = await ingest_pool.run(_ingest_file, str(dest), mode)
+    return {"ok": True, "filename": filename, "bytes": size, "ingest": result, "stats": stats}
+
+
+def _ingest_file(path: str, mode: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    result = store.ingest(path, mode=mode)
+    _refresh_decisions(incremental=mode == "upsert")
+    return result, store.stats()
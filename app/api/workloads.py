@@ -0,0 +1,164 @@
+import asyncio
+import contextvars
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from ..utils.profiling import call_profiled
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class WorkloadPool:
+    """
+    Dedicated threads for one class of blocking store work (point lookups,
+    batch classification, ingest), so a burst of slow calls in one class never
+    queues the others. At most `workers` calls run and `queue` more wait; past
+    that a call is refused at once with 503 + Retry-After instead of waiting.
+    Open streams hold a slot while their client reads, and at most `streams`
+    are open at once (None = as many as there are slots).
+
+    Work runs in a copy of the caller's context, so stage timings and the
+    request's profile follow it onto the pool thread.
+    """
+    def __init__(self, name: str, workers: int, queue: int, retry_after_s: int = 1,
+                 streams: Optional[int] = None):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue = max(0, queue)
+        self.retry_after_s = retry_after_s
+        self.streams = None if streams is None else max(1, streams)
+        self.rejected = 0
+        self.completed = 0
+        self._pending = 0
+        self._streaming = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue
+
+    def _refuse(self, detail: Optional[str] = None) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(
+            status_code=503,
+            detail=detail or f"{self.name} workload saturated ({self.capacity} calls admitted), retry later",
+            headers={"Retry-After": str(self.retry_after_s)},
+        )
+
+    def check(self):
+        """Raises the 503 now if a call would be refused (e.g. before spooling an upload)."""
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise self._refuse()
+
+    def _admit(self, stream: bool = False):
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise self._refuse()
+            if stream and self.streams is not None and self._streaming >= self.streams:
+                raise self._refuse(f"{self.name} workload has {self.streams} streams open, retry later")
+            self._pending += 1
+            self._streaming += stream
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=f"workload-{self.name}")
+            return self._executor
+
+    def _release(self, _future=None, stream: bool = False):
+        with self._lock:
+            self._pending -= 1
+            self._streaming -= stream
+            self.completed += 1
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> "Future[T]":
+        """Queues fn(*args, **kwargs) on this pool without waiting; the slot is freed when it finishes."""
+        executor = self._admit()
+        try:
+            ctx = contextvars.copy_context()
+            future = executor.submit(ctx.run, call_profiled, fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """fn(*args, **kwargs) on this pool; the slot is freed when it finishes, even if the client left."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stream(self, chunks: Iterator[T]) -> AsyncIterator[T]:
+        """
+        Admits `chunks` (a blocking generator) now and returns an async iterator
+        that pulls each chunk on this pool; the slot is held until it is exhausted
+        or closed, e.g. when a streaming client disconnects. An iterator that is
+        never started (the client left before the body was sent) frees the slot
+        when it is dropped.
+        """
+        executor = self._admit(stream=True)
+        release = self._release_once()
+        drain = self._drain(executor, contextvars.copy_context(), chunks, release)
+        weakref.finalize(drain, release)
+        return drain
+
+    def _release_once(self) -> Callable[[], None]:
+        """_release for one admission, safe to call from both the stream and its finalizer."""
+        held = [True]
+        lock = threading.Lock()
+
+        def release():
+            with lock:
+                if not held[0]:
+                    return
+                held[0] = False
+            self._release(stream=True)
+        return release
+
+    async def _drain(self, executor: ThreadPoolExecutor, ctx: contextvars.Context,
+                     chunks: Iterator[T], release: Callable[[], None]) -> AsyncIterator[T]:
+        future = None
+        try:
+            while True:
+                future = executor.submit(ctx.run, call_profiled, next, chunks, _DONE)
+                chunk = await asyncio.wrap_future(future)
+                if chunk is _DONE:
+                    return
+                yield chunk
+        finally:
+            # Not awaited: a cancelled stream cannot wait here. The close queues
+            # behind a chunk still being pulled, and only then is the slot freed.
+            executor.submit(self._close, future, chunks, release)
+
+    def _close(self, pulling, chunks: Iterator[Any], release: Callable[[], None]):
+        try:
+            if pulling is not None:
+                pulling.exception()
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+        finally:
+            release()
+
+    def stats(self) -> Dict[str, Any]:
+        pending = self._pending
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue,
+            "running": min(pending, self.workers),
+            "queued": max(0, pending - self.workers),
+            "streaming": self._streaming,
+            "rejected": self.rejected,
+            "completed": self.completed,
+        }
+
+    def shutdown(self):
+        """Stops the threads once running work is done; the next call starts new ones."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=False)
@@ -1,27 +1,106 @@
+import glob
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 import duckdb
 from ..core.errors import DataSourceError
 
 SUPPORTED = {".csv", ".json", ".ndjson", ".parquet"}
+# Text formats may arrive compressed; DuckDB decompresses them while scanning.
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}
+
+def file_format(path: str) -> Tuple[str, Optional[str]]:
+    """
+    Returns (format extension, compression) for e.g. 'a.csv' or 'a.ndjson.gz'.
+    """
+    suffixes = [s.lower() for s in Path(path).suffixes]
+    if suffixes and suffixes[-1] in COMPRESSIONS:
+        return (suffixes[-2] if len(suffixes) > 1 else ""), COMPRESSIONS[suffixes[-1]]
+    return (suffixes[-1] if suffixes else ""), None
 
 def _ext(path: str) -> str:
-    return Path(path).suffix.lower()
+    return file_format(path)[0]
 
 def validate_path(path: str):
     p = Path(path)
     if not p.exists():
         raise DataSourceError(f"Data file not found: {path}")
-    if _ext(path) not in SUPPORTED:
-        raise DataSourceError(f"Unsupported file type {_ext(path)}. Supported: {sorted(SUPPORTED)}")
+    ext, compression = file_format(path)
+    if ext not in SUPPORTED:
+        raise DataSourceError(f"Unsupported file type {ext}. Supported: {sorted(SUPPORTED)}")
+    if compression and ext == ".parquet":
+        raise DataSourceError("Parquet files are compressed internally; upload them uncompressed")
+
+def _supported(path: str) -> bool:
+    ext, compression = file_format(path)
+    return ext in SUPPORTED and not (compression and ext == ".parquet")
+
+def resolve_sources(spec: Union[str, Sequence[str]]) -> List[str]:
+    """
+    Expands a file, directory (searched recursively), glob, or a list of any
+    of these into a sorted, de-duplicated list of validated data files.
+    """
+    specs = [spec] if isinstance(spec, str) else list(spec)
+    files: List[str] = []
+    for s in specs:
+        p = Path(s)
+        if p.is_dir():
+            matches = [str(f) for f in p.rglob("*") if f.is_file() and _supported(str(f))]
+            if not matches:
+                raise DataSourceError(f"No supported data files under directory: {s}")
+        elif glob.has_magic(s):
+            matches = [f for f in glob.glob(s, recursive=True) if Path(f).is_file()]
+            if not matches:
+                raise DataSourceError(f"No files match: {s}")
+        else:
+            matches = [s]
+        for f in matches:
+            validate_path(f)
+        files.extend(matches)
+    if not files:
+        raise DataSourceError("No data files given")
+    return sorted(set(files))
 
-def duckdb_relation(con: duckdb.DuckDBPyConnection, path: str):
-    ext = _ext(path)
+def _quote(path: str) -> str:
+    return "'" + path.replace("'", "''") + "'"
+
+def _reader(ext: str, compression: Optional[str], paths: List[str]) -> str:
+    many = len(paths) > 1
+    files = "[" + ", ".join(_quote(p) for p in paths) + "]" if many else _quote(paths[0])
+    # Files are read in parallel by DuckDB; union_by_name tolerates columns drifting between them.
+    opts = ", union_by_name=true" if many else ""
+    opts += f", compression='{compression}'" if compression else ""
     if ext == ".csv":
-        return con.from_query(f"SELECT * FROM read_csv_auto('{path}', HEADER=TRUE)")
+        return f"SELECT * FROM read_csv_auto({files}, HEADER=TRUE{opts})"
     if ext == ".parquet":
-        return con.from_query(f"SELECT * FROM read_parquet('{path}')")
+        hive = any("=" in part for p in paths for part in Path(p).parent.parts)
+        return f"SELECT * FROM read_parquet({files}{opts}{', hive_partitioning=true' if hive else ''})"
     if ext == ".ndjson":
-        return con.from_query(f"SELECT * FROM read_json_auto('{path}', format='newline_delimited')")
+        return f"SELECT * FROM read_json_auto({files}, format='newline_delimited'{opts})"
     if ext == ".json":
-        return con.from_query(f"SELECT * FROM read_json_auto('{path}')")
+        return f"SELECT * FROM read_json_auto({files}{opts})"
     raise DataSourceError(f"Unsupported file type: {ext}")
+
+def duckdb_relation(con: duckdb.DuckDBPyConnection, path: Union[str, Sequence[str]],
+                    canonical: Optional[Callable[[duckdb.DuckDBPyRelation], duckdb.DuckDBPyRelation]] = None):
+    """
+    One relation over one or many files. Files of the same format and columns
+    share one multi-file reader; the groups are combined with UNION ALL BY NAME.
+
+    `canonical` (e.g. SchemaMapper.map_batch) renames each group's columns
+    before the union, so files naming a field differently (tx_id in one,
+    transaction_id in the next) still land in one column.
+    """
+    paths = [path] if isinstance(path, str) else list(path)
+    groups: Dict[Tuple[str, str, Tuple[str, ...]], List[str]] = {}
+    for p in paths:
+        ext, comp = file_format(p)
+        # Only a rename needs the columns; reading them is a header sniff / footer read per file.
+        columns = tuple(con.from_query(_reader(ext, comp, [p])).columns) if canonical and len(paths) > 1 else ()
+        groups.setdefault((ext, comp or "", columns), []).append(p)
+    rels = []
+    for (ext, comp, _), ps in sorted(groups.items()):
+        rel = con.from_query(_reader(ext, comp or None, ps))
+        rels.append(canonical(rel) if canonical else rel)
+    if len(rels) == 1:
+        return rels[0]
+    return con.from_query(" UNION ALL BY NAME ".join(f"({r.sql_query()})" for r in rels))
@@ -0,0 +1,56 @@
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from .loader import COMPRESSIONS, file_format
+
+UPLOAD_DIR = Path("data") / "uploads"
+CHUNK_SIZE = 1 << 20
+
+ENCODING_SUFFIX = {v: k for k, v in COMPRESSIONS.items()}
+
+
+def staging_path(filename: Optional[str], content_encoding: Optional[str] = None) -> Path:
+    """
+    A fresh, uniquely named file under data/uploads that keeps the format (and
+    compression) suffix of `filename`, so concurrent uploads never overwrite each other.
+    A gzip/zstd Content-Encoding is kept as a suffix instead of being decoded here.
+    The client's name survives only as [A-Za-z0-9_-], so the staged path is never
+    read as a glob (by resolve_sources or DuckDB).
+    """
+    name = Path(filename or "upload").name
+    ext, compression = file_format(name)
+    suffix = ext + (ENCODING_SUFFIX[compression] if compression else "")
+    if compression is None and content_encoding in ENCODING_SUFFIX:
+        suffix += ENCODING_SUFFIX[content_encoding]
+
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    prefix = re.sub(r"[^A-Za-z0-9_-]", "", name.split(".")[0]) or "upload"
+    fd, path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=prefix + "-", suffix=suffix)
+    os.close(fd)
+    return Path(path)
+
+
+async def upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def spool(chunks: AsyncIterator[bytes], dest: Path) -> int:
+    """
+    Writes an async byte stream to dest without holding it in memory; returns bytes written.
+    """
+    written = 0
+    with dest.open("wb") as f:
+        async for chunk in chunks:
+            await run_in_threadpool(f.write, chunk)
+            written += len(chunk)
+    return written
@@ -0,0 +1,437 @@
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import duckdb
+
+from .classifier import (
+    classify_record, R_MISSING, R_HARD_FAIL, R_SUCCESS, R_FAILED, R_FAILED_ERR,
+    R_ERROR_IMPLIES, R_SKIPPED, R_STUCK, R_NON_FINAL, R_UNKNOWN,
+)
+from .decision import DecisionRecord
+from .mapper import SchemaMapper, source_trace
+from .rules import CompiledRules, RuleBook
+from ..utils.metrics import count_rules, stage
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+INT_TYPES = {
+    "TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT",
+    "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT", "UHUGEINT",
+}
+NUM_TYPES = INT_TYPES | {"FLOAT", "DOUBLE"}
+
+# Strings DuckDB and datetime.fromisoformat agree on: ISO-8601 with a UTC (or no)
+# offset after the time. Year 0000 and 24:00 are left to parse_dt, which rejects them.
+ISO_UTC = (r"(\d{3}[1-9]|\d{2}[1-9]\d|\d[1-9]\d{2}|[1-9]\d{3})-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])"
+           r"([T ]([01]\d|2[0-3]):[0-5]\d(:[0-5]\d(\.\d{1,6})?)?(Z|[+-]00:?00)?)?")
+UTC_SUFFIX = r"(Z|[+-]00:?00)$"
+OFFSET_SUFFIX = r"(Z|[+-]\d{2}:?\d{2})$"
+# DuckDB's TIMESTAMPTZ cast wants seconds before an offset: 11:45+05:00 -> 11:45:00+05:00.
+NO_SECONDS = r"^(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2})([Z+-])"
+PRINTABLE = r"[ -~]*"
+
+# branch -> (status, confidence, reason) in SQL, rules_fired below; mirrors classify_raw top to bottom.
+MISSING, HARD_FAIL, SUCCESS, FAILED, FAILED_ERR, ERROR_IMPLIES, SKIPPED, STUCK, NON_FINAL, UNKNOWN, UNKNOWN_EMPTY = range(11)
+
+BRANCH_RULES = {
+    MISSING: R_MISSING,
+    HARD_FAIL: R_HARD_FAIL,
+    SUCCESS: R_SUCCESS,
+    FAILED: R_FAILED,
+    FAILED_ERR: R_FAILED_ERR,
+    ERROR_IMPLIES: R_ERROR_IMPLIES,
+    SKIPPED: R_SKIPPED,
+    STUCK: R_STUCK,
+    NON_FINAL: R_NON_FINAL,
+    UNKNOWN: R_UNKNOWN,
+    UNKNOWN_EMPTY: R_UNKNOWN,
+}
+
+
+def _ident(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _lit(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _in(expr: str, values) -> str:
+    values = sorted(values)
+    if not values:
+        return "FALSE"
+    return f"{expr} IN ({', '.join(_lit(v) for v in values)})"
+
+
+def timestamp_sql(col: str, typ: Optional[str]) -> Optional[str]:
+    """
+    Naive UTC TIMESTAMP expression for `col` of type `typ` that agrees with
+    parse_dt() on every value it does not leave NULL, or None for a type SQL
+    can't read. Fast-path strings drop their UTC suffix (DuckDB rejects e.g.
+    11:45Z); offset strings are given their true instant.
+    """
+    if typ == "TIMESTAMP":
+        return col
+    if typ == "TIMESTAMP WITH TIME ZONE":
+        return f"timezone('UTC', {col})"
+    if typ == "DATE":
+        return f"CAST({col} AS TIMESTAMP)"
+    if typ == "VARCHAR":
+        return (f"CASE WHEN regexp_full_match({col}, {_lit(ISO_UTC)})"
+                f" THEN TRY_CAST(regexp_replace({col}, {_lit(UTC_SUFFIX)}, '') AS TIMESTAMP)"
+                f" WHEN regexp_matches({col}, {_lit(OFFSET_SUFFIX)})"
+                f" THEN timezone('UTC', TRY_CAST(regexp_replace({col}, {_lit(NO_SECONDS)}, '\\1:00\\2') AS TIMESTAMPTZ))"
+                f" ELSE TRY_CAST({col} AS TIMESTAMP) END")
+    return None
+
+
+def _truthy(expr: str, typ: str) -> Optional[str]:
+    """SQL for Python truthiness of a fetched value, or None if not expressible."""
+    if typ == "VARCHAR":
+        return f"coalesce({expr} <> '', FALSE)"
+    if typ in NUM_TYPES or typ.startswith("DECIMAL"):
+        return f"coalesce({expr} <> 0, FALSE)"
+    if typ == "BOOLEAN":
+        return f"coalesce({expr}, FALSE)"
+    return None
+
+
+class _Plan:
+    """
+    A RuleBook + SchemaMapper compiled against one source schema.
+    """
+    def __init__(self, mapper: SchemaMapper, rulebook: CompiledRules, types: Dict[str, str],
+                 sources: Optional[Dict[str, str]] = None):
+        self.rulebook = rulebook
+        self.trace = dict(mapper.compile(types.keys()).trace)
+        # What decisions report: the columns as ingested, not as renamed by the store.
+        self.source_trace = source_trace(self.trace, sources)
+        self.fields = list(self.trace.items())  # (canonical, source column), map_row order
+        self.types = {c: types[src] for c, src in self.fields}
+        self.select, self.fallback = self._compile()
+
+    def _col(self, canonical: str) -> Optional[str]:
+        src = self.trace.get(canonical)
+        return _ident(src) if src is not None else None
+
+    def _timestamp(self, canonical: str, fallback: List[str]) -> str:
+        """Naive UTC TIMESTAMP expression matching parse_dt() for one field."""
+        col, typ = self._col(canonical), self.types.get(canonical)
+        if col is None:
+            return "NULL::TIMESTAMP"
+        if typ == "VARCHAR":
+            # Offset strings that fall back still get their true instant, for summarize().
+            fallback.append(f"coalesce({col} <> '' AND NOT regexp_full_match({col}, {_lit(ISO_UTC)}), FALSE)")
+        expr = timestamp_sql(col, typ)
+        if expr is None:
+            fallback.append(f"{col} IS NOT NULL")
+            return "NULL::TIMESTAMP"
+        return expr
+
+    def _compile(self) -> Tuple[List[str], str]:
+        rb = self.rulebook
+        fallback: List[str] = []
+
+        txid, txid_t = self._col("transaction_id"), self.types.get("transaction_id")
+        if txid is None:
+            txid_str, missing = "''", "TRUE"
+        else:
+            txid_str = f"CAST({txid} AS VARCHAR)"
+            missing = f"({txid} IS NULL OR trim({txid_str}) = '')"
+            if txid_t == "VARCHAR":
+                fallback.append(f"NOT coalesce(regexp_full_match({txid}, {_lit(PRINTABLE)}), TRUE)")
+            elif txid_t not in INT_TYPES and txid_t != "UUID":
+                fallback.append("TRUE")
+
+        status, status_t = self._col("status_raw"), self.types.get("status_raw")
+        if status is None:
+            bucket, raw_truthy = "''", "FALSE"
+        elif status_t != "VARCHAR":
+            bucket, raw_truthy = "''", "FALSE"
+            fallback.append("TRUE")
+        else:
+            norm = f"replace(lower(trim({status})), ' ', '_')"
+            bucket = (
+                f"CASE WHEN {_in(norm, rb.statuses('SUCCESS'))} THEN 'SUCCESS'"
+                f" WHEN {_in(norm, rb.statuses('FAILED'))} THEN 'FAILED'"
+                f" WHEN {_in(norm, rb.statuses('PENDING'))} THEN 'PENDING'"
+                f" WHEN {_in(norm, rb.statuses('PROCESSING'))} THEN 'PROCESSING'"
+                " ELSE '' END"
+            )
+            raw_truthy = f"coalesce({status} <> '', FALSE)"
+            fallback.append(f"NOT coalesce(regexp_full_match({status}, {_lit(PRINTABLE)}), TRUE)")
+
+        truthy = []
+        for canonical in ("error_code", "error_message"):
+            col = self._col(canonical)
+            if col is None:
+                continue
+            t = _truthy(col, self.types[canonical])
+            if t is None:
+                fallback.append(f"{col} IS NOT NULL")
+            else:
+                truthy.append(t)
+        err = " OR ".join(truthy) or "FALSE"
+
+        code, code_t = self._col("error_code"), self.types.get("error_code")
+        if code is None:
+            hard_fail = "FALSE"
+        else:
+            if code_t != "VARCHAR" and code_t not in INT_TYPES:
+                fallback.append(f"{code} IS NOT NULL")
+            hard_fail = f"coalesce({_in(f'CAST({code} AS VARCHAR)', rb.hard_fail_error_codes)}, FALSE)"
+
+        updated = self._timestamp("updated_at", fallback)
+        created = self._timestamp("created_at", fallback)
+
+        provider, provider_t = self._col("provider"), self.types.get("provider")
+        overrides = rb.stuck_minutes_by_provider
+        if provider is None or not overrides:
+            stuck_min = str(rb.stuck_minutes)
+        else:
+            if provider_t == "VARCHAR":
+                fallback.append(f"NOT coalesce(regexp_full_match({provider}, {_lit(PRINTABLE)}), TRUE)")
+            elif provider_t not in INT_TYPES:
+                fallback.append(f"{provider} IS NOT NULL")
+            whens = " ".join(f"WHEN {_lit(p)} THEN {m}" for p, m in sorted(overrides.items()))
+            stuck_min = f"CASE lower(trim(CAST({provider} AS VARCHAR))) {whens} ELSE {rb.stuck_minutes} END"
+
+        select = [
+            f"{txid_str} AS _txid",
+            f"{missing} AS _missing",
+            f"{bucket} AS _bucket",
+            f"{hard_fail} AS _hard_fail",
+            f"{err} AS _err",
+            f"{raw_truthy} AS _raw_truthy",
+            f"{updated} AS _u",
+            f"{created} AS _c",
+            f"CAST({stuck_min} AS BIGINT) AS _stuck_min",
+        ]
+        return select, " OR ".join(f"({f})" for f in fallback) or "FALSE"
+
+    def _outcomes(self) -> Dict[int, Tuple[str, float, str]]:
+        return {
+            MISSING: ("'UNKNOWN'", 0.0, _lit("Missing transaction_id (unmappable).")),
+            HARD_FAIL: ("'FAILED'", 0.98, "'Error code ' || _code || ' is configured as hard-fail.'"),
+            SUCCESS: ("'SUCCESS'", 0.95, _lit("status_raw matched configured SUCCESS synonyms.")),
+            FAILED: ("'FAILED'", 0.95, _lit("status_raw matched configured FAILED synonyms.")),
+            FAILED_ERR: ("'FAILED'", 0.95, _lit("status_raw matched configured FAILED synonyms. Error info present.")),
+            ERROR_IMPLIES: ("'FAILED'", 0.85, _lit("Error info present and config error_implies_failed=true.")),
+            SKIPPED: ("_bucket", 0.80, _lit("Non-final status; updated_at missing so STUCK not evaluated.")),
+            STUCK: ("'STUCK'", 0.88, "'Non-final status exceeded stuck threshold (' || _stuck_min || ' minutes).'"),
+            NON_FINAL: ("_bucket", 0.80, _lit("Non-final status per configured synonyms.")),
+            UNKNOWN: ("'UNKNOWN'", 0.40, _lit("status_raw did not match any configured synonyms (or missing).")),
+            UNKNOWN_EMPTY: ("'UNKNOWN'", 0.20, _lit("status_raw did not match any configured synonyms (or missing).")),
+        }
+
+    def query(self, source: str) -> str:
+        rb = self.rulebook
+        raw = [f"{_ident(src)} AS _r{i}" for i, (_, src) in enumerate(self.fields)]
+        code = self._col("error_code")
+        branch = f"""
+            CASE
+                WHEN _missing THEN {MISSING}
+                WHEN _hard_fail THEN {HARD_FAIL}
+                WHEN _bucket = 'SUCCESS' THEN {SUCCESS}
+                WHEN _bucket = 'FAILED' THEN CASE WHEN _err THEN {FAILED_ERR} ELSE {FAILED} END
+                WHEN {str(rb.error_implies_failed).upper()} AND _err THEN {ERROR_IMPLIES}
+                WHEN _bucket IN ('PENDING', 'PROCESSING') THEN
+                    CASE
+                        WHEN _u IS NULL AND {str(rb.require_updated_at_for_stuck).upper()} THEN {SKIPPED}
+                        WHEN _elapsed_us > _stuck_min * 60000000 THEN {STUCK}
+                        ELSE {NON_FINAL}
+                    END
+                WHEN _raw_truthy THEN {UNKNOWN}
+                ELSE {UNKNOWN_EMPTY}
+            END"""
+        outcomes = self._outcomes()
+
+        def case(pick) -> str:
+            whens = " ".join(f"WHEN {b} THEN {pick(o)}" for b, o in outcomes.items())
+            return f"CASE _branch {whens} END"
+
+        return f"""
+            WITH src AS ({source}),
+            f AS (
+                SELECT {", ".join(raw + self.select)},
+                       {f"CAST({code} AS VARCHAR)" if code else "NULL"} AS _code,
+                       {self.fallback} AS _fallback
+                FROM src
+            ),
+            e AS (
+                SELECT *, ? - epoch_us(coalesce(_u, _c)) AS _elapsed_us FROM f
+            ),
+            b AS (
+                SELECT *, {branch} AS _branch FROM e
+            )
+            SELECT {", ".join(f"_r{i}" for i in range(len(self.fields)) ) + ", " if self.fields else ""}
+                   _fallback, _branch, _txid, _bucket, _u, _c, _stuck_min,
+                   CAST(trunc(_elapsed_us / 1000000.0) AS BIGINT) AS _elapsed_s,
+                   {case(lambda o: o[0])} AS status,
+                   {case(lambda o: repr(o[1]) + "::DOUBLE")} AS confidence,
+                   {case(lambda o: o[2])} AS reason
+            FROM b
+        """
+
+
+class RowDecoder:
+    """
+    Turns result rows of a _Plan query into DecisionRecords. Holds only plain
+    data (no connection or mapper), so it can be pickled to worker processes.
+    """
+    def __init__(self, plan: _Plan, now: datetime):
+        self.fields = plan.fields
+        self.rulebook = plan.rulebook
+        self.now = now
+        self.trace = dict(plan.source_trace)
+        self.idx = {c: i for i, (c, _) in enumerate(plan.fields)}
+        self.ts_passthrough = {
+            c: plan.types.get(c) == "TIMESTAMP WITH TIME ZONE" for c in ("updated_at", "created_at")
+        }
+
+    def __call__(self, rows: Sequence[tuple]) -> Iterator[DecisionRecord]:
+        n = len(self.fields)
+        idx = self.idx
+        ts_passthrough = self.ts_passthrough
+        rulebook, now = self.rulebook, self.now
+        # One copy of each reason / status string and mapping trace per chunk.
+        strings: Dict[str, str] = {}
+        shared = strings.setdefault
+        mapping_trace = self.trace
+        rules_version = rulebook.version
+
+        def raw(r, canonical):
+            i = idx.get(canonical)
+            return r[i] if i is not None else None
+
+        def ts(r, canonical, inst):
+            if inst is None:
+                return None
+            if ts_passthrough[canonical]:
+                return raw(r, canonical)
+            return inst.replace(tzinfo=timezone.utc)
+
+        for r in rows:
+            fallback, branch, txid, bucket, u, c, _, elapsed_s, status, confidence, reason = r[n:]
+
+            # DuckDB returns instants outside datetime's range (e.g. BC dates) as strings; parse_dt decides those.
+            if fallback or (u is not None and type(u) is not datetime) or (c is not None and type(c) is not datetime):
+                mapped = {canonical: r[i] for i, (canonical, _) in enumerate(self.fields)}
+                mapped["_map_trace"] = mapping_trace
+                yield classify_record(mapped, rulebook, now=now)
+                continue
+
+            if branch == MISSING:
+                yield DecisionRecord(
+                    transaction_id="",
+                    status=shared(status, status),
+                    confidence=confidence,
+                    reason=shared(reason, reason),
+                    evidence={"mapping_trace": mapping_trace, "rules_version": rules_version},
+                    rules_fired=R_MISSING,
+                )
+                continue
+
+            updated_at = ts(r, "updated_at", u)
+            created_at = ts(r, "created_at", c)
+            evidence = {
+                "status_raw": raw(r, "status_raw") or "",
+                "bucket": bucket or None,
+                "updated_at": updated_at.isoformat() if updated_at else None,
+                "created_at": created_at.isoformat() if created_at else None,
+                "error_code": raw(r, "error_code"),
+                "error_message": raw(r, "error_message"),
+                "provider": raw(r, "provider"),
+                "mapping_trace": mapping_trace,
+                "rules_version": rules_version,
+            }
+            if branch in (STUCK, NON_FINAL) and elapsed_s is not None:
+                evidence["elapsed_seconds"] = elapsed_s
+
+            yield DecisionRecord(
+                transaction_id=txid,
+                status=shared(status, status),
+                confidence=confidence,
+                reason=shared(reason, reason),
+                evidence=evidence,
+                rules_fired=BRANCH_RULES[branch],
+                updated_at=updated_at,
+            )
+
+
+class BatchClassifier:
+    """
+    Columnar counterpart of classify_raw: compiles the RuleBook into one DuckDB
+    pass over a whole table or ID set. Rows whose raw values DuckDB cannot
+    interpret exactly like Python (odd timestamps, non-ASCII text, exotic
+    column types) are routed through classify_record, so output is identical.
+    """
+    def __init__(self, mapper: SchemaMapper, rulebook: RuleBook, chunk_size: int = 10_000):
+        self.mapper = mapper
+        self.rulebook = rulebook
+        self.chunk_size = chunk_size
+
+    def plan(self, con: duckdb.DuckDBPyConnection, source: str, params: Optional[Sequence[Any]] = None,
+             sources: Optional[Dict[str, str]] = None) -> _Plan:
+        """`sources`: the store's canonical -> ingested column(s) (TransactionStore.sources)."""
+        cur = con.execute(f"SELECT * FROM ({source}) AS src LIMIT 0", list(params or []))
+        types = {d[0]: str(d[1]) for d in cur.description}
+        return _Plan(self.mapper, self.rulebook.snapshot(), types, sources)
+
+    def execute(
+        self,
+        con: duckdb.DuckDBPyConnection,
+        source: str,
+        params: Optional[Sequence[Any]] = None,
+        now: Optional[datetime] = None,
+        sources: Optional[Dict[str, str]] = None,
+    ) -> Tuple[duckdb.DuckDBPyConnection, RowDecoder]:
+        """
+        Runs the compiled query over `source` (any SELECT / table name) and returns
+        the pending result together with the decoder for its rows.
+        """
+        if not source.lstrip().lower().startswith(("select", "with", "from")):
+            source = f"SELECT * FROM {source}"
+        now = now or datetime.now(timezone.utc)
+        with stage("batch.plan"):
+            plan = self.plan(con, source, params, sources)
+        now_us = (now - EPOCH) // timedelta(microseconds=1)
+        with stage("batch.query"):
+            cur = con.execute(plan.query(source), [*(params or []), now_us])
+        return cur, RowDecoder(plan, now)
+
+    def iter_decisions(
+        self,
+        con: duckdb.DuckDBPyConnection,
+        source: str,
+        params: Optional[Sequence[Any]] = None,
+        now: Optional[datetime] = None,
+        count: bool = True,
+        sources: Optional[Dict[str, str]] = None,
+    ) -> Iterator[DecisionRecord]:
+        """
+        Classifies every row produced by `source` (any SELECT / table name).
+        count=False keeps decisions nobody is served (e.g. materialization)
+        out of txn_rules_fired_total.
+        """
+        cur, decode = self.execute(con, source, params, now, sources)
+        while True:
+            with stage("batch.fetch"):
+                rows = cur.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            with stage("batch.decode"):
+                records = list(decode(rows))
+            if count:
+                count_rules(d.rules_fired for d in records)
+            yield from records
+
+    def classify(
+        self,
+        con: duckdb.DuckDBPyConnection,
+        source: str,
+        params: Optional[Sequence[Any]] = None,
+        now: Optional[datetime] = None,
+        sources: Optional[Dict[str, str]] = None,
+    ) -> List[DecisionRecord]:
+        return list(self.iter_decisions(con, source, params, now, sources=sources))
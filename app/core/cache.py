@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .decision import Decision
+
+Entry = Tuple[Decision, Optional[datetime], float]  # decision, stuck anchor, expires at (epoch seconds)
+
+class DecisionCache:
+    """
+    Bounded LRU of single-lookup decisions keyed by (txid, data generation,
+    rules version). Entries expire after `ttl_seconds`, and non-final ones no
+    later than `stuck_at`, the instant they would turn STUCK. A put under a
+    newer generation/version drops everything cached under the old one.
+    """
+    def __init__(self, max_size: int = 10_000, ttl_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.time):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._scope: Optional[Tuple[Any, ...]] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, txid: str, generation: int, version: str) -> Optional[Tuple[Decision, Optional[datetime]]]:
+        key = (txid, generation, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, txid: str, generation: int, version: str, decision: Decision,
+            anchor: Optional[datetime], stuck_at: Optional[datetime] = None):
+        if not self.enabled:
+            return
+        expires = self.clock() + self.ttl_seconds
+        if stuck_at is not None:
+            expires = min(expires, stuck_at.timestamp())
+        with self._lock:
+            scope = (generation, version)
+            if scope != self._scope:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._scope = scope
+            self._entries[(txid, generation, version)] = (decision, anchor, expires)
+            self._entries.move_to_end((txid, generation, version))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
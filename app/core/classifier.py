@@ -1,27 +1,102 @@
+import sys
 from datetime import datetime, timezone, timedelta
-from typing import Any, Dict
-from .decision import Decision
+from typing import Any, Dict, Optional, TypeVar
+from .decision import Decision, DecisionRecord
 from .rules import RuleBook
-from .mapper import SchemaMapper
+from .mapper import SchemaMapper, source_trace
+from ..utils.metrics import timed
 from ..utils.timeparse import parse_dt
 
-def classify_raw(mapped: Dict[str, Any], rulebook: RuleBook) -> Decision:
-    rules_fired = []
+AnyDecision = TypeVar("AnyDecision", Decision, DecisionRecord)
+
+def stuck_anchor(decision: AnyDecision) -> Optional[datetime]:
+    """
+    The timestamp STUCK is measured from (updated_at, else created_at).
+    """
+    if decision.updated_at is not None:
+        return decision.updated_at
+    created = decision.evidence.get("created_at")
+    return datetime.fromisoformat(created) if created else None
+
+def stuck_deadline(decision: AnyDecision, anchor: Optional[datetime], rulebook: RuleBook) -> Optional[datetime]:
+    """
+    The instant restamp() would turn this non-final decision STUCK, or None if it never will.
+    """
+    rules = decision.rules_fired
+    if (anchor is None or decision.status == "STUCK"
+            or "status_synonym_non_final" not in rules or "stuck_skipped_no_updated_at" in rules):
+        return None
+    return anchor + rulebook.snapshot().stuck_threshold_for(decision.evidence.get("provider"))
+
+# rules_fired tuples shared by every record on the same branch
+R_MISSING = ("missing_transaction_id",)
+R_HARD_FAIL = ("hard_fail_error_code",)
+R_SUCCESS = ("status_synonym_success",)
+R_FAILED = ("status_synonym_failed",)
+R_FAILED_ERR = ("status_synonym_failed", "error_info_present")
+R_ERROR_IMPLIES = ("error_implies_failed",)
+R_SKIPPED = ("status_synonym_non_final", "stuck_skipped_no_updated_at")
+R_NON_FINAL = ("status_synonym_non_final",)
+R_STUCK = ("status_synonym_non_final", "stuck_threshold_exceeded")
+R_UNKNOWN = ("unrecognized_status",)
+
+def restamp(decision: AnyDecision, anchor: Optional[datetime], rulebook: RuleBook, now: Optional[datetime] = None) -> AnyDecision:
+    """
+    Re-evaluates the time-dependent STUCK rule of a non-final decision against `now`.
+    Any other decision is returned unchanged.
+    """
+    rules = decision.rules_fired
+    if anchor is None or "status_synonym_non_final" not in rules or "stuck_skipped_no_updated_at" in rules:
+        return decision
+
+    rb = rulebook.snapshot()
+    now = now or datetime.now(timezone.utc)
+    elapsed = now - anchor
+    evidence = {k: v for k, v in decision.evidence.items() if k != "elapsed_seconds"}
+    evidence["elapsed_seconds"] = int(elapsed.total_seconds())
+    minutes = rb.stuck_minutes_for(decision.evidence.get("provider"))
+    if elapsed > timedelta(minutes=minutes):
+        update = {
+            "status": "STUCK",
+            "confidence": 0.88,
+            "reason": sys.intern(f"Non-final status exceeded stuck threshold ({minutes} minutes)."),
+            "evidence": evidence,
+            "rules_fired": R_STUCK,
+        }
+    else:
+        update = {
+            "status": decision.evidence.get("bucket") or decision.status,
+            "confidence": 0.80,
+            "reason": "Non-final status per configured synonyms.",
+            "evidence": evidence,
+            "rules_fired": R_NON_FINAL,
+        }
+    if isinstance(decision, DecisionRecord):
+        return decision.replace(**update)
+    update["rules_fired"] = list(update["rules_fired"])
+    return decision.model_copy(update=update)
+
+@timed("classify")
+def classify_record(mapped: Dict[str, Any], rulebook: RuleBook, now: Optional[datetime] = None) -> DecisionRecord:
+    """
+    classify_raw without pydantic: returns a DecisionRecord for bulk paths.
+    """
+    rb = rulebook.snapshot()
     trace = mapped.get("_map_trace", {})
 
     txid = mapped.get("transaction_id")
     if txid is None or str(txid).strip() == "":
-        return Decision(
+        return DecisionRecord(
             transaction_id="",
             status="UNKNOWN",
             confidence=0.0,
             reason="Missing transaction_id (unmappable).",
-            evidence={"mapping_trace": trace},
-            rules_fired=["missing_transaction_id"]
+            evidence={"mapping_trace": trace, "rules_version": rb.version},
+            rules_fired=R_MISSING
         )
 
     raw_status = mapped.get("status_raw") or ""
-    bucket = rulebook.match_bucket(raw_status)
+    bucket = rb.match_bucket(raw_status)
 
     updated_at = parse_dt(mapped.get("updated_at"))
     created_at = parse_dt(mapped.get("created_at"))
@@ -35,40 +110,39 @@ def classify_raw(mapped: Dict[str, Any], rulebook: RuleBook) -> Decision:
         "created_at": created_at.isoformat() if created_at else None,
         "error_code": err_code,
         "error_message": err_msg,
+        "provider": mapped.get("provider"),
         "mapping_trace": trace,
+        "rules_version": rb.version,
     }
 
-    if err_code is not None and str(err_code) in rulebook.hard_fail_error_codes:
-        rules_fired.append("hard_fail_error_code")
-        return Decision(
+    if err_code is not None and str(err_code) in rb.hard_fail_error_codes:
+        return DecisionRecord(
             transaction_id=str(txid),
             status="FAILED",
             confidence=0.98,
-            reason=f"Error code {err_code} is configured as hard-fail.",
+            reason=sys.intern(f"Error code {err_code} is configured as hard-fail."),
             evidence=evidence,
-            rules_fired=rules_fired,
+            rules_fired=R_HARD_FAIL,
             updated_at=updated_at
         )
 
     if bucket == "SUCCESS":
-        rules_fired.append("status_synonym_success")
-        return Decision(
+        return DecisionRecord(
             transaction_id=str(txid),
             status="SUCCESS",
             confidence=0.95,
             reason="status_raw matched configured SUCCESS synonyms.",
             evidence=evidence,
-            rules_fired=rules_fired,
+            rules_fired=R_SUCCESS,
             updated_at=updated_at
         )
 
     if bucket == "FAILED":
-        rules_fired.append("status_synonym_failed")
-        reason = "status_raw matched configured FAILED synonyms."
         if err_code or err_msg:
-            rules_fired.append("error_info_present")
-            reason += " Error info present."
-        return Decision(
+            reason, rules_fired = "status_raw matched configured FAILED synonyms. Error info present.", R_FAILED_ERR
+        else:
+            reason, rules_fired = "status_raw matched configured FAILED synonyms.", R_FAILED
+        return DecisionRecord(
             transaction_id=str(txid),
             status="FAILED",
             confidence=0.95,
@@ -78,76 +152,68 @@ def classify_raw(mapped: Dict[str, Any], rulebook: RuleBook) -> Decision:
             updated_at=updated_at
         )
 
-    if rulebook.error_implies_failed and (err_code or err_msg) and bucket in {"", "PENDING", "PROCESSING"}:
-        rules_fired.append("error_implies_failed")
-        return Decision(
+    if rb.error_implies_failed and (err_code or err_msg) and bucket in {"", "PENDING", "PROCESSING"}:
+        return DecisionRecord(
             transaction_id=str(txid),
             status="FAILED",
             confidence=0.85,
             reason="Error info present and config error_implies_failed=true.",
             evidence=evidence,
-            rules_fired=rules_fired,
+            rules_fired=R_ERROR_IMPLIES,
             updated_at=updated_at
         )
 
     if bucket in {"PENDING", "PROCESSING"}:
-        rules_fired.append("status_synonym_non_final")
-
-        if updated_at is None and rulebook.require_updated_at_for_stuck:
-            rules_fired.append("stuck_skipped_no_updated_at")
-            return Decision(
+        if updated_at is None and rb.require_updated_at_for_stuck:
+            return DecisionRecord(
                 transaction_id=str(txid),
                 status=bucket,
                 confidence=0.80,
                 reason="Non-final status; updated_at missing so STUCK not evaluated.",
                 evidence=evidence,
-                rules_fired=rules_fired,
+                rules_fired=R_SKIPPED,
                 updated_at=updated_at
             )
 
-        anchor = updated_at or created_at
-        if anchor:
-            now = datetime.now(timezone.utc)
-            elapsed = now - anchor
-            evidence["elapsed_seconds"] = int(elapsed.total_seconds())
-            if elapsed > timedelta(minutes=rulebook.stuck_minutes):
-                rules_fired.append("stuck_threshold_exceeded")
-                return Decision(
-                    transaction_id=str(txid),
-                    status="STUCK",
-                    confidence=0.88,
-                    reason=f"Non-final status exceeded stuck threshold ({rulebook.stuck_minutes} minutes).",
-                    evidence=evidence,
-                    rules_fired=rules_fired,
-                    updated_at=updated_at
-                )
-
-        return Decision(
+        decision = DecisionRecord(
             transaction_id=str(txid),
             status=bucket,
             confidence=0.80,
             reason="Non-final status per configured synonyms.",
             evidence=evidence,
-            rules_fired=rules_fired,
+            rules_fired=R_NON_FINAL,
             updated_at=updated_at
         )
+        return restamp(decision, updated_at or created_at, rb, now)
 
-    rules_fired.append("unrecognized_status")
-    return Decision(
+    return DecisionRecord(
         transaction_id=str(txid),
         status="UNKNOWN",
         confidence=0.40 if raw_status else 0.20,
         reason="status_raw did not match any configured synonyms (or missing).",
         evidence=evidence,
-        rules_fired=rules_fired,
+        rules_fired=R_UNKNOWN,
         updated_at=updated_at
     )
 
+def classify_raw(mapped: Dict[str, Any], rulebook: RuleBook, now: Optional[datetime] = None) -> Decision:
+    return classify_record(mapped, rulebook, now).to_model()
+
 class Agent:
     def __init__(self, mappings_path: str, synonyms_path: str, rules_path: str):
         self.mapper = SchemaMapper(mappings_path)
         self.rulebook = RuleBook(synonyms_path, rules_path)
 
-    def evaluate(self, row: Dict[str, Any]) -> Decision:
+    @property
+    def version(self) -> str:
+        """
+        Identifies the mapping + rules a decision was computed under.
+        """
+        return f"{self.mapper.version}-{self.rulebook.version}"
+
+    def evaluate(self, row: Dict[str, Any], sources: Optional[Dict[str, str]] = None) -> Decision:
+        """`sources`: the store's canonical -> ingested column(s), reported in mapping_trace."""
         mapped = self.mapper.map_row(row)
+        if sources:
+            mapped["_map_trace"] = source_trace(mapped["_map_trace"], sources)
         return classify_raw(mapped, self.rulebook)
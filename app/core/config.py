@@ -9,6 +9,58 @@ class Settings(BaseSettings):
     SYNONYMS_PATH: str = "configs/status_synonyms.yaml"
     RULES_PATH: str = "configs/rules.yaml"
 
+    # Reader cursors shared by concurrent lookups; ingest always goes through one writer.
+    READ_POOL_SIZE: int = 8
+    # Seconds a call waits for a free reader before it is refused with 503.
+    READ_TIMEOUT_S: float = 5.0
+
+    # Replaced table generations kept after a swap, for POST /admin/rollback.
+    KEEP_GENERATIONS: int = 2
+
+    # /ingest?partition_dir=x writes under this directory only.
+    EXPORT_ROOT: str = "data/exports"
+
+    # Threads per workload class (point lookups / batch + summary + stuck / ingest +
+    # reload + rollback) and how many more calls may wait; beyond that: 503 + Retry-After.
+    POINT_WORKERS: int = 8
+    POINT_QUEUE: int = 512
+    BATCH_WORKERS: int = 2
+    BATCH_QUEUE: int = 16
+    INGEST_WORKERS: int = 1
+    INGEST_QUEUE: int = 2
+    RETRY_AFTER_S: int = 1
+
+    # Classify at ingest time into a `decisions` table and serve lookups from it.
+    MATERIALIZE_DECISIONS: bool = False
+
+    # /transactions/status requests with at least this many ids decode rows in
+    # PARALLEL_WORKERS processes (0 workers = one per CPU, 0 threshold = never).
+    PARALLEL_BATCH_THRESHOLD: int = 100_000
+    PARALLEL_WORKERS: int = 0
+
+    # In-process LRU in front of GET /transaction/{txid} (0 entries = disabled).
+    DECISION_CACHE_SIZE: int = 10_000
+    DECISION_CACHE_TTL_S: float = 30.0
+
+    # Seconds between background STUCK scans (0 = off; /transactions/stuck works regardless).
+    STUCK_SCAN_INTERVAL_S: float = 0.0
+
+    # Seconds between mtime checks of the synonyms/rules files (0 = reload only via /admin/reload).
+    RULES_WATCH_INTERVAL_S: float = 0.0
+
+    # Stage timers, request latency histograms and counters behind GET /metrics.
+    # Off: each timer costs one flag check (cache stats are still reported).
+    METRICS_ENABLED: bool = False
+
+    # Honour `X-Profile: 1` / `?profile=1`: sample the request's stacks every
+    # PROFILE_SAMPLE_INTERVAL_S and keep the last PROFILES_KEEP collapsed profiles.
+    PROFILING_ENABLED: bool = False
+    PROFILE_SAMPLE_INTERVAL_S: float = 0.001
+    PROFILES_KEEP: int = 50
+
+    # Slowest requests (with per-stage timings) kept for /admin/slow-requests (0 = off).
+    SLOW_REQUESTS_KEEP: int = 0
+
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
 
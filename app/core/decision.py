@@ -1,6 +1,14 @@
 from pydantic import BaseModel, Field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
+from decimal import Decimal
+import orjson
+
+def _json_default(value: Any) -> Any:
+    # Same fallbacks as FastAPI's jsonable_encoder for values orjson can't encode natively.
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    return str(value)
 
 class Decision(BaseModel):
     transaction_id: str
@@ -10,3 +18,69 @@ class Decision(BaseModel):
     evidence: Dict[str, Any] = Field(default_factory=dict)
     rules_fired: List[str] = Field(default_factory=list)
     updated_at: Optional[datetime] = None
+
+class DecisionRecord:
+    """
+    Unvalidated, slotted counterpart of Decision for bulk paths (batch
+    classification, batch/stream endpoints). Same fields, same JSON;
+    rules_fired is a tuple and reason/rules strings are shared between records.
+    """
+    __slots__ = ("transaction_id", "status", "confidence", "reason", "evidence", "rules_fired", "updated_at")
+
+    def __init__(
+        self,
+        transaction_id: str,
+        status: str,
+        confidence: float,
+        reason: str,
+        evidence: Optional[Dict[str, Any]] = None,
+        rules_fired: Tuple[str, ...] = (),
+        updated_at: Optional[datetime] = None,
+    ):
+        self.transaction_id = transaction_id
+        self.status = status
+        self.confidence = confidence
+        self.reason = reason
+        self.evidence = evidence if evidence is not None else {}
+        self.rules_fired = rules_fired
+        self.updated_at = updated_at
+
+    def replace(self, **changes: Any) -> "DecisionRecord":
+        fields = {k: getattr(self, k) for k in self.__slots__}
+        fields.update(changes)
+        return DecisionRecord(**fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Same shape as Decision.model_dump()."""
+        return {
+            "transaction_id": self.transaction_id,
+            "status": self.status,
+            "confidence": self.confidence,
+            "reason": self.reason,
+            "evidence": self.evidence,
+            "rules_fired": list(self.rules_fired),
+            "updated_at": self.updated_at,
+        }
+
+    def to_json(self) -> bytes:
+        """Byte-identical to the JSONResponse body FastAPI renders for the equivalent Decision."""
+        return orjson.dumps({
+            "transaction_id": self.transaction_id,
+            "status": self.status,
+            "confidence": self.confidence,
+            "reason": self.reason,
+            "evidence": self.evidence,
+            "rules_fired": self.rules_fired,
+            "updated_at": self.updated_at,
+        }, default=_json_default)
+
+    def to_model(self) -> Decision:
+        return Decision(**self.to_dict())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, DecisionRecord):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"DecisionRecord({self.transaction_id!r}, {self.status!r}, {self.confidence!r})"
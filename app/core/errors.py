@@ -6,3 +6,6 @@ class DataSourceError(Exception):
 
 class NotFoundError(Exception):
     pass
+
+class BusyError(Exception):
+    pass
@@ -1,42 +1,130 @@
+import hashlib
 import yaml
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Sequence, Tuple
+
+import duckdb
+
+from ..utils.metrics import timed
+
+# Distinct column signatures seen at once (one per ingested file layout / row shape).
+PLAN_CACHE_SIZE = 256
 
 def _canon(s: str) -> str:
     return str(s).strip().lower().replace(" ", "_")
 
+def _ident(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+class MappingPlan:
+    """
+    The mapping compiled for one column signature: canonical -> source column,
+    plus source positions so tuple rows map with plain index lookups.
+    """
+    __slots__ = ("columns", "trace", "fields", "indexes")
+
+    def __init__(self, columns: Tuple[str, ...], trace: Dict[str, str]):
+        pos = {c: i for i, c in enumerate(columns)}
+        self.columns = columns
+        self.trace = trace
+        self.fields = tuple(trace.items())
+        self.indexes = tuple((canonical, pos[src]) for canonical, src in self.fields)
+
+    def apply(self, values: Sequence[Any]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {canonical: values[i] for canonical, i in self.indexes}
+        out["_map_trace"] = dict(self.trace)
+        return out
+
+def project_canonical(rel: duckdb.DuckDBPyRelation, trace: Dict[str, str],
+                      key_as_varchar: bool = True) -> duckdb.DuckDBPyRelation:
+    """
+    Renames the mapped columns of a relation to their canonical names in one projection.
+    Unmapped columns pass through unless their name would collide with a canonical one.
+    """
+    exprs, taken = [], set()
+    for canonical, src in trace.items():
+        col = _ident(src)
+        if canonical == "transaction_id" and key_as_varchar:
+            col = f"CAST({col} AS VARCHAR)"
+        exprs.append(f"{col} AS {_ident(canonical)}")
+        taken.add(canonical.lower())
+    used = set(trace.values())
+    for c in rel.columns:
+        if c not in used and c.lower() not in taken:
+            exprs.append(_ident(c))
+            taken.add(c.lower())
+    return rel.project(", ".join(exprs))
+
+def source_trace(trace: Dict[str, str], sources: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """
+    `trace` (canonical -> column) with each column of a canonicalized table
+    replaced by the source column(s) it was ingested from.
+    """
+    if not sources:
+        return dict(trace)
+    return {canonical: sources.get(col, col) for canonical, col in trace.items()}
+
 class SchemaMapper:
     """
     Maps arbitrary input dict keys to canonical keys using mappings.yaml.
     Keeps an audit trail of which source key was used.
+    Mapping is compiled once per distinct column signature and cached.
     """
     def __init__(self, mappings_path: str):
         self.mappings_path = mappings_path
         self.mapping = {}
+        self.version = ""
         self.load()
 
     def load(self):
-        cfg = yaml.safe_load(Path(self.mappings_path).read_text(encoding="utf-8"))
+        text = Path(self.mappings_path).read_text(encoding="utf-8")
+        cfg = yaml.safe_load(text)
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
         raw = cfg.get("canonical_fields", {})
         normed = {}
         for canonical, aliases in raw.items():
             normed[canonical] = {_canon(a) for a in (aliases or [])}
         self.mapping = normed
+        self._plans = lru_cache(maxsize=PLAN_CACHE_SIZE)(self._compile)
 
-    def map_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
-        src = {_canon(k): k for k in row.keys()}  # normalized -> original
-        out: Dict[str, Any] = {}
+    def _compile(self, columns: Tuple[str, ...]) -> MappingPlan:
+        src = {_canon(k): k for k in columns}  # normalized -> original
         trace: Dict[str, str] = {}
-
         for canonical, aliases in self.mapping.items():
-            found_key = None
+            # A column already named after the canonical field (e.g. a canonicalized store table) wins.
+            if canonical in src:
+                trace[canonical] = src[canonical]
+                continue
             for a in aliases:
                 if a in src:
-                    found_key = src[a]
+                    trace[canonical] = src[a]
                     break
-            if found_key is not None:
-                out[canonical] = row.get(found_key)
-                trace[canonical] = found_key
+        return MappingPlan(columns, trace)
 
-        out["_map_trace"] = trace
+    def compile(self, columns) -> MappingPlan:
+        return self._plans(tuple(columns))
+
+    def cache_info(self):
+        return self._plans.cache_info()
+
+    def resolve(self, columns) -> Dict[str, str]:
+        """
+        Resolves canonical field -> source column name for a set of column names.
+        """
+        return dict(self.compile(columns).trace)
+
+    @timed("mapper.map_row")
+    def map_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        plan = self.compile(row.keys())
+        out: Dict[str, Any] = {canonical: row.get(key) for canonical, key in plan.fields}
+        out["_map_trace"] = dict(plan.trace)
         return out
+
+    def map_batch(self, rel: duckdb.DuckDBPyRelation, key_as_varchar: bool = True) -> Tuple[duckdb.DuckDBPyRelation, Dict[str, str]]:
+        """
+        Columnar counterpart of map_row: renames a whole relation's columns to
+        canonical names in one projection. Returns (relation, canonical -> source column).
+        """
+        trace = self.resolve(rel.columns)
+        return project_canonical(rel, trace, key_as_varchar), trace
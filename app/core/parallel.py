@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import duckdb
+
+from .batch import BatchClassifier, RowDecoder
+from .decision import DecisionRecord
+from ..utils.metrics import REGISTRY, add_rule_counts, count_rules, stage, tally_rules
+
+
+def _decode(decoder: RowDecoder, rows: List[tuple]) -> List[DecisionRecord]:
+    return list(decoder(rows))
+
+
+def _encode(decoder: RowDecoder, rows: List[tuple], sep: bytes,
+            tally: bool) -> Tuple[List[str], bytes, Optional[Dict[str, int]]]:
+    records = list(decoder(rows))
+    rules = tally_rules(d.rules_fired for d in records) if tally else None
+    return [d.transaction_id for d in records], sep.join(d.to_json() for d in records), rules
+
+
+class ParallelClassifier:
+    """
+    BatchClassifier with the per-row Python work fanned out over processes.
+    DuckDB evaluates the compiled rules (already multi-threaded) and the
+    result is cut into contiguous chunks of plain row tuples; workers build
+    the records (including classify_record fallbacks) and optionally their
+    JSON, and chunks are merged back in query order.
+    """
+    def __init__(self, engine: BatchClassifier, workers: int = 0, chunk_size: int = 20_000):
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: the parent holds DuckDB connections and server threads that must not be forked.
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _map(self, fn, con: duckdb.DuckDBPyConnection, source: str, params: Optional[Sequence[Any]],
+             now: Optional[datetime], sources: Optional[Dict[str, str]], *args) -> Iterator[Any]:
+        cur, decoder = self.engine.execute(con, source, params, now, sources)
+        pending: Deque[Future] = deque()
+        try:
+            while True:
+                with stage("batch.fetch"):
+                    rows = cur.fetchmany(self.chunk_size)
+                if rows:
+                    pending.append(self.pool.submit(fn, decoder, rows, *args))
+                # Bounded read-ahead keeps memory flat; results come back in submission order.
+                while pending and (not rows or len(pending) >= 2 * self.workers):
+                    yield pending.popleft().result()
+                if not rows:
+                    break
+        finally:
+            for f in pending:
+                f.cancel()
+
+    def iter_decisions(self, con: duckdb.DuckDBPyConnection, source: str,
+                       params: Optional[Sequence[Any]] = None, now: Optional[datetime] = None,
+                       sources: Optional[Dict[str, str]] = None) -> Iterator[DecisionRecord]:
+        for chunk in self._map(_decode, con, source, params, now, sources):
+            count_rules(d.rules_fired for d in chunk)
+            yield from chunk
+
+    def iter_encoded(self, con: duckdb.DuckDBPyConnection, source: str,
+                     params: Optional[Sequence[Any]] = None, now: Optional[datetime] = None,
+                     sep: bytes = b"\n", sources: Optional[Dict[str, str]] = None) -> Iterator[Tuple[List[str], bytes]]:
+        """
+        (transaction_ids, serialized decisions joined by `sep`) per chunk; the
+        JSON is produced in the workers, so only bytes cross back.
+        """
+        # Workers tally rules_fired themselves; their own metrics registry is not the server's.
+        for txids, body, rules in self._map(_encode, con, source, params, now, sources, sep, REGISTRY.enabled):
+            if rules:
+                add_rule_counts(rules)
+            yield txids, body
+
+    def classify(self, con: duckdb.DuckDBPyConnection, source: str,
+                 params: Optional[Sequence[Any]] = None, now: Optional[datetime] = None,
+                 sources: Optional[Dict[str, str]] = None) -> List[DecisionRecord]:
+        return list(self.iter_decisions(con, source, params, now, sources))
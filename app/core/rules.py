@@ -1,52 +1,156 @@
+import hashlib
+import os
+import threading
 import yaml
+from dataclasses import dataclass, field
+from datetime import timedelta
 from pathlib import Path
+from typing import Dict, FrozenSet, Tuple
+
+# Synonym groups in match priority order: a status listed under two groups takes the first.
+BUCKETS = (("success", "SUCCESS"), ("failed", "FAILED"), ("pending", "PENDING"), ("processing", "PROCESSING"))
 
 def _norm(s: str) -> str:
     return str(s).strip().lower().replace(" ", "_")
 
+def norm_provider(provider) -> str:
+    return str(provider).strip().lower()
+
+@dataclass(frozen=True)
+class CompiledRules:
+    """
+    One immutable, precomputed version of the synonyms + rules files.
+    Classification reads a single snapshot so a reload never mixes versions.
+    """
+    version: str
+    buckets: Dict[str, str]
+    syn: Dict[str, FrozenSet[str]]
+    stuck_minutes: int
+    stuck_threshold: timedelta
+    error_implies_failed: bool
+    require_updated_at_for_stuck: bool
+    hard_fail_error_codes: FrozenSet[str]
+    stuck_minutes_by_provider: Dict[str, int] = field(default_factory=dict)
+    rules: Dict = field(default_factory=dict)
+    mtimes: Tuple[int, int] = (0, 0)
+
+    @classmethod
+    def from_text(cls, syn_text: str, rules_text: str, mtimes: Tuple[int, int] = (0, 0)) -> "CompiledRules":
+        syn_raw = yaml.safe_load(syn_text) or {}
+        rules = yaml.safe_load(rules_text) or {}
+        syn = {k: frozenset(_norm(x) for x in (arr or [])) for k, arr in syn_raw.items()}
+        buckets: Dict[str, str] = {}
+        for group, bucket in BUCKETS:
+            for s in syn.get(group, ()):
+                if s:
+                    buckets.setdefault(s, bucket)
+        stuck_minutes = int(rules.get("stuck_threshold_minutes", 30))
+        return cls(
+            # Content hash of both files; stored decisions computed under another version are stale.
+            version=hashlib.sha256((syn_text + "\0" + rules_text).encode("utf-8")).hexdigest()[:16],
+            buckets=buckets,
+            syn=syn,
+            stuck_minutes=stuck_minutes,
+            stuck_threshold=timedelta(minutes=stuck_minutes),
+            error_implies_failed=bool(rules.get("error_implies_failed", True)),
+            require_updated_at_for_stuck=bool(rules.get("require_updated_at_for_stuck", True)),
+            hard_fail_error_codes=frozenset(str(x) for x in (rules.get("hard_fail_error_codes") or [])),
+            stuck_minutes_by_provider={
+                norm_provider(p): int(m) for p, m in (rules.get("stuck_threshold_minutes_by_provider") or {}).items()
+            },
+            rules=rules,
+            mtimes=mtimes,
+        )
+
+    def snapshot(self) -> "CompiledRules":
+        return self
+
+    def stuck_minutes_for(self, provider) -> int:
+        if provider is None or not self.stuck_minutes_by_provider:
+            return self.stuck_minutes
+        return self.stuck_minutes_by_provider.get(norm_provider(provider), self.stuck_minutes)
+
+    def stuck_threshold_for(self, provider) -> timedelta:
+        return timedelta(minutes=self.stuck_minutes_for(provider))
+
+    def normalize_status(self, raw: str) -> str:
+        return _norm(raw or "")
+
+    def match_bucket(self, raw_status: str) -> str:
+        return self.buckets.get(_norm(raw_status or ""), "")
+
+    def statuses(self, bucket: str) -> FrozenSet[str]:
+        return frozenset(s for s, b in self.buckets.items() if b == bucket)
+
 class RuleBook:
+    """
+    Hot-reloadable holder of the current CompiledRules. load() compiles the
+    files off to the side and swaps the reference in one assignment, so
+    readers never lock; a file that fails to parse leaves the old book live.
+    """
     def __init__(self, synonyms_path: str, rules_path: str):
         self.synonyms_path = synonyms_path
         self.rules_path = rules_path
-        self.syn = {}
-        self.rules = {}
+        self._reload_lock = threading.Lock()
+        self._book: CompiledRules
         self.load()
 
-    def load(self):
-        self.syn = yaml.safe_load(Path(self.synonyms_path).read_text(encoding="utf-8"))
-        self.rules = yaml.safe_load(Path(self.rules_path).read_text(encoding="utf-8"))
-        for k, arr in list(self.syn.items()):
-            self.syn[k] = {_norm(x) for x in (arr or [])}
+    def _mtimes(self) -> Tuple[int, int]:
+        return os.stat(self.synonyms_path).st_mtime_ns, os.stat(self.rules_path).st_mtime_ns
+
+    def load(self) -> CompiledRules:
+        with self._reload_lock:
+            mtimes = self._mtimes()
+            syn_text = Path(self.synonyms_path).read_text(encoding="utf-8")
+            rules_text = Path(self.rules_path).read_text(encoding="utf-8")
+            self._book = CompiledRules.from_text(syn_text, rules_text, mtimes)
+            return self._book
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads when either file's mtime moved. Returns True if the version changed.
+        """
+        try:
+            if self._mtimes() == self._book.mtimes:
+                return False
+        except OSError:
+            return False
+        before = self._book.version
+        return self.load().version != before
+
+    def snapshot(self) -> CompiledRules:
+        return self._book
+
+    @property
+    def version(self) -> str:
+        return self._book.version
+
+    @property
+    def syn(self) -> Dict[str, FrozenSet[str]]:
+        return self._book.syn
+
+    @property
+    def rules(self) -> Dict:
+        return self._book.rules
 
     def normalize_status(self, raw: str) -> str:
         return _norm(raw or "")
 
     @property
     def stuck_minutes(self) -> int:
-        return int(self.rules.get("stuck_threshold_minutes", 30))
+        return self._book.stuck_minutes
 
     @property
     def error_implies_failed(self) -> bool:
-        return bool(self.rules.get("error_implies_failed", True))
+        return self._book.error_implies_failed
 
     @property
     def require_updated_at_for_stuck(self) -> bool:
-        return bool(self.rules.get("require_updated_at_for_stuck", True))
+        return self._book.require_updated_at_for_stuck
 
     @property
-    def hard_fail_error_codes(self) -> set[str]:
-        return {str(x) for x in (self.rules.get("hard_fail_error_codes") or [])}
+    def hard_fail_error_codes(self) -> FrozenSet[str]:
+        return self._book.hard_fail_error_codes
 
     def match_bucket(self, raw_status: str) -> str:
-        s = self.normalize_status(raw_status)
-        if not s:
-            return ""
-        if s in self.syn.get("success", set()):
-            return "SUCCESS"
-        if s in self.syn.get("failed", set()):
-            return "FAILED"
-        if s in self.syn.get("pending", set()):
-            return "PENDING"
-        if s in self.syn.get("processing", set()):
-            return "PROCESSING"
-        return ""
+        return self._book.match_bucket(raw_status)
@@ -1,43 +1,792 @@
+import itertools
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple, Union
 import duckdb
-from .errors import NotFoundError
-from ..connectors.loader import validate_path, duckdb_relation
+import orjson
+from .batch import BatchClassifier, EPOCH, RowDecoder, STUCK, NON_FINAL, timestamp_sql
+from .classifier import stuck_anchor
+from .decision import Decision, _json_default
+from .errors import BusyError, NotFoundError, DataSourceError
+from .mapper import SchemaMapper, _ident, project_canonical
+from ..connectors.loader import resolve_sources, duckdb_relation
+from ..utils.metrics import ROWS_INGESTED, timed
+
+DECISIONS = "decisions"
+DECISIONS_META = "decisions_meta"
+STUCK_INDEX = "stuck_index"
+# name -> physical `<name>__g<N>` tables of each snapshot-swapped table; `live` marks the one `name` points at.
+GENERATIONS = "table_generations"
+
+# Written into every partitioned export; only such a directory may be overwritten by the next one.
+EXPORT_MARKER = ".txn_export"
+
+# Process-wide, so two stores never hand out the same generation.
+_generations = itertools.count(1)
+
+def check_export_dir(out_dir: Union[str, Path]) -> Path:
+    """
+    `out_dir` if an export may write there: missing, empty, or a previous
+    export (the COPY replaces everything in it). Anything else is refused.
+    """
+    path = Path(out_dir)
+    if path.exists():
+        if not path.is_dir():
+            raise DataSourceError(f"Export path is not a directory: {out_dir}")
+        if not (path / EXPORT_MARKER).is_file() and any(path.iterdir()):
+            raise DataSourceError(f"Refusing to overwrite {out_dir}: not empty and not a previous export")
+    return path
+
 
 class TransactionStore:
-    def __init__(self, duckdb_path: str):
+    """
+    One DuckDB database with a single serialized writer (`con`, used by ingest
+    and materialize) and a fixed pool of reader cursors for concurrent lookups.
+    With a SchemaMapper, ingested columns are renamed to their canonical names
+    and transaction_id is stored as an indexed VARCHAR key.
+
+    A replace ingest builds a new generation (`txns__g7`) next to the live one
+    and then swaps it in, so lookups never see a missing or half-built table.
+    `txns` is a view of the live generation; the store's own reads go to the
+    physical table directly. The previous `keep_generations` builds are kept
+    for rollback().
+    """
+    def __init__(self, duckdb_path: str, read_pool_size: int = 8, mapper: Optional[SchemaMapper] = None,
+                 keep_generations: int = 2, read_timeout_s: Optional[float] = None):
         self.duckdb_path = duckdb_path
+        self.read_timeout_s = read_timeout_s
+        self.mapper = mapper
+        self.keep_generations = keep_generations
         Path(self.duckdb_path).parent.mkdir(exist_ok=True, parents=True)
         self.con = duckdb.connect(self.duckdb_path)
+        self._write_lock = threading.RLock()
+        self._readers: "queue.Queue[duckdb.DuckDBPyConnection]" = queue.Queue()
+        self._cursors: List[duckdb.DuckDBPyConnection] = []
+        for _ in range(max(1, read_pool_size)):
+            cur = self.con.cursor()
+            self._cursors.append(cur)
+            self._readers.put(cur)
+        # Schema/generation lookups behind the query builders; never a pool reader,
+        # since callers often build a query while already holding one.
+        self._meta = self.con.cursor()
+        self._meta_lock = threading.Lock()
+        self._cursors.append(self._meta)
+        # Version of the stored decisions. Read once here, then only set under
+        # _write_lock (materialize / drop_decisions); lookups never write it.
+        try:
+            row = self.con.execute(f"SELECT version FROM {DECISIONS_META} LIMIT 1").fetchone()
+        except duckdb.CatalogException:
+            row = None
+        self._decisions_version: Optional[str] = row[0] if row else None
+        self._key_types: Dict[str, Optional[str]] = {}
+        self._projections: Dict[Tuple[str, str], Optional[Tuple[str, ...]]] = {}
+        self._table_columns: Dict[str, Tuple[str, ...]] = {}
+        self._sources: Dict[str, Dict[str, str]] = {}
+        # table -> physical table reads go to (the table itself unless snapshot-swapped).
+        self._live: Dict[str, str] = {}
+        # Changes on every ingest; caches of row-derived results key on it.
+        self.generation = next(_generations)
+        self._stuck_built: Optional[Tuple[int, str]] = None
 
     def close(self):
+        for cur in self._cursors:
+            try:
+                cur.close()
+            except Exception:
+                pass
         try:
             self.con.close()
         except Exception:
             pass
 
-    def ingest(self, data_path: str, table: str = "txns"):
-        validate_path(data_path)
-        rel = duckdb_relation(self.con, data_path)
-        self.con.execute(f"DROP TABLE IF EXISTS {table}")
-        self.con.execute(f"CREATE TABLE {table} AS SELECT * FROM rel")
+    @contextmanager
+    def reader(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """
+        Borrows a reader cursor for the calling thread; blocks while all are in
+        use, for at most read_timeout_s (None = no limit), then raises BusyError.
+        """
+        try:
+            cur = self._readers.get(timeout=self.read_timeout_s)
+        except queue.Empty:
+            raise BusyError(f"All {len(self._cursors) - 1} reader cursors busy for {self.read_timeout_s}s")
+        try:
+            yield cur
+        finally:
+            self._readers.put(cur)
+
+    @contextmanager
+    def _metadata(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        with self._meta_lock:
+            yield self._meta
+
+    def ids_query(self, table: str = "txns") -> str:
+        """
+        SELECT over `table` restricted to a list of transaction ids bound as a
+        single VARCHAR[] parameter, so no temp table or per-id insert is needed.
+        """
+        table = self._resolve(table)
+        key = self._key(table, "t.")
+        return f"""
+            SELECT {self._select(table, "t.")}
+            FROM {table} t
+            JOIN (SELECT unnest(?::VARCHAR[]) AS txid) r
+              ON {key} = r.txid
+        """
+
+    def _resolve(self, table: str) -> str:
+        """
+        The physical table behind `table`: its live generation, or `table`
+        itself when it is not snapshot-swapped. A reader that resolved an older
+        generation keeps a consistent view of it until it is pruned.
+        """
+        physical = self._live.get(table)
+        if physical is None:
+            with self._metadata() as cur:
+                try:
+                    row = cur.execute(f"SELECT physical FROM {GENERATIONS} WHERE name = ? AND live", [table]).fetchone()
+                except duckdb.CatalogException:
+                    row = None
+            physical = self._live[table] = row[0] if row else table
+        return physical
+
+    def _forget(self, table: str):
+        """Drops the cached schema of a physical table whose columns changed."""
+        self._key_types.pop(table, None)
+        self._table_columns.pop(table, None)
+        self._sources.pop(table, None)
+        self._projections = {k: v for k, v in self._projections.items() if k[0] != table}
+
+    def _key(self, table: str, prefix: str = "") -> str:
+        """
+        transaction_id as VARCHAR; the bare column when it already is one, so its index applies.
+        """
+        if self._key_type(table) == "VARCHAR":
+            return f"{prefix}transaction_id"
+        return f"CAST({prefix}transaction_id AS VARCHAR)"
+
+    def _columns(self, table: str) -> Tuple[str, ...]:
+        if table not in self._table_columns:
+            with self._metadata() as cur:
+                self._table_columns[table] = tuple(r[0] for r in cur.execute(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+                    [table],
+                ).fetchall())
+        return self._table_columns[table]
+
+    def mapped_columns(self, table: str = "txns") -> Optional[Tuple[str, ...]]:
+        """
+        The columns of `table` SchemaMapper resolves to canonical fields, i.e.
+        everything classification reads. None (all columns) without a mapper.
+        """
+        if self.mapper is None:
+            return None
+        table = self._resolve(table)
+        key = (table, self.mapper.version)
+        if key not in self._projections:
+            columns = self._columns(table)
+            trace = self.mapper.resolve(columns)
+            self._projections[key] = tuple(c for c in columns if c in trace.values()) or None
+        return self._projections[key]
 
-        # Best-effort: if no transaction_id column exists, index will fail (and that’s fine).
+    def _select(self, table: str, prefix: str = "") -> str:
+        columns = self.mapped_columns(table)
+        if columns is None:
+            return f"{prefix}*"
+        return ", ".join(prefix + _ident(c) for c in columns)
+
+    def _key_type(self, table: str) -> Optional[str]:
+        if table not in self._key_types:
+            with self._metadata() as cur:
+                row = cur.execute(
+                    "SELECT data_type FROM information_schema.columns WHERE table_name = ? AND column_name = 'transaction_id'",
+                    [table],
+                ).fetchone()
+            self._key_types[table] = row[0] if row else None
+        return self._key_types[table]
+
+    def _table_exists(self, table: str) -> bool:
+        row = self.con.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table]
+        ).fetchone()
+        return row[0] > 0
+
+    @timed("store.ingest")
+    def ingest(self, data_path: Union[str, Sequence[str]], table: str = "txns", mode: str = "replace") -> Dict[str, Any]:
+        """
+        `data_path` is a file, directory, glob, or a list of these; formats may be mixed.
+        mode="replace" builds a new generation of `table` from the files and swaps it in.
+        mode="upsert" merges the files into the existing table by transaction_id,
+        keeping the row with the latest updated_at.
+        Returns how many rows were inserted / updated / left unchanged.
+        """
+        if mode not in ("replace", "upsert"):
+            raise ValueError(f"Unknown ingest mode: {mode}")
+        files = resolve_sources(data_path)
+        with self._write_lock:
+            try:
+                result = self._ingest(files, table, mode)
+            finally:
+                # After the schema change, so a lookup racing an upsert can't cache the old one.
+                self._forget(self._resolve(table))
+                self.generation = next(_generations)
+        for outcome in ("inserted", "updated"):
+            ROWS_INGESTED.inc(mode, outcome, amount=result[outcome])
+        return {**result, "files": len(files)}
+
+    def _canonical(self, files: List[str]) -> Tuple[duckdb.DuckDBPyRelation, Dict[str, str]]:
+        """
+        The files as one relation with source columns projected onto canonical
+        names (SchemaMapper aliases applied in SQL per file layout, before the
+        files are combined), transaction_id cast to VARCHAR. Unmapped columns
+        pass through. Also returns canonical -> source column(s), the mapping audit trail.
+        """
+        traces: List[Dict[str, str]] = []
+
+        def canonical(rel: duckdb.DuckDBPyRelation) -> duckdb.DuckDBPyRelation:
+            if self.mapper is not None:
+                mapped, trace = self.mapper.map_batch(rel)
+            else:
+                trace = {c: c for c in rel.columns if c == "transaction_id"}
+                mapped = project_canonical(rel, trace)
+            traces.append(trace)
+            return mapped
+
+        rel = duckdb_relation(self.con, files, canonical)
+        if not any("transaction_id" in t for t in traces):
+            return duckdb_relation(self.con, files), {}
+        mapping: Dict[str, List[str]] = {}
+        for trace in traces:
+            for field, src in trace.items():
+                if src not in mapping.setdefault(field, []):
+                    mapping[field].append(src)
+        return rel, {field: ", ".join(srcs) for field, srcs in mapping.items()}
+
+    def _ingest(self, files: List[str], table: str, mode: str) -> Dict[str, Any]:
+        rel, mapping = self._canonical(files)
+        if mode == "upsert" and self._table_exists(table):
+            # In place, in one transaction: readers keep the pre-upsert rows until it commits.
+            return {**self._upsert(rel, self._resolve(table), mapping), "mapping": mapping}
+
+        n = self._next_generation(table)
+        physical = f"{table}__g{n}"
         try:
-            self.con.execute(f"CREATE INDEX IF NOT EXISTS idx_txid ON {table}(transaction_id)")
+            self.con.execute(f"DROP TABLE IF EXISTS {physical}")  # left over from a failed build
+            self.con.execute(f"CREATE TABLE {physical} AS SELECT * FROM rel")
+            # Best-effort: if no transaction_id column exists, index will fail (and that’s fine).
+            try:
+                self.con.execute(f"CREATE INDEX IF NOT EXISTS idx_{physical}_txid ON {physical}(transaction_id)")
+            except Exception:
+                pass
+            inserted = self.con.execute(f"SELECT COUNT(*) FROM {physical}").fetchone()[0]
         except Exception:
-            pass
+            self.con.execute(f"DROP TABLE IF EXISTS {physical}")
+            raise
+        self._swap(table, physical, n, inserted, mapping)
+        return {"mode": mode, "inserted": inserted, "updated": 0, "unchanged": 0, "skipped": 0,
+                "mapping": mapping, "generation": n}
+
+    def _next_generation(self, table: str) -> int:
+        self.con.execute(f"""
+            CREATE TABLE IF NOT EXISTS {GENERATIONS} (
+                name VARCHAR, generation INTEGER, physical VARCHAR,
+                created_at TIMESTAMP, rows BIGINT, live BOOLEAN, mapping VARCHAR
+            )
+        """)
+        self.con.execute(f"ALTER TABLE {GENERATIONS} ADD COLUMN IF NOT EXISTS mapping VARCHAR")
+        return self.con.execute(
+            f"SELECT coalesce(max(generation), 0) + 1 FROM {GENERATIONS} WHERE name = ?", [table]
+        ).fetchone()[0]
+
+    def _swap(self, table: str, physical: str, generation: Optional[int] = None, rows: Optional[int] = None,
+              mapping: Optional[Dict[str, str]] = None):
+        """
+        Points `table` at `physical` in one transaction: readers see either the
+        old generation or the new one. Stored decisions go with the old data.
+        A new build (`generation` given) is recorded, with the source columns
+        it was canonicalized from, and the generations beyond keep_generations
+        are dropped.
+        """
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            kind = self.con.execute(
+                "SELECT table_type FROM information_schema.tables WHERE table_name = ?", [table]
+            ).fetchone()
+            if kind and kind[0] == "BASE TABLE":
+                # Created before snapshot swapping; replaced by the view.
+                self.con.execute(f"DROP TABLE {table}")
+            self.con.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM {physical}")
+            self.con.execute(f"UPDATE {GENERATIONS} SET live = (physical = ?) WHERE name = ?", [physical, table])
+            pruned: List[str] = []
+            if generation is not None:
+                self.con.execute(f"""
+                    INSERT INTO {GENERATIONS} (name, generation, physical, created_at, rows, live, mapping)
+                    VALUES (?, ?, ?, now()::TIMESTAMP, ?, TRUE, ?)
+                """, [table, generation, physical, rows, orjson.dumps(mapping or {}).decode("utf-8")])
+                pruned = [r[0] for r in self.con.execute(f"""
+                    SELECT physical FROM {GENERATIONS} WHERE name = ? AND NOT live
+                    ORDER BY generation DESC OFFSET ?
+                """, [table, max(0, self.keep_generations)]).fetchall()]
+                for old in pruned:
+                    self.con.execute(f"DROP TABLE IF EXISTS {old}")
+                    self.con.execute(f"DELETE FROM {GENERATIONS} WHERE physical = ?", [old])
+            self.drop_decisions()
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+        self._live[table] = physical
+        for old in pruned:
+            self._forget(old)
+
+    def sources(self, table: str = "txns") -> Dict[str, str]:
+        """
+        Canonical column -> the source column(s) the live generation of `table`
+        was ingested from; classifications report these in mapping_trace.
+        Empty for a table that was not canonicalized at ingest.
+        """
+        physical = self._resolve(table)
+        mapping = self._sources.get(physical)
+        if mapping is None:
+            with self._metadata() as cur:
+                try:
+                    row = cur.execute(f"SELECT mapping FROM {GENERATIONS} WHERE physical = ?", [physical]).fetchone()
+                except duckdb.CatalogException:
+                    row = None
+            mapping = self._sources[physical] = orjson.loads(row[0]) if row and row[0] else {}
+        return mapping
+
+    def generations(self, table: str = "txns") -> List[Dict[str, Any]]:
+        """The kept generations of `table`, newest first."""
+        with self.reader() as cur:
+            try:
+                rows = cur.execute(f"""
+                    SELECT generation, physical, created_at, rows, live FROM {GENERATIONS}
+                    WHERE name = ? ORDER BY generation DESC
+                """, [table]).fetchall()
+            except duckdb.CatalogException:
+                rows = []
+        cols = ("generation", "table", "created_at", "rows", "live")
+        return [dict(zip(cols, r)) for r in rows]
 
-    def lookup(self, txid: str, table: str = "txns") -> Dict[str, Any]:
-        q = f"SELECT * FROM {table} WHERE CAST(transaction_id AS VARCHAR) = ? LIMIT 1"
-        df = self.con.execute(q, [str(txid)]).fetchdf()
-        if df is None or df.empty:
+    def rollback(self, table: str = "txns", generation: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Points `table` back at a kept generation: `generation`, or by default the
+        newest one older than the live one. Upserts applied to the live
+        generation are not carried over.
+        """
+        with self._write_lock:
+            kept = self.generations(table)
+            live = next((g for g in kept if g["live"]), None)
+            if generation is None:
+                target = next((g for g in kept if live and g["generation"] < live["generation"]), None)
+            else:
+                target = next((g for g in kept if g["generation"] == generation), None)
+            if target is None:
+                raise NotFoundError(f"No generation to roll {table} back to" if generation is None
+                                    else f"Generation {generation} of {table} is not kept")
+            self._swap(table, target["table"])
+            self.generation = next(_generations)
+        return {**target, "live": True, "previous": live["generation"] if live else None}
+
+    def _upsert(self, rel: duckdb.DuckDBPyRelation, table: str, mapping: Optional[Dict[str, str]] = None,
+                key: str = "transaction_id", version: str = "updated_at") -> Dict[str, Any]:
+        existing = {r[0]: r[1] for r in self.con.execute(f"DESCRIBE {table}").fetchall()}
+        if key not in rel.columns or key not in existing:
+            raise DataSourceError(f"Upsert requires a '{key}' column in both the file and {table}")
+
+        # updated_at is read as the classifier reads it. Rows without one (or with
+        # one it can't read) on either side cannot be ordered; the incoming row wins.
+        incoming = dict(zip(rel.columns, map(str, rel.types)))
+        v_col = _ident(version)
+        i_ts = timestamp_sql(v_col, incoming.get(version))
+        e_ts = timestamp_sql(v_col, existing.get(version))
+        replace = ""
+        if i_ts is not None and e_ts is not None:
+            # Text versions go into a timestamp column as the instants they name
+            # (a plain cast rejects e.g. 11:45Z).
+            staged = incoming[version]
+            as_stored = {"TIMESTAMP": "{}", "TIMESTAMP WITH TIME ZONE": "timezone('UTC', {})"}.get(existing[version])
+            if staged == "VARCHAR" and as_stored is not None:
+                replace = f" REPLACE ({as_stored.format(i_ts)} AS {v_col})"
+                staged = existing[version]
+            i_v, e_v = timestamp_sql(f"i.{v_col}", staged), "e.v"
+            newer = f"({i_v} IS NULL OR {e_v} IS NULL OR {i_v} > {e_v})"
+            order = f"ORDER BY {i_ts} DESC NULLS LAST"
+            latest = f"max({e_ts})"
+        else:
+            newer, order, latest = "TRUE", "", "NULL"
+
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            for col, typ in zip(rel.columns, rel.types):
+                if col not in existing:
+                    self.con.execute(f'ALTER TABLE {table} ADD COLUMN "{col}" {typ}')
+
+            self.con.execute(f"""
+                CREATE OR REPLACE TEMP TABLE upsert_incoming AS
+                SELECT *{replace} FROM rel
+                WHERE {key} IS NOT NULL
+                QUALIFY row_number() OVER (PARTITION BY CAST({key} AS VARCHAR) {order}) = 1
+            """)
+            self.con.execute(f"""
+                CREATE OR REPLACE TEMP TABLE upsert_plan AS
+                SELECT CAST(i.{key} AS VARCHAR) AS k,
+                       CASE WHEN e.k IS NULL THEN 'inserted'
+                            WHEN {newer} THEN 'updated'
+                            ELSE 'unchanged' END AS action
+                FROM upsert_incoming i
+                LEFT JOIN (
+                    SELECT CAST({key} AS VARCHAR) AS k, {latest} AS v FROM {table} GROUP BY 1
+                ) e ON e.k = CAST(i.{key} AS VARCHAR)
+            """)
+
+            self.con.execute(f"""
+                DELETE FROM {table}
+                WHERE CAST({key} AS VARCHAR) IN (SELECT k FROM upsert_plan WHERE action = 'updated')
+            """)
+            self.con.execute(f"""
+                INSERT INTO {table} BY NAME
+                SELECT * FROM upsert_incoming
+                WHERE CAST({key} AS VARCHAR) IN (SELECT k FROM upsert_plan WHERE action <> 'unchanged')
+            """)
+            if self._table_exists(DECISIONS):
+                # Changed rows lose their stored decision; materialize(incremental=True) refills them.
+                self.con.execute(f"""
+                    DELETE FROM {DECISIONS}
+                    WHERE transaction_id IN (SELECT k FROM upsert_plan WHERE action = 'updated')
+                """)
+
+            if self._table_exists(GENERATIONS):
+                # Keep /admin/generations current for the generation this upsert changed.
+                self.con.execute(
+                    f"UPDATE {GENERATIONS} SET rows = (SELECT COUNT(*) FROM {table}) WHERE physical = ?", [table]
+                )
+                self._merge_sources(table, mapping or {})
+            counts = dict(self.con.execute("SELECT action, COUNT(*) FROM upsert_plan GROUP BY 1").fetchall())
+            skipped = self.con.execute(f"SELECT COUNT(*) FROM rel WHERE {key} IS NULL").fetchone()[0]
+            self.con.execute("DROP TABLE upsert_incoming")
+            self.con.execute("DROP TABLE upsert_plan")
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+
+        return {
+            "mode": "upsert",
+            "inserted": counts.get("inserted", 0),
+            "updated": counts.get("updated", 0),
+            "unchanged": counts.get("unchanged", 0),
+            "skipped": skipped,
+        }
+
+    def _merge_sources(self, physical: str, mapping: Dict[str, str]):
+        """Adds the source columns of an upserted file to the generation's mapping."""
+        row = self.con.execute(f"SELECT mapping FROM {GENERATIONS} WHERE physical = ?", [physical]).fetchone()
+        if row is None:
+            return
+        current: Dict[str, str] = orjson.loads(row[0]) if row[0] else {}
+        merged = dict(current)
+        for field, srcs in mapping.items():
+            known = merged[field].split(", ") if field in merged else []
+            known += [s for s in srcs.split(", ") if s not in known]
+            merged[field] = ", ".join(known)
+        if merged != current:
+            self.con.execute(f"UPDATE {GENERATIONS} SET mapping = ? WHERE physical = ?",
+                             [orjson.dumps(merged).decode("utf-8"), physical])
+            # Stored decisions carry the old mapping_trace.
+            self.drop_decisions()
+
+    def export_partitioned(self, out_dir: str, table: str = "txns",
+                           partition_by: Sequence[str] = ("provider", "date")) -> Dict[str, Any]:
+        """
+        Writes `table` as Hive-partitioned Parquet (out_dir/provider=x/date=y/*.parquet),
+        replacing a previous export there (see check_export_dir). `date` is derived from created_at (else
+        updated_at) in UTC unless the table already has such a column. Readers
+        filtering on the partition keys only open the matching directories.
+        """
+        target = check_export_dir(out_dir)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with self._write_lock:
+            types = {r[0]: r[1] for r in self.con.execute(f"DESCRIBE {table}").fetchall()}
+            extra = ""
+            if "date" in partition_by and "date" not in types:
+                ts = next((c for c in ("created_at", "updated_at") if c in types), None)
+                if ts is None:
+                    raise DataSourceError(f"Cannot derive a date partition: {table} has no created_at/updated_at")
+                if types[ts] == "TIMESTAMP WITH TIME ZONE":
+                    expr = f"CAST(timezone('UTC', {ts}) AS DATE)"
+                elif types[ts] in ("TIMESTAMP", "DATE"):
+                    expr = f"CAST({ts} AS DATE)"
+                else:
+                    expr = f"CAST(TRY_CAST({ts} AS TIMESTAMP) AS DATE)"
+                extra, types["date"] = f", {expr} AS date", "DATE"
+            keys = [k for k in partition_by if k in types]
+            if not keys:
+                raise DataSourceError(f"None of the partition columns {list(partition_by)} exist in {table}")
+            path = str(out_dir).replace("'", "''")
+            self.con.execute(f"""
+                COPY (SELECT *{extra} FROM {table})
+                TO '{path}' (FORMAT PARQUET, PARTITION_BY ({", ".join(keys)}), OVERWRITE)
+            """)
+            (target / EXPORT_MARKER).touch()
+            rows = self.con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return {"path": str(out_dir), "partition_by": keys, "rows": rows}
+
+    @timed("store.lookup")
+    def lookup(self, txid: str, table: str = "txns", include_raw: bool = False) -> Dict[str, Any]:
+        """
+        The row for `txid` as a dict. Only the mapped columns are read unless
+        `include_raw` asks for every stored column.
+        """
+        table = self._resolve(table)
+        columns = "*" if include_raw else self._select(table)
+        q = f"SELECT {columns} FROM {table} WHERE {self._key(table)} = ? LIMIT 1"
+        with self.reader() as cur:
+            cur.execute(q, [str(txid)])
+            row = cur.fetchone()
+            names = [d[0] for d in cur.description]
+        if row is None:
             raise NotFoundError(f"transaction_id {txid} not found")
-        return df.iloc[0].to_dict()
+        return dict(zip(names, row))
 
     def stats(self, table: str = "txns") -> Dict[str, Any]:
         try:
-            cnt = self.con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            with self.reader() as cur:
+                cnt = cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
         except Exception:
             cnt = None
         return {"table": table, "count": cnt}
+
+    def drop_decisions(self):
+        with self._write_lock:
+            self.con.execute(f"DROP TABLE IF EXISTS {DECISIONS}")
+            self.con.execute(f"DROP TABLE IF EXISTS {DECISIONS_META}")
+            self._decisions_version = None
+
+    def materialize(self, engine: BatchClassifier, version: str, table: str = "txns",
+                    incremental: bool = False, chunk_size: int = 50_000) -> int:
+        """
+        Classifies every row of `table` once and stores the results in `decisions`,
+        keyed by transaction_id, together with the STUCK anchor timestamp.
+        `version` identifies the mapping/rules the decisions were computed under.
+        With incremental=True and a current table, only rows without a stored
+        decision (e.g. inserted or updated by an upsert) are classified.
+        """
+        with self._write_lock:
+            return self._materialize(engine, version, table, incremental, chunk_size)
+
+    def _materialize(self, engine: BatchClassifier, version: str, table: str,
+                     incremental: bool, chunk_size: int) -> int:
+        source = f"SELECT * FROM {table}"
+        if incremental and self.decisions_version() == version:
+            source = f"""
+                SELECT t.* FROM {table} t
+                WHERE trim(CAST(t.transaction_id AS VARCHAR)) <> ''
+                  AND CAST(t.transaction_id AS VARCHAR) NOT IN (SELECT transaction_id FROM {DECISIONS})
+            """
+        else:
+            self.drop_decisions()
+            self.con.execute(f"""
+                CREATE TABLE {DECISIONS} (
+                    transaction_id VARCHAR,
+                    status VARCHAR,
+                    confidence DOUBLE,
+                    reason VARCHAR,
+                    rules_fired VARCHAR[],
+                    evidence VARCHAR,
+                    updated_at VARCHAR,
+                    anchor_us BIGINT
+                )
+            """)
+
+        # Stream source rows on a separate cursor; `con` is busy with the inserts.
+        src = self.con.cursor()
+        written = 0
+        try:
+            decisions = engine.iter_decisions(src, source, count=False, sources=self.sources(table))
+            while True:
+                chunk = [d for _, d in zip(range(chunk_size), decisions)]
+                if not chunk:
+                    break
+                anchors = [stuck_anchor(d) for d in chunk]
+                self.con.execute(f"""
+                    INSERT INTO {DECISIONS}
+                    SELECT unnest(?::VARCHAR[]), unnest(?::VARCHAR[]), unnest(?::DOUBLE[]), unnest(?::VARCHAR[]),
+                           unnest(?::VARCHAR[][]), unnest(?::VARCHAR[]), unnest(?::VARCHAR[]), unnest(?::BIGINT[])
+                """, [
+                    [d.transaction_id for d in chunk],
+                    [d.status for d in chunk],
+                    [d.confidence for d in chunk],
+                    [d.reason for d in chunk],
+                    [list(d.rules_fired) for d in chunk],
+                    [orjson.dumps(d.evidence, default=_json_default).decode("utf-8") for d in chunk],
+                    [d.updated_at.isoformat() if d.updated_at else None for d in chunk],
+                    [(a - EPOCH) // timedelta(microseconds=1) if a else None for a in anchors],
+                ])
+                written += len(chunk)
+        finally:
+            src.close()
+
+        self.con.execute(f"CREATE INDEX IF NOT EXISTS idx_decisions_txid ON {DECISIONS}(transaction_id)")
+        self.con.execute(f"CREATE OR REPLACE TABLE {DECISIONS_META} AS SELECT ?::VARCHAR AS version, ?::VARCHAR AS source", [version, table])
+        self._decisions_version = version
+        return written
+
+    def decisions_version(self) -> Optional[str]:
+        return self._decisions_version
+
+    def lookup_decision(self, txid: str, version: str) -> Optional[Tuple[Decision, Optional[datetime]]]:
+        """
+        Returns the materialized (decision, stuck anchor) for txid, or None when no
+        current decision is stored for it (caller should classify live).
+        Read-only: decisions stored under another mapping/rules version are left
+        for the next materialize to replace.
+        """
+        if self.decisions_version() != version:
+            return None
+
+        with self.reader() as cur:
+            try:
+                row = cur.execute(f"""
+                    SELECT transaction_id, status, confidence, reason, rules_fired, evidence, updated_at, anchor_us
+                    FROM {DECISIONS} WHERE transaction_id = ? LIMIT 1
+                """, [str(txid)]).fetchone()
+            except duckdb.CatalogException:
+                row = None  # dropped by a concurrent rebuild
+        if row is None:
+            return None
+
+        txid, status, confidence, reason, rules_fired, evidence, updated_at, anchor_us = row
+        decision = Decision(
+            transaction_id=txid,
+            status=status,
+            confidence=confidence,
+            reason=reason,
+            evidence=orjson.loads(evidence),
+            rules_fired=rules_fired,
+            updated_at=datetime.fromisoformat(updated_at) if updated_at else None,
+        )
+        anchor = EPOCH + timedelta(microseconds=anchor_us) if anchor_us is not None else None
+        return decision, anchor
+
+    def build_stuck_index(self, engine: BatchClassifier, version: str, table: str = "txns") -> int:
+        """
+        Rebuilds `stuck_index`: one row per non-final transaction STUCK detection
+        applies to, with stuck_at = last activity + its (per-provider) threshold.
+        Rows are written sorted by stuck_at, so DuckDB's per-row-group min/max
+        turns `stuck_at < now` into a range scan whatever the thresholds.
+        """
+        with self._write_lock:
+            built = (self.generation, version)
+            if not self._table_exists(table):
+                self.con.execute(f"DROP TABLE IF EXISTS {STUCK_INDEX}")
+                self._stuck_built = built
+                return 0
+
+            now = datetime.now(timezone.utc)
+            source = f"SELECT * FROM {table}"
+            plan = engine.plan(self.con, source)
+            provider = next((f"_r{i}" for i, (c, _) in enumerate(plan.fields) if c == "provider"), "NULL")
+            now_us = (now - EPOCH) // timedelta(microseconds=1)
+            self.con.execute(f"""
+                CREATE OR REPLACE TEMP TABLE stuck_staging AS
+                SELECT _txid AS transaction_id, CAST({provider} AS VARCHAR) AS provider, _bucket AS bucket,
+                       coalesce(_u, _c) AS anchor, _stuck_min AS threshold_minutes,
+                       coalesce(_u, _c) + to_minutes(_stuck_min) AS stuck_at
+                FROM ({plan.query(source)})
+                WHERE NOT _fallback AND _branch IN ({STUCK}, {NON_FINAL})
+            """, [now_us])
+
+            # Rows the SQL can't judge exactly are classified in Python, as in BatchClassifier.
+            cur = self.con.execute(f"SELECT * FROM ({plan.query(source)}) WHERE _fallback", [now_us])
+            decode, extra = RowDecoder(plan, now), []
+            rb = plan.rulebook
+            for d in decode(cur.fetchall()):
+                anchor, rules = stuck_anchor(d), d.rules_fired
+                if anchor is None or "status_synonym_non_final" not in rules or "stuck_skipped_no_updated_at" in rules:
+                    continue
+                p = d.evidence.get("provider")
+                minutes = rb.stuck_minutes_for(p)
+                anchor = anchor.astimezone(timezone.utc).replace(tzinfo=None)
+                extra.append((d.transaction_id, None if p is None else str(p), d.evidence["bucket"],
+                              anchor, minutes, anchor + timedelta(minutes=minutes)))
+            if extra:
+                self.con.executemany("INSERT INTO stuck_staging VALUES (?, ?, ?, ?, ?, ?)", extra)
+
+            self.con.execute(f"""
+                CREATE OR REPLACE TABLE {STUCK_INDEX} AS
+                SELECT * FROM stuck_staging ORDER BY stuck_at, transaction_id
+            """)
+            self.con.execute("DROP TABLE stuck_staging")
+            self._stuck_built = built
+            return self.con.execute(f"SELECT COUNT(*) FROM {STUCK_INDEX}").fetchone()[0]
+
+    def _ensure_stuck_index(self, engine: BatchClassifier, version: str):
+        """Rebuilds the stuck index if an ingest or a rules change made it stale."""
+        with self._write_lock:
+            if self._stuck_built != (self.generation, version):
+                self.build_stuck_index(engine, version)
+
+    def _stuck_where(self, now: datetime, providers: Optional[List[str]],
+                     after: Optional[Tuple[datetime, str]] = None) -> Tuple[str, List[Any]]:
+        where, params = ["stuck_at < ?"], [now.astimezone(timezone.utc).replace(tzinfo=None)]
+        if providers:
+            where.append("lower(provider) IN (SELECT unnest(?::VARCHAR[]))")
+            params.append([p.lower() for p in providers])
+        if after is not None:
+            where.append("(stuck_at > ? OR (stuck_at = ? AND transaction_id > ?))")
+            params += [after[0], after[0], after[1]]
+        return " AND ".join(where), params
+
+    def stuck(self, engine: BatchClassifier, version: str, now: Optional[datetime] = None,
+              limit: int = 1000, after: Optional[Tuple[datetime, str]] = None,
+              providers: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        One keyset page of transactions STUCK at `now`, oldest stuck_at first,
+        strictly after the (stuck_at, transaction_id) of the previous page's last
+        row. Returns (rows, total stuck). The index is rebuilt on first use after
+        an ingest or a rules change.
+        """
+        self._ensure_stuck_index(engine, version)
+        now = now or datetime.now(timezone.utc)
+        with self.reader() as cur:
+            try:
+                where, params = self._stuck_where(now, providers)
+                total = cur.execute(f"SELECT COUNT(*) FROM {STUCK_INDEX} WHERE {where}", params).fetchone()[0]
+                where, params = self._stuck_where(now, providers, after)
+                rows = cur.execute(f"""
+                    SELECT transaction_id, provider, bucket, anchor, stuck_at, threshold_minutes
+                    FROM {STUCK_INDEX} WHERE {where}
+                    ORDER BY stuck_at, transaction_id
+                    LIMIT ?
+                """, [*params, limit]).fetchall()
+            except duckdb.CatalogException:
+                return [], 0
+        cols = ("transaction_id", "provider", "bucket", "last_activity", "stuck_at", "threshold_minutes")
+        return [dict(zip(cols, r)) for r in rows], total
+
+    def stuck_counts(self, engine: BatchClassifier, version: str, now: datetime,
+                     since: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        STUCK totals per provider at `now`, plus how many crossed their threshold after `since`.
+        """
+        self._ensure_stuck_index(engine, version)
+        where, params = self._stuck_where(now, None)
+        newly = "count(*) FILTER (WHERE stuck_at >= ?)" if since else "NULL"
+        if since:
+            params = [since.astimezone(timezone.utc).replace(tzinfo=None), *params]
+        with self.reader() as cur:
+            try:
+                rows = cur.execute(f"""
+                    SELECT provider, count(*), {newly} FROM {STUCK_INDEX} WHERE {where} GROUP BY 1 ORDER BY 1
+                """, params).fetchall()
+            except duckdb.CatalogException:
+                rows = []
+        return {
+            "stuck": sum(r[1] for r in rows),
+            "newly_stuck": sum(r[2] or 0 for r in rows) if since else None,
+            "by_provider": {r[0]: r[1] for r in rows},
+        }
@@ -0,0 +1,72 @@
+import base64
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .batch import EPOCH
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+NAIVE_EPOCH = EPOCH.replace(tzinfo=None)
+
+
+def encode_cursor(stuck_at: datetime, txid: str) -> str:
+    """Opaque keyset cursor for the row a page ended on."""
+    us = (stuck_at - NAIVE_EPOCH) // timedelta(microseconds=1)
+    return base64.urlsafe_b64encode(f"{us}:{txid}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        us, txid = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split(":", 1)
+        return NAIVE_EPOCH + timedelta(microseconds=int(us)), txid
+    except Exception:
+        raise ValueError("Malformed cursor")
+
+
+class StuckScanner:
+    """
+    Background thread that checks the stuck index every `interval` seconds and
+    keeps the latest per-provider counts (and how many turned STUCK since the
+    previous scan) for alerting. `scan` is called with (now, since).
+    """
+    def __init__(self, scan: Callable[[datetime, Optional[datetime]], Dict[str, Any]], interval: float):
+        self.scan = scan
+        self.interval = interval
+        self.last: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def run_once(self) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc)
+        since = datetime.fromisoformat(self.last["scanned_at"]) if self.last else None
+        result = {"scanned_at": now.isoformat(), **self.scan(now, since)}
+        if result.get("newly_stuck"):
+            logger.warning("stuck scan: %s newly stuck, %s stuck in total", result["newly_stuck"], result["stuck"])
+        self.last = result
+        return result
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning("stuck scan failed: %s", e)
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="stuck-scanner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
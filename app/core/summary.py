@@ -0,0 +1,130 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import duckdb
+
+from .batch import BatchClassifier, EPOCH, _ident
+
+GROUP_KEYS = ("provider", "currency", "status")
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def _naive_utc(dt: datetime) -> datetime:
+    """Compared against the engine's naive-UTC timestamps."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+@dataclass
+class SummaryFilters:
+    provider: List[str] = field(default_factory=list)
+    currency: List[str] = field(default_factory=list)
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    updated_after: Optional[datetime] = None
+    updated_before: Optional[datetime] = None
+    # Only rows whose last activity (updated_at, else created_at) is this recent.
+    last_minutes: Optional[int] = None
+
+
+def summarize(
+    engine: BatchClassifier,
+    con: duckdb.DuckDBPyConnection,
+    source: str,
+    filters: Optional[SummaryFilters] = None,
+    group_by: Sequence[str] = GROUP_KEYS,
+    now: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    Status counts, amount sums and amount percentiles per group, computed in
+    one DuckDB GROUP BY over the classification SQL BatchClassifier compiles
+    (bucket synonyms, hard-fail, error-implies-failed and STUCK included), so
+    no row is classified in Python. Rows BatchClassifier would hand to
+    classify_record are counted under their SQL status and reported as
+    `approximate_rows`.
+    """
+    filters = filters or SummaryFilters()
+    unknown = [g for g in group_by if g not in GROUP_KEYS]
+    if unknown:
+        raise ValueError(f"Cannot group by {unknown}; choose from {list(GROUP_KEYS)}")
+    if not source.lstrip().lower().startswith(("select", "with", "from")):
+        source = f"SELECT * FROM {source}"
+    now = now or datetime.now(timezone.utc)
+
+    plan = engine.plan(con, source)
+    col = {canonical: f"_r{i}" for i, (canonical, _) in enumerate(plan.fields)}
+
+    def text(canonical: str) -> str:
+        return f"CAST({col[canonical]} AS VARCHAR)" if canonical in col else "NULL::VARCHAR"
+
+    amount = f"TRY_CAST({col['amount']} AS DOUBLE)" if "amount" in col else "NULL::DOUBLE"
+
+    where: List[str] = []
+    params: List[Any] = []
+    # Case-insensitive, like the stuck index's provider filter.
+    for key, values in (("provider", filters.provider), ("currency", filters.currency)):
+        if values:
+            where.append(f"lower({key}) IN (SELECT unnest(?::VARCHAR[]))")
+            params.append([v.lower() for v in values])
+    for expr, op, value in (
+        ("_c", ">=", filters.created_after),
+        ("_c", "<", filters.created_before),
+        ("_u", ">=", filters.updated_after),
+        ("_u", "<", filters.updated_before),
+    ):
+        if value is not None:
+            where.append(f"{expr} {op} ?::TIMESTAMP")
+            params.append(_naive_utc(value))
+    if filters.last_minutes is not None:
+        where.append("coalesce(_u, _c) >= ?::TIMESTAMP")
+        params.append(_naive_utc(now - timedelta(minutes=filters.last_minutes)))
+
+    keys = [_ident(g) for g in group_by]
+    pcts = ", ".join(str(p) for p in PERCENTILES)
+    now_us = (now - EPOCH) // timedelta(microseconds=1)
+    sql = f"""
+        WITH d AS ({plan.query(source)}),
+        r AS (
+            SELECT {text('provider')} AS provider, {text('currency')} AS currency, status,
+                   {amount} AS _amount, _fallback, _u, _c
+            FROM d
+        )
+        SELECT {", ".join(keys + [""])}
+               count(*) AS count,
+               sum(_amount) AS amount_sum,
+               approx_quantile(_amount, [{pcts}]) AS amount_pcts,
+               count(*) FILTER (WHERE _fallback) AS approximate
+        FROM r
+        {"WHERE " + " AND ".join(where) if where else ""}
+        {"GROUP BY " + ", ".join(keys) if keys else ""}
+        {"ORDER BY " + ", ".join(f"{k} NULLS LAST" for k in keys) if keys else ""}
+    """
+    rows = con.execute(sql, [now_us, *params]).fetchall()
+
+    groups: List[Dict[str, Any]] = []
+    by_status: Dict[str, int] = {}
+    total = approximate = 0
+    for r in rows:
+        g = dict(zip(group_by, r[:len(keys)]))
+        count, amount_sum, amount_pcts, approx = r[len(keys):]
+        if count == 0:
+            continue
+        g["count"] = count
+        g["amount_sum"] = amount_sum
+        for p, v in zip(PERCENTILES, amount_pcts or [None] * len(PERCENTILES)):
+            g[f"amount_p{int(p * 100)}"] = v
+        groups.append(g)
+        total += count
+        approximate += approx
+        if "status" in g:
+            by_status[g["status"]] = by_status.get(g["status"], 0) + count
+    return {
+        "as_of": now.isoformat(),
+        "group_by": list(group_by),
+        "total": total,
+        "by_status": by_status,
+        "approximate_rows": approximate,
+        "groups": groups,
+    }
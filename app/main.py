@@ -1,5 +1,18 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .api.routes import router
+from .api.middleware import MetricsMiddleware, ProfilingMiddleware
+from .api.routes import parallel, profiles, router, slow_requests, stuck_scanner, workloads
 
-app = FastAPI(title="Transaction Status Agent", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stuck_scanner.start()
+    yield
+    stuck_scanner.stop()
+    for pool in workloads:
+        pool.shutdown()
+    parallel.close()
+
+app = FastAPI(title="Transaction Status Agent", version="1.0.0", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware, profiles=profiles, slow=slow_requests)
 app.include_router(router)
@@ -0,0 +1,251 @@
+import bisect
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; per-stage work spans ~10us (a parse) to seconds (an ingest).
+STAGE_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+REQUEST_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (labels, value) pairs of one metric family, as produced by a collector callback.
+Samples = Iterable[Tuple[Dict[str, str], float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, registry: "Registry", name: str, help: str, labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, registry: "Registry", name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        if not self.registry.enabled:
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="' + _num(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    """
+    Process-local metrics in the Prometheus text format. While `enabled` is
+    False, counters and histograms drop observations after one attribute check;
+    collectors (cheap snapshots such as cache stats) are read at scrape time either way.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        # Requests in flight collecting per-request breakdowns (see REQUEST_STAGES);
+        # stage timers also run while it is non-zero.
+        self.tracing = 0
+        self._tracing_lock = threading.Lock()
+        self._metrics: List[Any] = []
+        self._collectors: List[Tuple[str, str, str, Callable[[], Samples]]] = []
+
+    def begin_trace(self):
+        with self._tracing_lock:
+            self.tracing += 1
+
+    def end_trace(self):
+        with self._tracing_lock:
+            self.tracing -= 1
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(self, name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = STAGE_BUCKETS) -> Histogram:
+        metric = Histogram(self, name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, name: str, kind: str, help: str, fn: Callable[[], Samples]):
+        """Registers (or replaces) a family whose samples `fn` returns at scrape time."""
+        self._collectors = [c for c in self._collectors if c[0] != name]
+        self._collectors.append((name, kind, help, fn))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for name, kind, help, fn in self._collectors:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in fn():
+                lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "txn_stage_seconds", "Time spent per processing stage.", ("stage",)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "txn_http_request_seconds", "HTTP request latency by route.", ("method", "route", "status"), REQUEST_BUCKETS
+)
+ROWS_INGESTED = REGISTRY.counter(
+    "txn_rows_ingested_total", "Rows written by ingest, by mode and outcome.", ("mode", "outcome")
+)
+RULES_FIRED = REGISTRY.counter(
+    "txn_rules_fired_total", "Rules fired by decisions served.", ("rule",)
+)
+
+# stage -> seconds for the request being served, when its middleware asked for a breakdown.
+# Threadpool endpoints inherit a copy of the context, so they add to the same dict.
+REQUEST_STAGES: ContextVar[Optional[Dict[str, float]]] = ContextVar("txn_request_stages", default=None)
+
+
+def _record(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, name)
+    stages = REQUEST_STAGES.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+class stage:
+    """
+    `with stage("batch.fetch"): ...` records the block's duration under
+    txn_stage_seconds{stage="batch.fetch"} while metrics are enabled, and
+    adds it to the current request's REQUEST_STAGES while tracing.
+    """
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.t0: Optional[float] = None
+
+    def __enter__(self):
+        if REGISTRY.enabled or REGISTRY.tracing:
+            self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.t0 is not None:
+            _record(self.name, time.perf_counter() - self.t0)
+
+
+def timed(name: str):
+    """Decorator form of `stage` for functions on the hot path."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not (REGISTRY.enabled or REGISTRY.tracing):
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - t0)
+        return wrapper
+    return decorate
+
+
+def tally_rules(rules_fired: Iterable[Sequence[str]]) -> Dict[str, int]:
+    """rule -> how many of the given rules_fired lists contain it."""
+    totals: Dict[Any, int] = {}
+    for rules in rules_fired:
+        # Records on the same branch share one rules tuple, so most keys repeat.
+        key = rules if isinstance(rules, tuple) else tuple(rules)
+        totals[key] = totals.get(key, 0) + 1
+    merged: Dict[str, int] = {}
+    for rules, n in totals.items():
+        for rule in rules:
+            merged[rule] = merged.get(rule, 0) + n
+    return merged
+
+
+def add_rule_counts(tally: Dict[str, int]):
+    for rule, n in tally.items():
+        RULES_FIRED.inc(rule, amount=n)
+
+
+def count_rules(rules_fired: Iterable[Sequence[str]]):
+    """Adds decisions' rules_fired to txn_rules_fired_total (no-op while disabled)."""
+    if REGISTRY.enabled:
+        add_rule_counts(tally_rules(rules_fired))
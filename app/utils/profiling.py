@@ -0,0 +1,171 @@
+import heapq
+import os
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+# Collapsed-stack frame label per code object ("qualname (file:line)"), built once.
+_labels: Dict[Any, str] = {}
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        try:
+            rel = os.path.relpath(path)
+            path = rel if not rel.startswith("..") else os.path.basename(path)
+        except ValueError:
+            path = os.path.basename(path)
+        label = _labels[code] = f"{code.co_qualname} ({path}:{code.co_firstlineno})"
+    return label
+
+
+class Profile:
+    """
+    Wall-clock stack sampler for one request. A daemon thread reads the stacks
+    of the threads attached to the profile every `interval` seconds and counts
+    them in the collapsed format flamegraph tools read ("outer;inner N").
+
+    Stacks are cut at the frame that attached, so a sync endpoint running in
+    the threadpool and an async one on the event loop both start at the
+    endpoint; an event-loop sample taken while the endpoint is suspended in an
+    await (the loop is serving someone else) only counts towards `idle`.
+    """
+    def __init__(self, interval: float = 0.001):
+        self.id = uuid.uuid4().hex[:12]
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.idle = 0
+        self._anchors: Dict[int, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def attach(self, anchor):
+        """Samples the current thread below `anchor` (the caller's frame) until exit."""
+        tid = threading.get_ident()
+        self._anchors[tid] = anchor
+        try:
+            yield self
+        finally:
+            self._anchors.pop(tid, None)
+
+    def sample(self):
+        frames = sys._current_frames()
+        for tid, anchor in list(self._anchors.items()):
+            frame = frames.get(tid)
+            stack: List[str] = []
+            while frame is not None and frame is not anchor:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            if frame is None:
+                self.idle += 1
+                continue
+            if stack:
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name=f"profile-{self.id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self) -> str:
+        ordered = sorted(self.stacks.items(), key=lambda kv: -kv[1])
+        return "".join(f"{stack} {n}\n" for stack, n in ordered)
+
+
+# The profile of the request being served, if it asked for one.
+CURRENT_PROFILE: ContextVar[Optional[Profile]] = ContextVar("txn_current_profile", default=None)
+
+
+def call_profiled(fn, *args, **kwargs):
+    """fn(*args, **kwargs), sampling this thread into the request's profile if it has one."""
+    profile = CURRENT_PROFILE.get()
+    if profile is None:
+        return fn(*args, **kwargs)
+    with profile.attach(sys._getframe()):
+        return fn(*args, **kwargs)
+
+
+class ProfileStore:
+    """The last `keep` finished profiles: id -> (summary, collapsed stacks)."""
+    def __init__(self, keep: int = 50):
+        self.keep = keep
+        self._items: "OrderedDict[str, Tuple[Dict[str, Any], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, summary: Dict[str, Any], collapsed: str):
+        if self.keep <= 0:
+            return
+        with self._lock:
+            self._items[summary["profile_id"]] = (summary, collapsed)
+            while len(self._items) > self.keep:
+                self._items.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[str]:
+        item = self._items.get(profile_id)
+        return item[1] if item else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [summary for summary, _ in reversed(self._items.values())]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class SlowRequestLog:
+    """
+    The `keep` slowest requests seen since the last clear, kept in a min-heap
+    so a request that is not among them costs one comparison.
+    """
+    def __init__(self, keep: int = 0):
+        self.keep = keep
+        self._heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.keep > 0
+
+    def offer(self, record: Dict[str, Any]):
+        if self.keep <= 0:
+            return
+        duration = record["duration_ms"]
+        with self._lock:
+            if len(self._heap) >= self.keep and duration <= self._heap[0][0]:
+                return
+            self._seq += 1
+            item = (duration, self._seq, record)
+            if len(self._heap) >= self.keep:
+                heapq.heapreplace(self._heap, item)
+            else:
+                heapq.heappush(self._heap, item)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Slowest first."""
+        with self._lock:
+            return [record for _, _, record in sorted(self._heap, key=lambda item: -item[0])]
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
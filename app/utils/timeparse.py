@@ -1,16 +1,89 @@
-from datetime import datetime, timezone
+import numbers
+import re
+from datetime import datetime, timezone, timedelta
+from typing import Any, Iterable, List, Optional
 from dateutil.parser import parse
 
+from .metrics import timed
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# ISO-8601 shapes datetime.fromisoformat and dateutil read identically.
+# An offset only follows a time: "2026-01-10+05:00" is not ISO and goes to dateutil.
+_ISO = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?(?:Z|[+-]\d{2}:?\d{2})?)?")
+_EPOCH = re.compile(r"\d{13}|\d{10}(?:\.\d{1,6})?")
+# Larger magnitudes are epoch milliseconds (1e11 s is the year 5138, 1e11 ms is 1973).
+EPOCH_MS_THRESHOLD = 100_000_000_000
+
+
+def _from_epoch(value) -> Optional[datetime]:
+    try:
+        if abs(value) >= EPOCH_MS_THRESHOLD:
+            return EPOCH + timedelta(milliseconds=value)
+        return EPOCH + timedelta(seconds=value)
+    except (OverflowError, ValueError):
+        return None
+
+
+def _from_str(value: str) -> Optional[datetime]:
+    if _ISO.fullmatch(value):
+        try:
+            return datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+        except ValueError:
+            pass
+    elif _EPOCH.fullmatch(value):
+        return _from_epoch(float(value) if "." in value else int(value))
+    try:
+        return parse(value)
+    except Exception:
+        return None
+
+
+@timed("parse_dt")
 def parse_dt(value):
+    """
+    Tiered parser: native datetimes (incl. pandas Timestamp) pass through,
+    ISO-8601 strings use datetime.fromisoformat, epoch seconds/millis are
+    converted arithmetically, and only odd strings reach dateutil.
+    Naive results are taken to be UTC.
+    """
     if value is None:
         return None
     if isinstance(value, datetime):
         dt = value
+    elif isinstance(value, str):
+        dt = _from_str(value)
+    elif isinstance(value, numbers.Real) and not isinstance(value, bool):
+        dt = _from_epoch(value)
     else:
         try:
             dt = parse(str(value))
         except Exception:
             return None
+    if dt is None:
+        return None
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=timezone.utc)
     return dt
+
+
+def parse_dt_column(values: Iterable[Any]) -> List[Optional[datetime]]:
+    """
+    parse_dt over a whole column. Values are dispatched on type once per
+    element with the common ISO string case inlined; results equal parse_dt.
+    """
+    fromiso = datetime.fromisoformat
+    iso = _ISO.fullmatch
+    utc = timezone.utc
+    out: List[Optional[datetime]] = []
+    append = out.append
+    for v in values:
+        if type(v) is str and iso(v):
+            try:
+                dt = fromiso(v[:-1] + "+00:00" if v.endswith("Z") else v)
+                append(dt if dt.tzinfo is not None else dt.replace(tzinfo=utc))
+                continue
+            except ValueError:
+                pass
+        append(parse_dt(v))
+    return out
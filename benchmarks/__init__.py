@@ -0,0 +1,6 @@
+"""
+Benchmark suite for the ingest, lookup, batch and classification paths.
+
+    python -m benchmarks --sizes 10k,100k,1M --out results.json
+    python -m benchmarks.compare baseline.json results.json
+"""
@@ -0,0 +1,82 @@
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.classifier import Agent
+
+from .harness import environment, parse_size
+from .suites import SUITES, Context
+
+
+def run(sizes: List[int], suites: List[str], workdir: Path, **options) -> Dict[str, Any]:
+    agent = Agent(settings.MAPPINGS_PATH, settings.SYNONYMS_PATH, settings.RULES_PATH)
+    runs = []
+    for rows in sizes:
+        ctx = Context(rows, workdir, agent, **options)
+        result: Dict[str, Any] = {"rows": rows}
+        if "ingest" in suites:
+            print(f"[{rows}] ingest", file=sys.stderr)
+            result["ingest"] = SUITES["ingest"](ctx)
+        rest = [s for s in suites if s != "ingest"]
+        if rest:
+            ctx.open()
+            try:
+                for name in rest:
+                    print(f"[{rows}] {name}", file=sys.stderr)
+                    result[name] = SUITES[name](ctx)
+            finally:
+                ctx.close()
+        runs.append(result)
+    return {"environment": environment(), "options": {"suites": suites, **options}, "runs": runs}
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark ingest, lookup, batch and classification.")
+    ap.add_argument("--sizes", default="10k,100k", help="comma-separated row counts, e.g. 10k,100k,1M,10M")
+    ap.add_argument("--suites", default=",".join(SUITES), help=f"comma-separated subset of {','.join(SUITES)}")
+    ap.add_argument("--formats", default="csv,ndjson,parquet", help="file formats for the ingest suite")
+    ap.add_argument("--lookups", type=int, default=1_000, help="single lookups to time")
+    ap.add_argument("--batch-sizes", default="10,100,1k,10k", help="ids per batch lookup")
+    ap.add_argument("--requests", type=int, default=2_000, help="requests in the load suite")
+    ap.add_argument("--concurrency", type=int, default=32, help="concurrent clients in the load suite")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--workdir", help="where datasets and databases go; generated files are reused (default: temp dir)")
+    ap.add_argument("--out", help="write results JSON here (default: stdout)")
+    args = ap.parse_args(argv)
+
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    unknown = sorted(set(suites) - set(SUITES))
+    if unknown:
+        ap.error(f"unknown suites {unknown}; choose from {list(SUITES)}")
+    options = {
+        "seed": args.seed,
+        "formats": [f.strip() for f in args.formats.split(",") if f.strip()],
+        "lookups": args.lookups,
+        "batch_sizes": [parse_size(s) for s in args.batch_sizes.split(",")],
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+    }
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+
+    if args.workdir:
+        workdir = Path(args.workdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+        results = run(sizes, suites, workdir, **options)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+            results = run(sizes, suites, Path(tmp), **options)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+        print(f"[done] results -> {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
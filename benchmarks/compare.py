@@ -0,0 +1,65 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Suffix -> +1 if higher is better, -1 if lower is better. Other numbers (counts, sizes) are not compared.
+DIRECTIONS = (("_per_s", 1), ("_ms", -1), ("seconds", -1), ("peak_heap_mb", -1), ("peak_rss_mb", -1))
+
+
+def _direction(key: str) -> Optional[int]:
+    return next((d for suffix, d in DIRECTIONS if key.endswith(suffix)), None)
+
+
+def flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    """{"<rows>.<suite>.<...>.<metric>": value} for every comparable metric of a results file."""
+    out: Dict[str, float] = {}
+
+    def walk(prefix: str, value: Any):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                walk(f"{prefix}.{k}", v)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and _direction(prefix) is not None:
+            out[prefix] = float(value)
+
+    for run in results.get("runs", []):
+        walk(str(run["rows"]), {k: v for k, v in run.items() if k != "rows"})
+    return out
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            threshold: float = 0.10) -> List[Tuple[str, float, float, float]]:
+    """
+    (metric, baseline, current, relative change) for metrics present in both
+    files that got worse by more than `threshold` (0.10 = 10%).
+    """
+    old, new = flatten(baseline), flatten(current)
+    regressions = []
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        if a == 0:
+            continue
+        change = (b - a) / a
+        if -_direction(key) * change > threshold:
+            regressions.append((key, a, b, change))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.compare", description="Report metrics that regressed between two result files.")
+    ap.add_argument("baseline")
+    ap.add_argument("current")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    args = ap.parse_args(argv)
+
+    load = lambda p: json.loads(Path(p).read_text(encoding="utf-8"))
+    regressions = compare(load(args.baseline), load(args.current), args.threshold)
+    for key, a, b, change in regressions:
+        print(f"{key:<60} {a:>12.3f} -> {b:>12.3f} ({change:+.0%})")
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
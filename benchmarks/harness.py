@@ -0,0 +1,91 @@
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import duckdb
+
+from scripts.generate_synthetic import parse_size, write_dataset
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds for samples in seconds (nearest-rank)."""
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+    rank = lambda p: ordered[min(len(ordered) - 1, max(0, int(round(p * len(ordered))) - 1))]
+    return {
+        "n": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1e3,
+        "p50_ms": rank(0.50) * 1e3,
+        "p90_ms": rank(0.90) * 1e3,
+        "p99_ms": rank(0.99) * 1e3,
+        "max_ms": ordered[-1] * 1e3,
+    }
+
+
+def timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def traced(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    """
+    Runs fn under tracemalloc; returns (result, peak Python heap in MB).
+    DuckDB's own buffers are not Python allocations, see peak_rss_mb for those.
+    """
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / 2**20
+
+
+def peak_rss_mb() -> float:
+    """High-water mark of the whole process (never goes down)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=Path(__file__).resolve().parents[1],
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "duckdb": duckdb.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def dataset(workdir: Path, rows: int, fmt: str, seed: int) -> Path:
+    """The synthetic file for (rows, format, seed), generated once per workdir."""
+    path = workdir / f"synthetic_{rows}_{seed}.{fmt}"
+    if not path.exists():
+        write_dataset(path, rows, seed=seed)
+    return path
+
+
+def sample_ids(con: duckdb.DuckDBPyConnection, n: int, seed: int, table: str = "txns") -> List[str]:
+    return [r[0] for r in con.execute(
+        f"SELECT transaction_id FROM {table} USING SAMPLE reservoir({int(n)} ROWS) REPEATABLE ({int(seed)})"
+    ).fetchall()]
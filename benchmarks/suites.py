@@ -0,0 +1,189 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import httpx
+
+from app.core.batch import BatchClassifier
+from app.core.classifier import Agent
+from app.core.store import TransactionStore
+
+from .harness import dataset, peak_rss_mb, percentiles, sample_ids, timed, traced
+
+
+@dataclass
+class Context:
+    rows: int
+    workdir: Path
+    agent: Agent
+    seed: int = 7
+    formats: Sequence[str] = ("csv", "ndjson", "parquet")
+    lookups: int = 1_000
+    batch_sizes: Sequence[int] = (10, 100, 1_000, 10_000)
+    requests: int = 2_000
+    concurrency: int = 32
+    store: TransactionStore = field(init=False)
+    engine: BatchClassifier = field(init=False)
+
+    def __post_init__(self):
+        self.engine = BatchClassifier(self.agent.mapper, self.agent.rulebook)
+
+    def open(self):
+        """The store every suite except `ingest` reads, loaded from the Parquet dataset."""
+        db = self.workdir / f"bench_{self.rows}.duckdb"
+        _remove_db(db)
+        self.store = TransactionStore(str(db), mapper=self.agent.mapper)
+        self.store.ingest(str(dataset(self.workdir, self.rows, "parquet", self.seed)))
+
+    def close(self):
+        self.store.close()
+        _remove_db(Path(self.store.duckdb_path))
+
+
+def _remove_db(path: Path):
+    for p in (path, path.with_name(path.name + ".wal")):
+        p.unlink(missing_ok=True)
+
+
+def ingest(ctx: Context) -> Dict[str, Any]:
+    """Replace-ingest of the same rows from each file format into a fresh database."""
+    out: Dict[str, Any] = {}
+    for fmt in ctx.formats:
+        path = dataset(ctx.workdir, ctx.rows, fmt, ctx.seed)
+        db = ctx.workdir / f"ingest_{fmt}.duckdb"
+        _remove_db(db)
+        store = TransactionStore(str(db), mapper=ctx.agent.mapper)
+        try:
+            _, seconds = timed(lambda: store.ingest(str(path)))
+        finally:
+            store.close()
+            _remove_db(db)
+        out[fmt] = {
+            "seconds": seconds,
+            "rows_per_s": ctx.rows / seconds,
+            "file_mb": path.stat().st_size / 2**20,
+        }
+    return out
+
+
+def lookup(ctx: Context) -> Dict[str, Any]:
+    """Single-row fetch, and fetch + classify as GET /transaction does without cache or materialization."""
+    ids = sample_ids(ctx.store.con, ctx.lookups, ctx.seed)
+    fetch: List[float] = []
+    decide: List[float] = []
+    for txid in ids:
+        t0 = time.perf_counter()
+        row = ctx.store.lookup(txid)
+        t1 = time.perf_counter()
+        ctx.agent.evaluate(row)
+        t2 = time.perf_counter()
+        fetch.append(t1 - t0)
+        decide.append(t2 - t0)
+    return {"fetch": percentiles(fetch), "fetch_and_classify": percentiles(decide)}
+
+
+def batch(ctx: Context, repeats: int = 5) -> Dict[str, Any]:
+    """POST /transactions/status work (fetch, classify, serialize) per batch size."""
+    out: Dict[str, Any] = {}
+    for size in ctx.batch_sizes:
+        if size > ctx.rows:
+            continue
+        ids = sample_ids(ctx.store.con, size, ctx.seed + size)
+        samples: List[float] = []
+        query = ctx.store.ids_query()
+        for _ in range(repeats):
+            with ctx.store.reader() as cur:
+                _, seconds = timed(lambda: b",".join(
+                    d.to_json() for d in ctx.engine.classify(cur, query, [ids])
+                ))
+            samples.append(seconds)
+        stats = percentiles(samples)
+        out[str(size)] = {**stats, "ids_per_s": size / (stats["p50_ms"] / 1e3)}
+    return out
+
+
+def classify(ctx: Context) -> Dict[str, Any]:
+    """Whole-table classification to JSON: throughput, then peak Python heap on a second pass."""
+    def run() -> int:
+        with ctx.store.reader() as cur:
+            return sum(len(d.to_json()) for d in ctx.engine.iter_decisions(cur, "txns"))
+
+    out_bytes, seconds = timed(run)
+    _, peak_mb = traced(run)
+    return {
+        "seconds": seconds,
+        "rows_per_s": ctx.rows / seconds,
+        "output_mb": out_bytes / 2**20,
+        "peak_heap_mb": peak_mb,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def _drive(app, ids: List[str], requests: int, concurrency: int, seed: int,
+                 batch_every: int, batch_size: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    plan = [rng.choice(ids) if i % batch_every else rng.sample(ids, min(batch_size, len(ids)))
+            for i in range(1, requests + 1)]
+    latencies: Dict[str, List[float]] = {"single": [], "batch": []}
+    errors = 0
+    pending = iter(plan)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            nonlocal errors
+            for item in pending:
+                t0 = time.perf_counter()
+                if isinstance(item, list):
+                    resp = await client.post("/transactions/status", json={"transaction_ids": item})
+                    kind = "batch"
+                else:
+                    resp = await client.get(f"/transaction/{item}")
+                    kind = "single"
+                latencies[kind].append(time.perf_counter() - t0)
+                errors += resp.status_code != 200
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        seconds = time.perf_counter() - t0
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "seconds": seconds,
+        "requests_per_s": requests / seconds,
+        "single": percentiles(latencies["single"]),
+        "batch": {**percentiles(latencies["batch"]), "ids": batch_size},
+    }
+
+
+def load(ctx: Context, batch_every: int = 10, batch_size: int = 100) -> Dict[str, Any]:
+    """
+    Concurrent requests against the FastAPI app in-process (no sockets): mostly
+    single lookups with one batch of `batch_size` ids every `batch_every` requests.
+    """
+    from app.api import routes
+    from app.core.cache import DecisionCache
+    from app.main import app
+
+    ids = sample_ids(ctx.store.con, min(ctx.rows, 10_000), ctx.seed)
+    saved = routes.store, routes.decision_cache
+    routes.store = ctx.store
+    routes.decision_cache = DecisionCache(saved[1].max_size, saved[1].ttl_seconds)
+    try:
+        result = asyncio.run(_drive(app, ids, ctx.requests, ctx.concurrency, ctx.seed, batch_every, batch_size))
+        result["cache"] = routes.decision_cache.stats()
+    finally:
+        routes.store, routes.decision_cache = saved
+    return result
+
+
+SUITES: Dict[str, Callable[[Context], Dict[str, Any]]] = {
+    "ingest": ingest,
+    "lookup": lookup,
+    "batch": batch,
+    "classify": classify,
+    "load": load,
+}
@@ -0,0 +1,72 @@
+import sys
+import time
+from pathlib import Path
+
+# Ensure project root is on PYTHONPATH
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import duckdb
+
+TABLE_ROWS = 1_000_000
+SIZES = [1_000, 10_000, 100_000]
+REPEAT = 3
+
+
+def temp_table_lookup(con, ids):
+    """The previous batch path: temp table + executemany + CAST join."""
+    con.execute("CREATE TEMP TABLE req_ids(txid VARCHAR)")
+    con.executemany("INSERT INTO req_ids VALUES (?)", [(x,) for x in ids])
+    rows = con.execute("""
+        SELECT t.*
+        FROM txns t
+        JOIN req_ids r
+          ON CAST(t.transaction_id AS VARCHAR) = r.txid
+    """).fetchall()
+    con.execute("DROP TABLE req_ids")
+    return rows
+
+
+def list_param_lookup(con, ids):
+    """Current batch path: ids bound as one VARCHAR[] parameter."""
+    return con.execute("""
+        SELECT t.*
+        FROM txns t
+        JOIN (SELECT unnest(?::VARCHAR[]) AS txid) r
+          ON t.transaction_id = r.txid
+    """, [ids]).fetchall()
+
+
+def best_of(fn, con, ids):
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        n = len(fn(con, ids))
+        best = min(best, time.perf_counter() - t0)
+    assert n == len(ids)
+    return best
+
+
+def main():
+    con = duckdb.connect()
+    print(f"[start] building {TABLE_ROWS} row table")
+    con.execute(f"""
+        CREATE TABLE txns AS
+        SELECT 'tx_' || i AS transaction_id,
+               (['success', 'failed', 'pending', 'processing'])[1 + i % 4] AS status,
+               TIMESTAMP '2026-01-01' + INTERVAL (i) SECOND AS updated_at
+        FROM range({TABLE_ROWS}) r(i)
+    """)
+    con.execute("CREATE INDEX idx_txid ON txns(transaction_id)")
+
+    print(f"{'ids':>8} {'temp table (s)':>15} {'list param (s)':>15} {'speedup':>8}")
+    for n in SIZES:
+        ids = [f"tx_{i}" for i in range(0, TABLE_ROWS, TABLE_ROWS // n)][:n]
+        old = best_of(temp_table_lookup, con, ids)
+        new = best_of(list_param_lookup, con, ids)
+        print(f"{n:>8} {old:>15.4f} {new:>15.4f} {old / new:>7.1f}x")
+    con.close()
+
+
+if __name__ == "__main__":
+    main()
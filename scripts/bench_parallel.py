@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+# Ensure project root is on PYTHONPATH
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import duckdb
+
+from app.core.config import settings
+from app.core.classifier import Agent
+from app.core.batch import BatchClassifier
+from app.core.parallel import ParallelClassifier
+
+TABLE_ROWS = 500_000
+# Share of rows whose offsets DuckDB can't normalize exactly, so they go through classify_record.
+FALLBACK_RATIO = 0.2
+
+
+def build(con):
+    con.execute(f"""
+        CREATE TABLE txns AS
+        SELECT 'tx_' || i AS transaction_id,
+               (['success', 'failed', 'pending', 'processing', 'queued', 'declined'])[1 + i % 6] AS status,
+               strftime(TIMESTAMP '2026-01-01' + INTERVAL (i) SECOND, '%Y-%m-%dT%H:%M:%S')
+                 || CASE WHEN random() < {FALLBACK_RATIO} THEN '+05:30' ELSE 'Z' END AS updated_at,
+               CASE WHEN i % 50 = 0 THEN 'E401' END AS error_code
+        FROM range({TABLE_ROWS}) r(i)
+    """)
+
+
+def serial_json(engine, con):
+    return sum(len(d.to_json()) for d in engine.iter_decisions(con, "txns"))
+
+
+def parallel_json(par, con):
+    return sum(len(part) for _, part in par.iter_encoded(con, "txns"))
+
+
+def main():
+    agent = Agent(settings.MAPPINGS_PATH, settings.SYNONYMS_PATH, settings.RULES_PATH)
+    engine = BatchClassifier(agent.mapper, agent.rulebook)
+    con = duckdb.connect()
+    print(f"[start] building {TABLE_ROWS} row table ({FALLBACK_RATIO:.0%} fallback rows)")
+    build(con)
+
+    t0 = time.perf_counter()
+    serial_json(engine, con)
+    base = time.perf_counter() - t0
+    print(f"{'workers':>8} {'seconds':>9} {'rows/s':>10} {'speedup':>8} {'efficiency':>10}")
+    print(f"{'serial':>8} {base:>9.2f} {TABLE_ROWS / base:>10,.0f} {1.0:>7.1f}x {'':>10}")
+
+    cpus = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, 16, 32, cpus} & set(range(1, cpus + 1)))
+    for workers in counts:
+        par = ParallelClassifier(engine, workers)
+        try:
+            par.pool.submit(int).result()  # process start-up is not part of the measurement
+            t0 = time.perf_counter()
+            parallel_json(par, con)
+            t = time.perf_counter() - t0
+        finally:
+            par.close()
+        print(f"{workers:>8} {t:>9.2f} {TABLE_ROWS / t:>10,.0f} {base / t:>7.1f}x {base / t / workers:>9.0%}")
+    con.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import random
+import sys
+import time
+from datetime import timezone
+from pathlib import Path
+
+# Ensure project root is on PYTHONPATH
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from dateutil.parser import parse
+
+from app.utils.timeparse import parse_dt, parse_dt_column
+from scripts.generate_synthetic import row_generator
+
+ROWS = 50_000
+REPEAT = 3
+
+
+def dateutil_parse_dt(value):
+    """The previous implementation: dateutil for every non-datetime value."""
+    if value is None:
+        return None
+    try:
+        dt = parse(str(value))
+    except Exception:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def best_of(fn, values):
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        out = fn(values)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    random.seed(7)
+    rows = list(row_generator(ROWS))
+    # created_at / updated_at exactly as generate_synthetic writes them
+    values = [r[2] for r in rows] + [r[3] for r in rows]
+    print(f"[start] {len(values)} synthetic timestamps")
+
+    old, want = best_of(lambda vs: [dateutil_parse_dt(v) for v in vs], values)
+    new, got = best_of(lambda vs: [parse_dt(v) for v in vs], values)
+    col, got_col = best_of(parse_dt_column, values)
+    assert got == want and got_col == want
+
+    print(f"{'parser':>16} {'seconds':>9} {'us/value':>9} {'speedup':>8}")
+    for name, t in (("dateutil", old), ("parse_dt", new), ("parse_dt_column", col)):
+        print(f"{name:>16} {t:>9.3f} {t / len(values) * 1e6:>9.2f} {old / t:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
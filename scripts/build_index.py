@@ -1,3 +1,4 @@
+import argparse
 import sys
 from pathlib import Path
 
@@ -7,11 +8,27 @@ sys.path.insert(0, str(ROOT))
 
 from app.core.config import settings
 from app.core.store import TransactionStore
+from app.core.classifier import Agent
+from app.core.batch import BatchClassifier
 
 def main():
+    ap = argparse.ArgumentParser(description="Ingest data files into the DuckDB store.")
+    ap.add_argument("--data", nargs="+", default=[settings.DATA_PATH],
+                    help="files, directories or globs to ingest (default: DATA_PATH)")
+    ap.add_argument("--partition-dir", help="also write the table as Parquet partitioned by provider/date")
+    args = ap.parse_args()
+
     settings.ensure_dirs()
-    store = TransactionStore(settings.DUCKDB_PATH)
-    store.ingest(settings.DATA_PATH)
+    agent = Agent(settings.MAPPINGS_PATH, settings.SYNONYMS_PATH, settings.RULES_PATH)
+    store = TransactionStore(settings.DUCKDB_PATH, read_pool_size=settings.READ_POOL_SIZE, mapper=agent.mapper,
+                             keep_generations=settings.KEEP_GENERATIONS)
+    result = store.ingest(args.data)
+    print("Ingested files:", result["files"])
+    if args.partition_dir:
+        print("Partitioned:", store.export_partitioned(args.partition_dir))
+    if settings.MATERIALIZE_DECISIONS:
+        n = store.materialize(BatchClassifier(agent.mapper, agent.rulebook), agent.version)
+        print("Materialized decisions:", n)
     print("Built store:", store.stats())
     store.close()
 
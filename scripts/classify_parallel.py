@@ -0,0 +1,59 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Ensure project root is on PYTHONPATH
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import duckdb
+
+from app.core.config import settings
+from app.core.classifier import Agent
+from app.core.batch import BatchClassifier
+from app.core.parallel import ParallelClassifier
+from app.connectors.loader import resolve_sources, duckdb_relation
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Classify a whole table or data file across worker processes.")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--data", nargs="+", help="CSV/JSON/NDJSON/Parquet files, directories or globs to classify (read directly, not ingested)")
+    src.add_argument("--table", default="txns", help="table in --db to classify (default: txns)")
+    ap.add_argument("--db", default=settings.DUCKDB_PATH, help="DuckDB file, opened read-only")
+    ap.add_argument("--workers", type=int, default=settings.PARALLEL_WORKERS, help="0 = one per CPU")
+    ap.add_argument("--chunk-size", type=int, default=20_000)
+    ap.add_argument("--out", help="write decisions as NDJSON here (default: counts only)")
+    args = ap.parse_args()
+
+    agent = Agent(settings.MAPPINGS_PATH, settings.SYNONYMS_PATH, settings.RULES_PATH)
+    if args.data:
+        files = resolve_sources(args.data)
+        con = duckdb.connect()
+        duckdb_relation(con, files, lambda rel: agent.mapper.map_batch(rel)[0]).create_view("src")
+        source = "src"
+    else:
+        con = duckdb.connect(args.db, read_only=True)
+        source = args.table
+
+    par = ParallelClassifier(BatchClassifier(agent.mapper, agent.rulebook), args.workers, args.chunk_size)
+    out = open(args.out, "wb") if args.out else None
+    rows = 0
+    t0 = time.perf_counter()
+    try:
+        for txids, part in par.iter_encoded(con, source):
+            rows += len(txids)
+            if out is not None and part:
+                out.write(part + b"\n")
+    finally:
+        par.close()
+        if out is not None:
+            out.close()
+        con.close()
+    elapsed = time.perf_counter() - t0
+    print(f"[done] {rows} rows in {elapsed:.2f}s with {par.workers} workers ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
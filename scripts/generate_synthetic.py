@@ -1,85 +1,318 @@
-import csv
-import random
-import uuid
-from datetime import datetime, timedelta, timezone
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
 import duckdb
+import numpy as np
+import yaml
+
+# Ensure project root is on PYTHONPATH
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
 
 STATUSES = [
     "success", "failed", "pending", "processing",
     "queued", "declined", "settled", "in_progress",
     "authorizing", "capturing"
 ]
+NON_FINAL = {"pending", "processing", "queued", "in_progress", "authorizing", "capturing"}
+FINAL = [s for s in STATUSES if s not in NON_FINAL]
+FAILING = {"failed", "declined"}
+ERROR_CODES = ["E401", "E403", "DO_NOT_HONOR", "X999"]
+ERROR_MESSAGES = ["insufficient funds", "invalid account", "unknown error"]
+CURRENCIES = ["INR", "USD", "EUR"]
+PROVIDERS = ["stripe", "adyen", "paypal", "razorpay"]
+
+HEADERS = [
+    "transaction_id", "status", "created_at", "updated_at",
+    "error_code", "error_message", "amount", "currency", "provider"
+]
+# Header -> canonical field in mappings.yaml, for column-name variants.
+CANONICAL = {"status": "status_raw"}
+TIMESTAMPS = {"created_at", "updated_at"}
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".parquet": "parquet"}
+COPY_OPTIONS = {"csv": "FORMAT CSV, HEADER", "ndjson": "FORMAT JSON", "parquet": "FORMAT PARQUET"}
+
+UNITS = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10_000, '10M' -> 10_000_000, '2500' -> 2500."""
+    text = text.strip().lower().replace("_", "")
+    if text and text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def _stuck_minutes() -> int:
+    cfg = yaml.safe_load((ROOT / "configs" / "rules.yaml").read_text(encoding="utf-8")) or {}
+    return int(cfg.get("stuck_threshold_minutes", 30))
+
+
+@dataclass(frozen=True)
+class Spec:
+    """
+    What to generate. Rows are reproducible from (seed, chunk_rows, now) whatever
+    the number of workers: chunk i always draws from default_rng([seed, i]).
+    """
+    seed: int = 0
+    now: datetime = field(default_factory=lambda: datetime.now(timezone.utc).replace(microsecond=0))
+    # Relative weight per raw status; defaults to uniform over STATUSES.
+    status_weights: Tuple[Tuple[str, float], ...] = tuple((s, 1.0) for s in STATUSES)
+    # Share of non-final rows last updated longer ago than the stuck threshold.
+    stuck_ratio: float = 0.05
+    stuck_minutes: int = field(default_factory=_stuck_minutes)
+    # Share of rows carrying error info regardless of status.
+    error_ratio: float = 0.02
+    # Share of rows repeating an earlier row of the same chunk verbatim.
+    duplicate_ratio: float = 0.0
+    # Share of rows that are a later update (final status, newer updated_at) of an earlier transaction.
+    late_update_ratio: float = 0.0
+    # Use a random alias from mappings.yaml for every column (one choice per output file).
+    column_variants: bool = False
+
+
+def column_names(spec: Spec, salt: int = 0) -> Dict[str, str]:
+    """Header -> output column name; aliases are drawn deterministically per file."""
+    if not spec.column_variants:
+        return {h: h for h in HEADERS}
+    cfg = yaml.safe_load((ROOT / "configs" / "mappings.yaml").read_text(encoding="utf-8"))
+    aliases = cfg.get("canonical_fields", {})
+    rng = np.random.default_rng([spec.seed, salt, 1])
+    names: Dict[str, str] = {}
+    taken = set()
+    for h in HEADERS:
+        options = [a for a in aliases.get(CANONICAL.get(h, h), [h]) if a.lower() not in taken] or [h]
+        names[h] = options[int(rng.integers(len(options)))]
+        taken.add(names[h].lower())
+    return names
+
+
+def _chunk(spec: Spec, index: int, start: int, rows: int) -> Dict[str, np.ndarray]:
+    """
+    One chunk as NumPy columns: indexes into the value lists, and times as
+    seconds before `now`. Strings are only built by DuckDB while writing.
+    """
+    rng = np.random.default_rng([spec.seed, index])
+    names = [s for s, _ in spec.status_weights]
+    weights = np.array([w for _, w in spec.status_weights], dtype=float)
+    status_of = np.array([STATUSES.index(s) for s in names], dtype=np.int8)
+    status = status_of[rng.choice(len(names), size=rows, p=weights / weights.sum())]
+
+    created = rng.integers(0, 5000 * 60, rows)
+    updated = np.maximum(created - rng.integers(0, 200 * 60, rows), 0)
+
+    non_final = np.isin(status, [STATUSES.index(s) for s in NON_FINAL])
+    stuck = non_final & (rng.random(rows) < spec.stuck_ratio)
+    fresh = non_final & ~stuck
+    threshold = spec.stuck_minutes * 60
+    updated[fresh] = rng.integers(0, threshold, int(fresh.sum()))
+    updated[stuck] = rng.integers(threshold + 60, 10 * threshold + 120, int(stuck.sum()))
+    created[non_final] = updated[non_final] + rng.integers(0, 200 * 60, int(non_final.sum()))
+
+    amount = np.round(rng.random(rows) * 10000, 2)
+    currency = rng.integers(0, len(CURRENCIES), rows).astype(np.int8)
+    provider = rng.integers(0, len(PROVIDERS), rows).astype(np.int8)
+    ident = np.arange(start, start + rows, dtype=np.int64)
+
+    # Duplicates and late updates point at an original row of this chunk.
+    roll = rng.random(rows)
+    dup = roll < spec.duplicate_ratio
+    late = ~dup & (roll < spec.duplicate_ratio + spec.late_update_ratio)
+    originals = np.flatnonzero(~(dup | late))
+    if len(originals) and (dup.any() or late.any()):
+        repeat = dup | late
+        ref = originals[rng.integers(0, len(originals), int(repeat.sum()))]
+        for col in (ident, status, created, updated, amount, currency, provider):
+            col[repeat] = col[ref]
+        n_late = int(late[repeat].sum())
+        final = np.array([STATUSES.index(s) for s in FINAL], dtype=np.int8)
+        status[late] = final[rng.integers(0, len(final), n_late)]
+        updated[late] = np.maximum(updated[late] - rng.integers(60, 120 * 60, n_late), 0)
+    else:
+        dup[:] = late[:] = False
+
+    failing = np.isin(status, [STATUSES.index(s) for s in FAILING])
+    has_error = failing | (rng.random(rows) < spec.error_ratio)
+    error_code = np.where(has_error, rng.integers(0, len(ERROR_CODES), rows), -1).astype(np.int8)
+    error_message = np.where(has_error, rng.integers(0, len(ERROR_MESSAGES), rows), -1).astype(np.int8)
+    if dup.any():
+        # Verbatim copies: the error drawn for the original row, not a fresh one.
+        ref_dup = ref[dup[dup | late]]
+        error_code[dup] = error_code[ref_dup]
+        error_message[dup] = error_message[ref_dup]
+
+    return {
+        "ident": ident, "status": status, "created": created, "updated": updated,
+        "error_code": error_code, "error_message": error_message,
+        "amount": amount, "currency": currency, "provider": provider,
+    }
+
+
+def _list(values: Sequence[str]) -> str:
+    return "[" + ", ".join("'" + v.replace("'", "''") + "'" for v in values) + "]"
+
+
+def _canonical_sql(spec: Spec, source: str) -> str:
+    """Typed canonical columns (TIMESTAMPTZ timestamps) from a chunk of NumPy columns."""
+    now_s = int(spec.now.timestamp())
+    ts = lambda col: f"to_timestamp({now_s} - {col})"
+    return f"""
+        SELECT substr(h, 1, 8) || '-' || substr(h, 9, 4) || '-4' || substr(h, 14, 3) || '-'
+                 || substr(h, 17, 4) || '-' || substr(h, 21, 12) AS transaction_id,
+               {_list(STATUSES)}[status + 1] AS status,
+               {ts('created')} AS created_at,
+               {ts('updated')} AS updated_at,
+               CASE WHEN error_code >= 0 THEN {_list(ERROR_CODES)}[error_code + 1] END AS error_code,
+               CASE WHEN error_message >= 0 THEN {_list(ERROR_MESSAGES)}[error_message + 1] END AS error_message,
+               amount,
+               {_list(CURRENCIES)}[currency + 1] AS currency,
+               {_list(PROVIDERS)}[provider + 1] AS provider
+        FROM (SELECT *, md5('{int(spec.seed)}:' || ident) AS h FROM {source})
+    """
+
+
+def _output_sql(fmt: str, names: Dict[str, str], source: str) -> str:
+    """Renames columns and, for text formats, writes timestamps as ISO-8601 with an offset."""
+    cols = []
+    for h in HEADERS:
+        expr = h
+        if h in TIMESTAMPS and fmt != "parquet":
+            # Via the epoch, not the session time zone (and no ICU lookup per row).
+            expr = f"strftime(make_timestamp(epoch_us({h})), '%Y-%m-%dT%H:%M:%S+00:00')"
+        cols.append(f"{expr} AS \"{names[h]}\"")
+    return f"SELECT {', '.join(cols)} FROM ({source})"
+
+
+def _write_part(spec: Spec, index: int, start: int, rows: int, path: str, fmt: str,
+                names: Optional[Dict[str, str]]) -> int:
+    chunk = _chunk(spec, index, start, rows)
+    con = duckdb.connect()
+    try:
+        con.register("chunk", chunk)
+        sql = _canonical_sql(spec, "chunk")
+        if names is not None:
+            sql = _output_sql(fmt, names, sql)
+        con.execute(f"COPY ({sql}) TO '{path}' ({COPY_OPTIONS[fmt]})")
+    finally:
+        con.close()
+    return rows
+
+
+def write_parts(out_dir: Path, rows: int, fmt: str = "parquet", spec: Optional[Spec] = None,
+                chunk_rows: int = 1_000_000, workers: int = 0, _canonical: bool = False) -> List[Path]:
+    """
+    Writes `rows` rows as out_dir/part-00000.<fmt>, ... of `chunk_rows` each,
+    generated and written by `workers` processes (0 = one per CPU).
+    """
+    spec = spec or Spec()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ext = {v: k for k, v in FORMATS.items()}[fmt]
+    jobs = []
+    for index, start in enumerate(range(0, rows, chunk_rows)):
+        path = out_dir / f"part-{index:05d}{ext}"
+        names = None if _canonical else column_names(spec, salt=index)
+        jobs.append((spec, index, start, min(chunk_rows, rows - start), path.as_posix(), fmt, names))
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        for job in jobs:
+            _write_part(*job)
+    else:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for f in [pool.submit(_write_part, *job) for job in jobs]:
+                f.result()
+    return [Path(job[4]) for job in jobs]
+
+
+def write_dataset(path: Path, rows: int, seed: int = 0, spec: Optional[Spec] = None,
+                  chunk_rows: int = 1_000_000, workers: int = 0) -> Path:
+    """
+    Writes `rows` rows to a single file; the format follows its extension
+    (.csv, .ndjson, .parquet). Chunks are generated in parallel into temporary
+    Parquet parts that DuckDB then streams into the one output file.
+    """
+    path = Path(path)
+    fmt = FORMATS.get(path.suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported output format: {path.suffix}. Supported: {sorted(FORMATS)}")
+    spec = spec or Spec(seed=seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="synthetic-", dir=path.parent) as tmp:
+        parts = write_parts(Path(tmp), rows, "parquet", spec, chunk_rows, workers, _canonical=True)
+        files = ", ".join(f"'{p.as_posix()}'" for p in parts)
+        con = duckdb.connect()
+        try:
+            sql = _output_sql(fmt, column_names(spec), f"SELECT * FROM read_parquet([{files}])")
+            con.execute(f"COPY ({sql}) TO '{path.as_posix()}' ({COPY_OPTIONS[fmt]})")
+        finally:
+            con.close()
+    return path
+
+
+def _weights(text: str) -> Tuple[Tuple[str, float], ...]:
+    out = []
+    for item in text.split(","):
+        status, _, weight = item.partition("=")
+        if status.strip() not in STATUSES:
+            raise argparse.ArgumentTypeError(f"unknown status {status!r}; choose from {STATUSES}")
+        out.append((status.strip(), float(weight or 1)))
+    return tuple(out)
 
-def row_generator(n: int):
-    now = datetime.now(timezone.utc)
-    for _ in range(n):
-        txid = str(uuid.uuid4())
-        status = random.choice(STATUSES)
-
-        created = now - timedelta(minutes=random.randint(0, 5000))
-        updated = created + timedelta(minutes=random.randint(0, 200))
-
-        if random.random() < 0.05:
-            updated = now - timedelta(minutes=random.randint(60, 600))
-
-        err_code = ""
-        err_msg = ""
-        if status in {"failed", "declined"} or random.random() < 0.02:
-            err_code = random.choice(["E401", "E403", "DO_NOT_HONOR", "X999"])
-            err_msg = random.choice(["insufficient funds", "invalid account", "unknown error"])
-
-        yield [
-            txid,
-            status,
-            created.isoformat(),
-            updated.isoformat(),
-            err_code,
-            err_msg,
-            round(random.random() * 10000, 2),
-            random.choice(["INR", "USD", "EUR"]),
-            random.choice(["stripe", "adyen", "paypal", "razorpay"]),
-        ]
 
 def main():
     repo_root = Path(__file__).resolve().parents[1]
-    out_dir = repo_root / "sample_data"
-    out_dir.mkdir(exist_ok=True)
-
-    csv_path = out_dir / "transactions.csv"
-    parquet_path = out_dir / "transactions.parquet"
-
-    n = 200_000          # start with 20_000 if you want quick test
-    log_every = 50_000
-
-    headers = [
-        "transaction_id", "status", "created_at", "updated_at",
-        "error_code", "error_message", "amount", "currency", "provider"
-    ]
-
-    print(f"[start] generating {n} rows -> {csv_path}")
-    with csv_path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(headers)
-        for i, row in enumerate(row_generator(n), start=1):
-            w.writerow(row)
-            if i % log_every == 0:
-                print(f"[progress] wrote {i}/{n} rows to CSV")
-
-    print("[start] converting CSV -> Parquet using DuckDB")
-    con = duckdb.connect()
-    con.execute(f"""
-        CREATE OR REPLACE TABLE t AS
-        SELECT * FROM read_csv_auto('{csv_path.as_posix()}', HEADER=TRUE)
-    """)
-    con.execute(f"COPY t TO '{parquet_path.as_posix()}' (FORMAT PARQUET)")
-    con.close()
-
-    print(f"[done] Parquet created: {parquet_path}")
-
-    # optional cleanup:
-    # try: csv_path.unlink()
-    # except Exception: pass
+    ap = argparse.ArgumentParser(description="Generate synthetic transactions (vectorized, multi-process).")
+    ap.add_argument("--rows", type=parse_size, default=200_000, help="e.g. 200k, 50M")
+    ap.add_argument("--out", nargs="+", type=Path,
+                    default=[repo_root / "sample_data" / "transactions.csv", repo_root / "sample_data" / "transactions.parquet"],
+                    help="output files (.csv/.ndjson/.parquet), or directories to fill with part files")
+    ap.add_argument("--format", choices=sorted(COPY_OPTIONS), default="parquet", help="part file format for directory outputs")
+    ap.add_argument("--chunk-rows", type=parse_size, default=1_000_000)
+    ap.add_argument("--workers", type=int, default=0, help="0 = one per CPU")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--now", type=datetime.fromisoformat, help="reference time (ISO-8601); fix it for byte-identical reruns")
+    ap.add_argument("--status-weights", type=_weights, help="e.g. success=60,failed=10,pending=15,processing=15")
+    ap.add_argument("--stuck-ratio", type=float, default=0.05, help="share of non-final rows that are STUCK")
+    ap.add_argument("--error-ratio", type=float, default=0.02, help="share of rows with error info regardless of status")
+    ap.add_argument("--duplicate-ratio", type=float, default=0.0, help="share of rows that repeat an earlier row")
+    ap.add_argument("--late-update-ratio", type=float, default=0.0, help="share of rows that are later updates of an earlier transaction")
+    ap.add_argument("--column-variants", action="store_true", help="name columns with random aliases from mappings.yaml")
+    args = ap.parse_args()
+
+    options = {
+        "seed": args.seed,
+        "stuck_ratio": args.stuck_ratio,
+        "error_ratio": args.error_ratio,
+        "duplicate_ratio": args.duplicate_ratio,
+        "late_update_ratio": args.late_update_ratio,
+        "column_variants": args.column_variants,
+    }
+    if args.now:
+        options["now"] = args.now if args.now.tzinfo else args.now.replace(tzinfo=timezone.utc)
+    if args.status_weights:
+        options["status_weights"] = args.status_weights
+    spec = Spec(**options)
+
+    for out in args.out:
+        t0 = time.perf_counter()
+        if out.suffix.lower() in FORMATS:
+            write_dataset(out, args.rows, spec=spec, chunk_rows=args.chunk_rows, workers=args.workers)
+        else:
+            parts = write_parts(out, args.rows, args.format, spec, args.chunk_rows, args.workers)
+            print(f"[progress] {len(parts)} part files")
+        t = time.perf_counter() - t0
+        print(f"[done] {args.rows} rows -> {out} in {t:.1f}s ({args.rows / t:,.0f} rows/s)")
+
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,11 @@
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+# Keep the API module's store out of the working tree during tests.
+os.environ.setdefault("DUCKDB_PATH", str(Path(tempfile.mkdtemp()) / "txn.duckdb"))
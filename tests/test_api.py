@@ -0,0 +1,345 @@
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.connectors import upload
+from app.core.store import TransactionStore
+from app.main import app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = TransactionStore(str(tmp_path / "api.duckdb"), mapper=routes.agent.mapper)
+    monkeypatch.setattr(routes, "store", store)
+    monkeypatch.setattr(upload, "UPLOAD_DIR", tmp_path / "uploads")
+    client = TestClient(app)
+    assert client.post("/ingest", params={"data_path": "sample_data/sample_transactions.csv"}).status_code == 200
+    yield client
+    store.close()
+
+
+def test_stream_matches_batch_status(client):
+    ids = ["tx_1001", "tx_1002", "tx_1005", "nope"]
+    batch = client.post("/transactions/status", json={"transaction_ids": ids}).json()
+
+    resp = client.post("/transactions/status/stream", json={"transaction_ids": ids})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [orjson.loads(line) for line in resp.content.splitlines()]
+    summary = lines.pop()["summary"]
+
+    assert summary == {"requested": 4, "found": 3, "missing": ["nope"]}
+    key = lambda d: d["transaction_id"]
+    for d in batch["results"]:
+        d["evidence"].pop("elapsed_seconds", None)
+    for d in lines:
+        d["evidence"].pop("elapsed_seconds", None)
+    assert sorted(lines, key=key) == sorted(batch["results"], key=key)
+
+
+def test_stream_ingest_decompresses_on_the_fly(client):
+    import gzip
+    body = gzip.compress(open("sample_data/sample_transactions.ndjson", "rb").read())
+    resp = client.post(
+        "/ingest/stream",
+        params={"filename": "hourly.ndjson", "mode": "upsert"},
+        content=body,
+        headers={"Content-Encoding": "gzip", "Content-Type": "application/octet-stream"},
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["ingest"]["inserted"] == 4
+    assert client.get("/transaction/tx_3001").status_code == 200
+
+
+def test_uploads_with_same_name_do_not_collide(client):
+    for _ in range(2):
+        with open("sample_data/sample_transactions.csv", "rb") as f:
+            resp = client.post("/ingest/upload", files={"file": ("same.csv", f, "text/csv")})
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["stats"]["count"] == 5
+
+
+def test_upload_name_with_glob_characters(client):
+    with open("sample_data/sample_transactions.csv", "rb") as f:
+        resp = client.post("/ingest/upload", files={"file": ("export[1]*?.csv", f, "text/csv")})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["stats"]["count"] == 5
+
+
+def test_admin_reload_reports_rules_version(client):
+    resp = client.post("/admin/reload").json()
+    assert resp["ok"] and resp["changed"] is False
+    assert resp["rules_version"] == routes.agent.rulebook.version
+    d = client.get("/transaction/tx_1001").json()
+    assert d["evidence"]["rules_version"] == resp["rules_version"]
+
+
+def test_transaction_lookup_is_cached_until_ingest(client, monkeypatch):
+    from app.core.cache import DecisionCache
+    cache = DecisionCache(max_size=100, ttl_seconds=60)
+    monkeypatch.setattr(routes, "decision_cache", cache)
+
+    first = client.get("/transaction/tx_1001").json()
+    second = client.get("/transaction/tx_1001").json()
+    assert first["transaction_id"] == second["transaction_id"] == "tx_1001"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    client.post("/ingest", params={"data_path": "sample_data/sample_transactions.csv"})
+    client.get("/transaction/tx_1001")
+    stats = client.get("/admin/cache").json()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 2, 1)
+
+
+def test_batch_status_parallel_matches_serial(client, monkeypatch):
+    from app.core.parallel import ParallelClassifier
+    ids = ["tx_1001", "tx_1002", "tx_1005", "nope"]
+    serial = client.post("/transactions/status", json={"transaction_ids": ids}).json()
+
+    par = ParallelClassifier(routes.engine, workers=2, chunk_size=1)
+    monkeypatch.setattr(routes, "parallel", par)
+    monkeypatch.setattr(routes.settings, "PARALLEL_BATCH_THRESHOLD", 1)
+    try:
+        fanned = client.post("/transactions/status", json={"transaction_ids": ids}).json()
+    finally:
+        par.close()
+    for body in (serial, fanned):
+        for d in body["results"]:
+            d["evidence"].pop("elapsed_seconds", None)
+    key = lambda d: d["transaction_id"]
+    assert fanned["missing"] == serial["missing"] == ["nope"]
+    assert sorted(fanned["results"], key=key) == sorted(serial["results"], key=key)
+
+
+def test_transactions_summary(client):
+    body = client.get("/transactions/summary", params=[("currency", "USD"), ("group_by", "provider")]).json()
+    assert body["total"] == 2
+    assert [g["provider"] for g in body["groups"]] == ["paypal", "stripe"]
+    assert client.get("/transactions/summary", params={"group_by": "amount"}).status_code == 422
+
+
+def test_stuck_listing_and_scan(client):
+    body = client.get("/transactions/stuck", params={"limit": 10}).json()
+    assert body["total"] == 0 and body["items"] == [] and body["next_cursor"] is None
+    assert client.get("/transactions/stuck", params={"cursor": "not-a-cursor"}).status_code == 400
+    scan = client.get("/transactions/stuck/scan").json()["last"]
+    assert scan["stuck"] == 0 and scan["by_provider"] == {}
+
+
+def test_transaction_include_raw(client):
+    plain = client.get("/transaction/tx_1002").json()
+    assert "raw" not in plain
+    d = client.get("/transaction/tx_1002", params={"include_raw": "true"}).json()
+    assert d["status"] == plain["status"] == "FAILED"
+    assert d["raw"]["transaction_id"] == "tx_1002"
+    assert d["raw"]["currency"] == "USD"
+    assert client.get("/transaction/nope", params={"include_raw": "true"}).status_code == 404
+
+
+def test_metrics_endpoint(client, monkeypatch):
+    from app.utils.metrics import REGISTRY
+    monkeypatch.setattr(REGISTRY, "enabled", True)
+    REGISTRY.reset()
+    try:
+        client.post("/ingest", params={"data_path": "sample_data/sample_transactions.csv", "mode": "upsert"})
+        client.get("/transaction/tx_1002")
+        client.post("/transactions/status", json={"transaction_ids": ["tx_1001", "tx_1005"]})
+        body = client.get("/metrics").text
+    finally:
+        REGISTRY.reset()
+    for stage in ("store.ingest", "store.lookup", "mapper.map_row", "parse_dt", "classify",
+                  "batch.query", "batch.fetch", "batch.decode", "serialize"):
+        assert f'txn_stage_seconds_count{{stage="{stage}"}}' in body, stage
+    assert 'txn_rows_ingested_total{mode="upsert",outcome="updated"} 0' in body
+    # tx_1002 (single lookup) and tx_1005 (batch) are hard-fail error codes.
+    assert 'txn_rules_fired_total{rule="hard_fail_error_code"} 2' in body
+    assert 'txn_rules_fired_total{rule="status_synonym_success"} 1' in body
+    assert 'txn_http_request_seconds_count{method="GET",route="/transaction/{txid}",status="200"} 1' in body
+    assert "txn_decision_cache_misses_total" in body
+
+
+def test_profiled_request_and_slow_log(client, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(routes.slow_requests, "keep", 5)
+    routes.slow_requests.clear()
+
+    r = client.post("/transactions/status", json={"transaction_ids": ["tx_1001", "tx_1005"]},
+                    headers={"X-Profile": "1"})
+    assert r.status_code == 200
+    profile_id = r.headers["x-profile-id"]
+    assert "x-profile-id" not in client.get("/transaction/tx_1002").headers
+
+    listed = client.get("/admin/profiles").json()["profiles"]
+    assert listed[0]["profile_id"] == profile_id and listed[0]["route"] == "/transactions/status"
+    collapsed = client.get(f"/admin/profiles/{profile_id}")
+    assert collapsed.status_code == 200
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.text.splitlines())
+    assert client.get("/admin/profiles/nope").status_code == 404
+
+    slow = client.get("/admin/slow-requests").json()
+    routes_seen = {r["route"] for r in slow["requests"]}
+    assert {"/transactions/status", "/transaction/{txid}"} <= routes_seen
+    batch = next(r for r in slow["requests"] if r["route"] == "/transactions/status")
+    assert "batch.query" in batch["stages_ms"] and batch["profile_id"] == profile_id
+    assert client.delete("/admin/slow-requests").status_code == 200
+    assert [r["route"] for r in client.get("/admin/slow-requests").json()["requests"]] == ["/admin/slow-requests"]
+
+    # Stage timers only run while a traced request is in flight.
+    from app.utils.metrics import REGISTRY
+    monkeypatch.setattr(routes.slow_requests, "keep", 0)
+    client.get("/transaction/tx_1002", headers={"X-Profile": "1"})
+    assert REGISTRY.tracing == 0
+
+
+def test_admin_generations_and_rollback(client):
+    assert client.post("/admin/rollback").status_code == 404
+    assert client.post("/ingest", params={"data_path": "sample_data/sample_transactions.json"}).status_code == 200
+    gens = client.get("/admin/generations").json()["generations"]
+    assert [g["live"] for g in gens] == [True, False]
+    r = client.post("/admin/rollback")
+    assert r.status_code == 200 and r.json()["rollback"]["generation"] == gens[1]["generation"]
+    assert client.get("/transaction/tx_1001").status_code == 200
+
+
+def test_saturated_workload_sheds_load_without_blocking_lookups(client, monkeypatch):
+    import threading
+    from app.api.workloads import WorkloadPool
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_batch(ids):
+        started.set()
+        release.wait(5)
+        return {"ids": ids}
+
+    monkeypatch.setattr(routes, "batch_pool", WorkloadPool("batch", workers=1, queue=0, retry_after_s=3))
+    monkeypatch.setattr(routes, "_batch_status", slow_batch)
+    body = {"transaction_ids": ["tx_1001"]}
+    first = threading.Thread(target=client.post, args=("/transactions/status",), kwargs={"json": body})
+    first.start()
+    try:
+        assert started.wait(5)
+        resp = client.post("/transactions/status", json=body)
+        assert resp.status_code == 503 and resp.headers["retry-after"] == "3"
+        # Point lookups have their own threads and are served while the batch pool is full.
+        assert client.get("/transaction/tx_1001").status_code == 200
+    finally:
+        release.set()
+        first.join()
+    assert routes.batch_pool.stats()["rejected"] == 1
+    assert client.post("/transactions/status", json=body).json() == {"ids": ["tx_1001"]}
+    assert set(client.get("/admin/workloads").json()) == {"point", "batch", "ingest"}
+
+
+def test_ingest_partition_dir_stays_under_export_root(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(routes.settings, "EXPORT_ROOT", str(tmp_path / "exports"))
+    params = {"data_path": "sample_data/sample_transactions.csv"}
+    for bad in ("../outside", str(tmp_path), "."):
+        assert client.post("/ingest", params={**params, "partition_dir": bad}).status_code == 400
+    resp = client.post("/ingest", params={**params, "partition_dir": "daily"})
+    assert resp.status_code == 200
+    assert resp.json()["ingest"]["partitioned"]["path"] == str(tmp_path / "exports" / "daily")
+    # Re-exporting over its own previous export is fine.
+    assert client.post("/ingest", params={**params, "partition_dir": "daily"}).status_code == 200
+
+
+def test_rules_fired_counts_served_decisions_only(client, monkeypatch):
+    from app.utils.metrics import REGISTRY
+    monkeypatch.setattr(routes.settings, "MATERIALIZE_DECISIONS", True)
+    monkeypatch.setattr(REGISTRY, "enabled", True)
+    REGISTRY.reset()
+    try:
+        # Materializes all five sample decisions; none of them is served yet.
+        client.post("/ingest", params={"data_path": "sample_data/sample_transactions.csv"})
+        assert "txn_rules_fired_total{" not in client.get("/metrics").text
+        client.get("/transaction/tx_1002")  # from the decisions table
+        client.get("/transaction/tx_1002")  # from the cache
+        body = client.get("/metrics").text
+    finally:
+        REGISTRY.reset()
+    assert 'txn_rules_fired_total{rule="hard_fail_error_code"} 2' in body
+
+
+def test_watched_rules_change_rematerializes_in_the_background(client, monkeypatch):
+    monkeypatch.setattr(routes.settings, "MATERIALIZE_DECISIONS", True)
+    monkeypatch.setattr(routes.settings, "RULES_WATCH_INTERVAL_S", 0.001)
+    monkeypatch.setattr(routes, "_rules_checked_at", 0.0)
+    routes.store.materialize(routes.engine, "before-the-edit")
+    monkeypatch.setattr(routes.agent.rulebook, "reload_if_changed", lambda: True)
+
+    assert client.get("/transaction/tx_1002").json()["status"] == "FAILED"
+    routes.ingest_pool.shutdown()  # waits for the queued refresh
+    assert routes.store.decisions_version() == routes.agent.version
+    assert routes.store.lookup_decision("tx_1002", routes.agent.version) is not None
+
+
+def test_shutdown_stops_the_parallel_pool(monkeypatch):
+    stopped = []
+
+    class Pool:
+        def shutdown(self, cancel_futures=False):
+            stopped.append(cancel_futures)
+
+    monkeypatch.setattr(routes.parallel, "_pool", Pool())
+    with TestClient(app):
+        pass
+    assert stopped == [True] and routes.parallel._pool is None
+
+
+def test_open_streams_leave_readers_for_lookups(tmp_path, monkeypatch):
+    store = TransactionStore(str(tmp_path / "api.duckdb"), read_pool_size=1, mapper=routes.agent.mapper,
+                             read_timeout_s=0.5)
+    store.ingest("sample_data/sample_transactions.csv")
+    monkeypatch.setattr(routes, "store", store)
+    monkeypatch.setattr(routes.engine, "chunk_size", 2)
+    client = TestClient(app)
+    try:
+        # Two streams paused mid-body, as with clients that stopped reading.
+        streams = [routes._stream_decisions(["tx_1001", "tx_1002", "tx_1003", "tx_1004"]) for _ in range(2)]
+        for s in streams:
+            assert next(s).count(b"\n") == 2
+        assert client.get("/transaction/tx_1005").status_code == 200
+        for s in streams:
+            s.close()
+
+        with store.reader():
+            r = client.get("/transaction/tx_1004")
+        assert r.status_code == 503 and r.headers["Retry-After"] == "1"
+    finally:
+        store.close()
+
+
+def test_stream_admission_is_capped(client, monkeypatch):
+    from app.api.workloads import WorkloadPool
+
+    monkeypatch.setattr(routes, "batch_pool", WorkloadPool("batch", workers=2, queue=16, streams=1))
+    held = routes.batch_pool.stream(iter([b""]))
+    r = client.post("/transactions/status/stream", json={"transaction_ids": ["tx_1001"]})
+    assert r.status_code == 503 and routes.batch_pool.stats()["streaming"] == 1
+    del held
+    assert routes.batch_pool.stats()["streaming"] == 0
+    assert client.post("/transactions/status/stream", json={"transaction_ids": ["tx_1001"]}).status_code == 200
+
+
+def test_mapping_trace_names_the_ingested_columns(client, tmp_path):
+    path = tmp_path / "aliased.csv"
+    path.write_text("tx_id,state,last_updated,gateway\nq1,processing,2026-01-10T11:00:00Z,stripe\n")
+    delta = tmp_path / "delta.csv"
+    delta.write_text("txn_id,state\nq2,success\n")
+    assert client.post("/ingest", params={"data_path": str(path)}).status_code == 200
+    expected = {"transaction_id": "tx_id", "status_raw": "state", "updated_at": "last_updated", "provider": "gateway"}
+
+    live = client.get("/transaction/q1").json()["evidence"]["mapping_trace"]
+    batch = client.post("/transactions/status", json={"transaction_ids": ["q1"]}).json()["results"][0]
+    stream = orjson.loads(client.post("/transactions/status/stream", json={"transaction_ids": ["q1"]}).content.splitlines()[0])
+    routes.store.materialize(routes.engine, routes.agent.version)
+    stored, _ = routes.store.lookup_decision("q1", routes.agent.version)
+    for trace in (live, batch["evidence"]["mapping_trace"], stream["evidence"]["mapping_trace"],
+                  stored.evidence["mapping_trace"]):
+        assert trace == expected
+
+    # An upsert under another alias is added to the generation's mapping.
+    assert client.post("/ingest", params={"data_path": str(delta), "mode": "upsert"}).status_code == 200
+    assert routes.store.lookup_decision("q1", routes.agent.version) is None
+    trace = client.get("/transaction/q2").json()["evidence"]["mapping_trace"]
+    assert trace["transaction_id"] == "tx_id, txn_id" and trace["status_raw"] == "state"
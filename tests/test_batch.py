@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+import duckdb
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.batch import BatchClassifier
+from app.core.classifier import Agent, classify_raw
+
+NOW = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def _agent():
+    return Agent("configs/mappings.yaml", "configs/status_synonyms.yaml", "configs/rules.yaml")
+
+
+def _reference(agent, con, source):
+    cur = con.execute(source)
+    cols = [d[0] for d in cur.description]
+    return [classify_raw(agent.mapper.map_row(dict(zip(cols, r))), agent.rulebook, now=NOW) for r in cur.fetchall()]
+
+
+def _assert_identical(agent, con, source):
+    engine = BatchClassifier(agent.mapper, agent.rulebook, chunk_size=3)
+    got = [d.to_json() for d in engine.classify(con, source, now=NOW)]
+    # byte-identical to what the endpoints rendered from pydantic Decisions
+    want = [JSONResponse(jsonable_encoder(d.model_dump())).body for d in _reference(agent, con, source)]
+    assert got == want
+
+
+def test_batch_matches_classify_raw_on_varchar_rows():
+    agent = _agent()
+    con = duckdb.connect()
+    con.execute("CREATE TABLE t(tx_id VARCHAR, state VARCHAR, created VARCHAR, last_updated VARCHAR, err_code VARCHAR, message VARCHAR)")
+    con.executemany("INSERT INTO t VALUES (?, ?, ?, ?, ?, ?)", [
+        ("a1", "Completed", "2026-01-10T10:00:00Z", "2026-01-10T10:01:00Z", None, None),
+        ("a2", "processing", None, "2026-01-10T10:00:00Z", "E401", None),
+        ("a3", "declined", None, None, "X999", "insufficient funds"),
+        ("a4", "declined", None, None, "", ""),
+        ("a5", "pending", None, None, None, " "),
+        ("a6", "queued", "2026-01-10 11:50", None, None, None),
+        ("a7", "in progress", None, "2026-01-10T09:00:00.250+00:00", None, None),
+        ("a8", "in_progress", None, "2026-01-10T11:59:00", None, None),
+        ("a9", "weird", None, "2026-01-10T11:00:00+05:30", None, None),
+        ("a10", "", None, "Jan 10 2026 10am", None, None),
+        ("a11", None, None, "", None, None),
+        ("  ", "success", None, None, None, None),
+        (None, "success", None, None, None, None),
+        ("a12", "\tpaid\n", None, "2026-01-10", None, None),
+        ("a13", "processing", None, "2026-13-45T00:00:00Z", None, None),
+        # DuckDB reads these (as a BC date / the next midnight); fromisoformat rejects them.
+        ("a14", "processing", "0000-01-01", "0000-01-01", None, None),
+        ("a15", "processing", None, "2026-01-10T24:00:00", None, None),
+        ("a16", "pending", None, "2026-01-10T11:59:60Z", None, None),
+        # UTC forms DuckDB's own casts reject; the fast path must still read them like parse_dt.
+        ("a17", "processing", "2026-01-10T11:45Z", "2026-01-10T11:45Z", None, None),
+        ("a18", "processing", None, "2026-01-10T11:45+00:00", None, None),
+        ("a19", "processing", None, "2026-01-10T11:45:00-0000", None, None),
+        ("a20", "processing", None, "2026-01-10Z", None, None),
+        ("a21", "processing", None, "2026-01-10T11:45+05:00", None, None),
+    ])
+    _assert_identical(agent, con, "SELECT * FROM t")
+
+    # summarize() reads the SQL instants directly, fallback rows included.
+    plan = BatchClassifier(agent.mapper, agent.rulebook).plan(con, "SELECT * FROM t")
+    instants = dict(con.execute(f"SELECT _txid, _u FROM ({plan.query('SELECT * FROM t')})", [0]).fetchall())
+    assert instants["a17"] == instants["a18"] == instants["a19"] == datetime(2026, 1, 10, 11, 45)
+    assert instants["a21"] == datetime(2026, 1, 10, 6, 45)
+
+
+def test_batch_matches_classify_raw_on_native_types():
+    agent = _agent()
+    con = duckdb.connect()
+    con.execute("""
+        CREATE TABLE t AS SELECT * FROM (VALUES
+            (1, 'pending', TIMESTAMP '2026-01-10 10:00:00', TIMESTAMPTZ '2026-01-10 11:45:00+00', 0, NULL),
+            (2, 'processing', NULL, TIMESTAMPTZ '2026-01-10 11:00:00+00', 401, 'boom'),
+            (3, 'failed', NULL, NULL, 7, NULL),
+            (4, 'success', DATE '2026-01-01'::TIMESTAMP, NULL, NULL, NULL),
+            (5, 'pending', TIMESTAMP '0001-01-01 (BC) 00:00:00', NULL, NULL, NULL)
+        ) v(transaction_id, status, created_at, updated_at, error_code, error_message)
+    """)
+    _assert_identical(agent, con, "SELECT * FROM t")
+    assert len(BatchClassifier(agent.mapper, agent.rulebook).classify(con, "t")) == 5
+
+
+def test_batch_matches_classify_raw_on_sample_files():
+    agent = _agent()
+    con = duckdb.connect()
+    for src in (
+        "SELECT * FROM read_csv_auto('sample_data/sample_transactions.csv', HEADER=TRUE)",
+        "SELECT * FROM read_json_auto('sample_data/sample_transactions.json')",
+        "SELECT * FROM read_json_auto('sample_data/sample_transactions.ndjson', format='newline_delimited')",
+    ):
+        _assert_identical(agent, con, src)
@@ -0,0 +1,34 @@
+import json
+
+from benchmarks.__main__ import main
+from benchmarks.compare import compare, flatten
+from benchmarks.harness import parse_size, percentiles
+
+
+def test_parse_size_and_percentiles():
+    assert [parse_size(s) for s in ("10k", "10M", "2.5k", "1_000")] == [10_000, 10_000_000, 2_500, 1_000]
+    stats = percentiles([i / 1000 for i in range(1, 101)])
+    assert (stats["n"], round(stats["p50_ms"]), round(stats["p99_ms"])) == (100, 50, 99)
+
+
+def test_suite_writes_comparable_json(tmp_path):
+    out = tmp_path / "results.json"
+    main([
+        "--sizes", "300", "--lookups", "20", "--batch-sizes", "10,100,1k",
+        "--requests", "40", "--concurrency", "4", "--workdir", str(tmp_path), "--out", str(out),
+    ])
+    results = json.loads(out.read_text())
+    run = results["runs"][0]
+    assert run["rows"] == 300
+    assert set(run["ingest"]) == {"csv", "ndjson", "parquet"}
+    assert run["lookup"]["fetch"]["n"] == 20
+    assert set(run["batch"]) == {"10", "100"}
+    assert run["classify"]["rows_per_s"] > 0
+    assert run["load"]["errors"] == 0 and run["load"]["requests"] == 40
+
+    metrics = flatten(results)
+    assert "300.lookup.fetch.p99_ms" in metrics and "300.ingest.csv.file_mb" not in metrics
+    slower = json.loads(json.dumps(results))
+    slower["runs"][0]["lookup"]["fetch"]["p99_ms"] *= 2
+    slower["runs"][0]["classify"]["rows_per_s"] *= 2
+    assert [r[0] for r in compare(results, slower)] == ["300.lookup.fetch.p99_ms"]
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core.cache import DecisionCache
+from app.core.classifier import Agent, classify_raw, stuck_anchor, stuck_deadline
+
+
+class Clock:
+    def __init__(self, t: float):
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+
+def _agent():
+    return Agent("configs/mappings.yaml", "configs/status_synonyms.yaml", "configs/rules.yaml")
+
+
+def test_lru_ttl_and_scope_invalidation():
+    agent = _agent()
+    clock = Clock(1_000.0)
+    cache = DecisionCache(max_size=2, ttl_seconds=10, clock=clock)
+    d = agent.evaluate({"transaction_id": "t1", "status": "success"})
+
+    cache.put("a", 1, "v", d, None)
+    cache.put("b", 1, "v", d, None)
+    assert cache.get("a", 1, "v") is not None  # a is now most recent
+    cache.put("c", 1, "v", d, None)
+    assert cache.get("b", 1, "v") is None and cache.stats()["evictions"] == 1
+
+    clock.t += 10
+    assert cache.get("a", 1, "v") is None and cache.stats()["expirations"] == 1
+
+    cache.put("c", 1, "v", d, None)
+    cache.put("d", 2, "v", d, None)  # new generation drops generation 1
+    assert cache.get("c", 1, "v") is None
+    stats = cache.stats()
+    assert stats["size"] == 1 and stats["invalidations"] == 1 and stats["hits"] == 1
+
+
+def test_non_final_entry_expires_when_it_would_turn_stuck():
+    agent = _agent()
+    updated = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+    row = {"transaction_id": "t1", "status": "processing", "updated_at": updated.isoformat()}
+    d = classify_raw(agent.mapper.map_row(row), agent.rulebook, now=updated + timedelta(minutes=1))
+    assert d.status == "PROCESSING"
+    anchor = stuck_anchor(d)
+    deadline = stuck_deadline(d, anchor, agent.rulebook)
+    assert deadline == updated + timedelta(minutes=agent.rulebook.stuck_minutes)
+
+    clock = Clock(deadline.timestamp() - 1)
+    cache = DecisionCache(ttl_seconds=3600, clock=clock)
+    cache.put("t1", 1, "v", d, anchor, deadline)
+    assert cache.get("t1", 1, "v") is not None
+    clock.t += 1
+    assert cache.get("t1", 1, "v") is None
+
+    final = agent.evaluate({"transaction_id": "t2", "status": "success", "updated_at": updated.isoformat()})
+    assert stuck_deadline(final, stuck_anchor(final), agent.rulebook) is None
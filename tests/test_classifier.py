@@ -1,3 +1,5 @@
+import pytest
+
 from app.core.classifier import Agent
 
 def test_success_classification():
@@ -13,3 +15,67 @@ def test_failed_by_error_code_override():
     d = agent.evaluate(row)
     assert d.status == "FAILED"
     assert "hard_fail_error_code" in d.rules_fired
+
+def test_restamp_matches_fresh_classification():
+    from datetime import datetime, timezone
+    from app.core.classifier import classify_raw, restamp, stuck_anchor
+
+    agent = Agent("configs/mappings.yaml", "configs/status_synonyms.yaml", "configs/rules.yaml")
+    row = {"transaction_id": "t3", "status": "processing", "created_at": "2026-01-01T00:00:00Z", "updated_at": "2026-01-01T00:10:00Z"}
+    early = datetime(2026, 1, 1, 0, 15, tzinfo=timezone.utc)
+    late = datetime(2026, 1, 1, 3, 0, tzinfo=timezone.utc)
+
+    d = classify_raw(agent.mapper.map_row(row), agent.rulebook, now=early)
+    assert d.status == "PROCESSING"
+    fresh = classify_raw(agent.mapper.map_row(row), agent.rulebook, now=late)
+    assert fresh.status == "STUCK"
+    assert restamp(d, stuck_anchor(d), agent.rulebook, now=late) == fresh
+    assert restamp(fresh, stuck_anchor(fresh), agent.rulebook, now=early) == d
+
+
+def test_record_serializes_like_decision():
+    from decimal import Decimal
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app.core.classifier import Agent, classify_record
+    agent = Agent("configs/mappings.yaml", "configs/status_synonyms.yaml", "configs/rules.yaml")
+    for row in (
+        {"transaction_id": "t1", "status": "réussi", "updated_at": "2026-01-10T10:00:00Z", "error_code": Decimal("4.5")},
+        {"transaction_id": "t2", "status": "pending", "updated_at": "2026-01-10T10:00:00+05:30"},
+        {"transaction_id": "", "status": "success"},
+    ):
+        record = classify_record(agent.mapper.map_row(row), agent.rulebook)
+        model = record.to_model()
+        assert record.to_json() == JSONResponse(jsonable_encoder(model.model_dump())).body
+        assert record.to_dict() == model.model_dump()
+
+
+def test_rulebook_hot_reload(tmp_path):
+    import os
+    import shutil
+    from app.core.classifier import Agent
+    syn, rules = tmp_path / "syn.yaml", tmp_path / "rules.yaml"
+    shutil.copy("configs/status_synonyms.yaml", syn)
+    shutil.copy("configs/rules.yaml", rules)
+    agent = Agent("configs/mappings.yaml", str(syn), str(rules))
+    book = agent.rulebook.snapshot()
+    row = {"transaction_id": "t1", "status": "on_hold", "error_code": "X999", "updated_at": "2026-01-01T00:00:00Z"}
+
+    before = agent.evaluate(row)
+    assert before.status == "FAILED" and before.evidence["rules_version"] == book.version
+    assert agent.rulebook.reload_if_changed() is False
+
+    syn.write_text(syn.read_text() + "  - on_hold\n")
+    rules.write_text(rules.read_text() + "  - X999\n")
+    os.utime(rules, ns=(0, book.mtimes[1] + 1))
+    assert agent.rulebook.reload_if_changed() is True
+    after = agent.evaluate(row)
+    assert after.rules_fired == ["hard_fail_error_code"]
+    assert after.evidence["rules_version"] == agent.rulebook.version != book.version
+    assert agent.rulebook.match_bucket("On Hold") == "PROCESSING"
+    assert book.match_bucket("On Hold") == ""  # old snapshots are untouched
+
+    rules.write_text("stuck_threshold_minutes: [")
+    with pytest.raises(Exception):
+        agent.rulebook.load()
+    assert agent.rulebook.version == after.evidence["rules_version"]
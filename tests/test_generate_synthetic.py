@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+
+import duckdb
+
+from app.core.batch import BatchClassifier
+from app.core.classifier import Agent
+from app.core.mapper import SchemaMapper
+from scripts.generate_synthetic import Spec, write_dataset, write_parts
+
+NOW = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def _rows(path):
+    return duckdb.sql(f"SELECT * FROM '{path}'").fetchall()
+
+
+def test_same_seed_same_rows_whatever_the_workers(tmp_path):
+    spec = Spec(seed=3, now=NOW)
+    serial = write_parts(tmp_path / "serial", 2_000, "csv", spec, chunk_rows=500, workers=1)
+    fanned = write_parts(tmp_path / "fanned", 2_000, "csv", spec, chunk_rows=500, workers=2)
+    assert [p.read_bytes() for p in serial] == [p.read_bytes() for p in fanned]
+    assert len(serial) == 4
+
+    single = write_dataset(tmp_path / "all.csv", 2_000, spec=spec, chunk_rows=500)
+    assert _rows(single) == [r for p in serial for r in _rows(p)]
+    assert _rows(write_dataset(tmp_path / "other.csv", 2_000, spec=Spec(seed=4, now=NOW), chunk_rows=500)) != _rows(single)
+
+
+def test_status_mix_and_stuck_ratio(tmp_path):
+    spec = Spec(seed=1, now=NOW, status_weights=(("success", 3), ("pending", 1)), stuck_ratio=0.25)
+    path = write_dataset(tmp_path / "t.parquet", 4_000, spec=spec)
+    agent = Agent("configs/mappings.yaml", "configs/status_synonyms.yaml", "configs/rules.yaml")
+    con = duckdb.connect()
+    con.execute(f"CREATE TABLE txns AS SELECT * FROM '{path}'")
+    counts = {}
+    for d in BatchClassifier(agent.mapper, agent.rulebook).iter_decisions(con, "txns", now=NOW):
+        counts[d.status] = counts.get(d.status, 0) + 1
+    non_final = counts["PENDING"] + counts["STUCK"]
+    assert 0.7 < (counts["SUCCESS"] + counts.get("FAILED", 0)) / 4_000 < 0.8
+    assert 0.2 < counts["STUCK"] / non_final < 0.3
+
+
+def test_duplicates_late_updates_and_column_variants(tmp_path):
+    spec = Spec(seed=2, now=NOW, duplicate_ratio=0.1, late_update_ratio=0.1, column_variants=True)
+    parts = write_parts(tmp_path / "parts", 2_000, "ndjson", spec, chunk_rows=1_000, workers=1)
+    mapper = SchemaMapper("configs/mappings.yaml")
+    for part in parts:
+        columns = duckdb.sql(f"SELECT * FROM '{part}'").columns
+        assert len(mapper.resolve(columns)) == 9
+
+    path = write_dataset(tmp_path / "t.csv", 2_000, spec=Spec(seed=2, now=NOW, duplicate_ratio=0.1, late_update_ratio=0.1))
+    total, distinct, late = duckdb.sql(f"""
+        SELECT count(*), count(DISTINCT transaction_id),
+               count(*) FILTER (WHERE n > 1 AND statuses > 1)
+        FROM (SELECT transaction_id, count(*) OVER w AS n, count(DISTINCT status) OVER w AS statuses
+              FROM '{path}' WINDOW w AS (PARTITION BY transaction_id))
+    """).fetchone()
+    assert total == 2_000 and 1_550 < distinct < 1_700
+    assert late > 0
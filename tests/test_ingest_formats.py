@@ -2,6 +2,7 @@ import json
 import duckdb
 from pathlib import Path
 
+from app.core.errors import DataSourceError
 from app.core.store import TransactionStore
 
 
@@ -85,3 +86,81 @@ def test_ingest_csv_json_ndjson_parquet(tmp_path):
     assert store.lookup("t7")["transaction_id"] == "t7"
 
     store.close()
+
+
+def test_ingest_many_files_globs_and_dirs(tmp_path):
+    store = TransactionStore(str(tmp_path / "test.duckdb"))
+    batch = tmp_path / "batch"
+    (batch / "nested").mkdir(parents=True)
+    _create_csv(batch / "a.csv")
+    # Schema drift: t3/t4 carry created_at/updated_at, t5/t6 do not.
+    _create_json(batch / "b.json")
+    _create_ndjson(batch / "nested" / "c.ndjson")
+    _create_ndjson(batch / "nested" / "d.ndjson")
+    (batch / "notes.txt").write_text("ignored", encoding="utf-8")
+    _create_parquet(tmp_path / "data.parquet")
+
+    result = store.ingest([str(batch), str(tmp_path / "*.parquet")])
+    assert result["files"] == 5
+    assert store.stats()["count"] == 10
+    assert store.lookup("t4")["updated_at"] is not None
+    assert store.lookup("t7")["status"] == "success"
+
+    result = store.ingest(str(batch / "**" / "*.ndjson"))
+    assert result["files"] == 2
+    assert store.stats()["count"] == 4
+    store.close()
+
+
+def test_ingest_many_files_with_different_aliases(tmp_path):
+    from app.core.mapper import SchemaMapper
+
+    (tmp_path / "a.csv").write_text("tx_id,state,modified\na1,success,2026-01-10T10:00:00Z\n", encoding="utf-8")
+    (tmp_path / "b.csv").write_text("transaction_id,status,updated_at\nb1,failed,2026-01-10T11:00:00Z\n", encoding="utf-8")
+    (tmp_path / "c.ndjson").write_text('{"txn_id": 7, "payment_status": "pending", "last_updated": "2026-01-10T12:00:00Z"}\n',
+                                       encoding="utf-8")
+
+    store = TransactionStore(str(tmp_path / "test.duckdb"), mapper=SchemaMapper("configs/mappings.yaml"))
+    result = store.ingest([str(tmp_path / "a.csv"), str(tmp_path / "b.csv"), str(tmp_path / "c.ndjson")])
+    assert result["mapping"]["transaction_id"] == "transaction_id, tx_id, txn_id"
+    assert store.con.execute("SELECT count(transaction_id), count(status_raw), count(updated_at) FROM txns").fetchone() == (3, 3, 3)
+    assert store.lookup("a1")["status_raw"] == "success"
+    assert store.lookup("b1")["status_raw"] == "failed"
+    assert store.lookup("7")["status_raw"] == "pending"
+    store.close()
+
+
+def test_export_partitioned_round_trip(tmp_path):
+    store = TransactionStore(str(tmp_path / "test.duckdb"))
+    path = tmp_path / "data.csv"
+    path.write_text(
+        "transaction_id,status,provider,created_at\n"
+        "t1,success,stripe,2026-01-10T23:30:00-02:00\n"
+        "t2,failed,stripe,2026-01-10T10:05:00Z\n"
+        "t3,pending,adyen,2026-01-11T09:00:00Z\n",
+        encoding="utf-8",
+    )
+    store.ingest(str(path))
+    out = tmp_path / "parts"
+    result = store.export_partitioned(str(out))
+    assert result == {"path": str(out), "partition_by": ["provider", "date"], "rows": 3}
+    # t1 is 01:30 UTC on the 11th.
+    assert sorted(p.name for p in (out / "provider=stripe").iterdir()) == ["date=2026-01-10", "date=2026-01-11"]
+
+    # Re-exporting replaces the previous layout rather than appending to it.
+    store.export_partitioned(str(out))
+    store.ingest(str(out / "provider=stripe"))
+    assert store.stats()["count"] == 2
+    assert store.lookup("t1")["provider"] == "stripe"
+
+    # A directory holding anything but a previous export is never overwritten.
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "keep.txt").write_text("x", encoding="utf-8")
+    try:
+        store.export_partitioned(str(other))
+        assert False, "non-empty directory"
+    except DataSourceError:
+        pass
+    assert (other / "keep.txt").exists()
+    store.close()
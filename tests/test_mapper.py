@@ -8,3 +8,27 @@ def test_mapping_basic():
     assert mapped["status_raw"] == "success"
     assert mapped["updated_at"] == "2026-01-01T00:00:00Z"
     assert "_map_trace" in mapped
+
+def test_plan_is_compiled_once_per_signature():
+    mapper = SchemaMapper("configs/mappings.yaml")
+    rows = [{"tx_id": str(i), "state": "success", "last_updated": None} for i in range(5)]
+    mapped = [mapper.map_row(r) for r in rows]
+    assert mapper.cache_info().misses == 1 and mapper.cache_info().hits == 4
+    assert mapped[3] == {
+        "transaction_id": "3",
+        "status_raw": "success",
+        "updated_at": None,
+        "_map_trace": {"transaction_id": "tx_id", "status_raw": "state", "updated_at": "last_updated"},
+    }
+    plan = mapper.compile(("tx_id", "state", "last_updated"))
+    assert plan.apply(("3", "success", None)) == mapped[3]
+
+def test_map_batch_renames_relation():
+    import duckdb
+    mapper = SchemaMapper("configs/mappings.yaml")
+    con = duckdb.connect()
+    rel = con.sql("SELECT 7 AS tx_id, 'paid' AS payment_status, 'x' AS extra")
+    mapped, trace = mapper.map_batch(rel)
+    assert mapped.columns == ["transaction_id", "status_raw", "extra"]
+    assert mapped.fetchall() == [("7", "paid", "x")]
+    assert trace == {"transaction_id": "tx_id", "status_raw": "payment_status"}
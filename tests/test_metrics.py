@@ -0,0 +1,41 @@
+from app.utils.metrics import Registry, count_rules, stage, timed, RULES_FIRED, STAGE_SECONDS, REGISTRY
+
+
+def test_histogram_and_counter_exposition():
+    reg = Registry(enabled=True)
+    hist = reg.histogram("t_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+    ctr = reg.counter("t_total", "Things.", ("kind",))
+    for v in (0.05, 0.5, 5.0):
+        hist.observe(v, "a")
+    ctr.inc('say "hi"', amount=2)
+    reg.collector("t_size", "gauge", "Size.", lambda: [({}, 3)])
+
+    lines = reg.render().splitlines()
+    assert "# TYPE t_seconds histogram" in lines
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 't_seconds_count{stage="a"} 3' in lines
+    assert 't_total{kind="say \\"hi\\""} 2' in lines
+    assert "t_size 3" in lines
+
+
+def test_disabled_registry_records_nothing(monkeypatch):
+    monkeypatch.setattr(REGISTRY, "enabled", False)
+    REGISTRY.reset()
+    traced = timed("unit.fn")(lambda x: x + 1)
+    assert traced(1) == 2
+    with stage("unit.block"):
+        pass
+    count_rules([("status_synonym_success",)])
+    assert STAGE_SECONDS.count("unit.fn") == STAGE_SECONDS.count("unit.block") == 0
+    assert RULES_FIRED.value("status_synonym_success") == 0
+
+    monkeypatch.setattr(REGISTRY, "enabled", True)
+    traced(1)
+    with stage("unit.block"):
+        pass
+    count_rules([("a", "b"), ("a",), ["a"]])
+    assert STAGE_SECONDS.count("unit.fn") == STAGE_SECONDS.count("unit.block") == 1
+    assert (RULES_FIRED.value("a"), RULES_FIRED.value("b")) == (3, 1)
+    REGISTRY.reset()
@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+
+import duckdb
+
+from app.core.batch import BatchClassifier
+from app.core.classifier import Agent
+from app.core.parallel import ParallelClassifier
+
+NOW = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def test_parallel_matches_serial_in_order():
+    agent = Agent("configs/mappings.yaml", "configs/status_synonyms.yaml", "configs/rules.yaml")
+    engine = BatchClassifier(agent.mapper, agent.rulebook)
+    con = duckdb.connect()
+    con.execute("CREATE TABLE t AS SELECT * FROM read_csv_auto('sample_data/sample_transactions.csv', HEADER=TRUE)")
+    # non-UTC offsets take the classify_record fallback inside the workers
+    con.execute("INSERT INTO t (transaction_id, status, updated_at) VALUES ('tz_1', 'processing', '2026-01-10T11:00:00+05:30')")
+    source = "SELECT * FROM t ORDER BY transaction_id"
+
+    want = [d.to_json() for d in engine.classify(con, source, now=NOW)]
+    par = ParallelClassifier(engine, workers=2, chunk_size=3)
+    try:
+        assert [d.to_json() for d in par.classify(con, source, now=NOW)] == want
+        chunks = list(par.iter_encoded(con, source, now=NOW, sep=b"\n"))
+    finally:
+        par.close()
+    assert len(chunks) > 1
+    assert b"\n".join(part for _, part in chunks).split(b"\n") == want
+    assert [txid for txids, _ in chunks for txid in txids] == [d.transaction_id for d in engine.classify(con, source, now=NOW)]
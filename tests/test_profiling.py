@@ -0,0 +1,48 @@
+import sys
+import time
+
+from app.utils.metrics import REGISTRY, REQUEST_STAGES, stage
+from app.utils.profiling import Profile, SlowRequestLog
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_profile_samples_only_below_the_attached_frame():
+    profile = Profile(interval=0.001)
+    profile.start()
+    try:
+        with profile.attach(sys._getframe()):
+            _busy(0.05)
+    finally:
+        profile.stop()
+    assert profile.samples > 0
+    for line in profile.collapsed().splitlines():
+        stack, n = line.rsplit(" ", 1)
+        assert int(n) > 0
+        # Cut at this test's frame: nothing from pytest above it.
+        assert stack.startswith("_busy (") and "pytest" not in stack
+
+
+def test_slow_request_log_keeps_the_slowest():
+    log = SlowRequestLog(keep=2)
+    for ms in (5.0, 1.0, 9.0, 3.0):
+        log.offer({"duration_ms": ms})
+    assert [r["duration_ms"] for r in log.snapshot()] == [9.0, 5.0]
+    assert not SlowRequestLog(keep=0).enabled
+
+
+def test_stages_add_up_per_request(monkeypatch):
+    monkeypatch.setattr(REGISTRY, "tracing", 1)
+    stages = {}
+    token = REQUEST_STAGES.set(stages)
+    try:
+        for _ in range(2):
+            with stage("unit.block"):
+                pass
+    finally:
+        REQUEST_STAGES.reset(token)
+    assert list(stages) == ["unit.block"] and stages["unit.block"] >= 0
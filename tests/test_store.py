@@ -20,3 +20,298 @@ def test_store_ingest_and_lookup(tmp_path):
     row = store.lookup("a1")
     assert row["transaction_id"] == "a1"
     store.close()
+
+
+def test_materialized_decisions_match_live_and_invalidate(tmp_path):
+    from datetime import datetime, timezone
+    from app.core.batch import BatchClassifier
+    from app.core.classifier import Agent, restamp
+
+    agent = Agent("configs/mappings.yaml", "configs/status_synonyms.yaml", "configs/rules.yaml")
+    store = TransactionStore(str(tmp_path / "test.duckdb"))
+    store.ingest("sample_data/sample_transactions.csv")
+    assert store.materialize(BatchClassifier(agent.mapper, agent.rulebook), agent.version) == 5
+
+    # Well past the stuck threshold: the stored PENDING/PROCESSING rows must turn STUCK on read.
+    now = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+    for txid in ("tx_1001", "tx_1002", "tx_1003", "tx_1004", "tx_1005"):
+        decision, anchor = store.lookup_decision(txid, agent.version)
+        live = agent.evaluate(store.lookup(txid))
+        live = restamp(live, anchor, agent.rulebook, now=now)
+        assert restamp(decision, anchor, agent.rulebook, now=now).model_dump(mode="json") == live.model_dump(mode="json")
+
+    # Another version falls through to live classification without touching the table.
+    assert store.lookup_decision("tx_1001", "other-version") is None
+    assert store.decisions_version() == agent.version
+
+    store.materialize(BatchClassifier(agent.mapper, agent.rulebook), agent.version)
+    store.ingest("sample_data/sample_transactions.json")
+    assert store.lookup_decision("tx_2001", agent.version) is None
+    store.close()
+
+
+def test_materialized_evidence_encodes_like_the_api(tmp_path):
+    from fastapi.encoders import jsonable_encoder
+    from app.core.batch import BatchClassifier
+    from app.core.classifier import Agent
+
+    parquet_path = tmp_path / "d.parquet"
+    con = duckdb.connect()
+    con.execute(f"""
+        COPY (SELECT 'd1' AS transaction_id, 'failed' AS status, 4012::DECIMAL(6,0) AS error_code)
+        TO '{parquet_path.as_posix()}' (FORMAT PARQUET)
+    """)
+    con.close()
+
+    agent = Agent("configs/mappings.yaml", "configs/status_synonyms.yaml", "configs/rules.yaml")
+    store = TransactionStore(str(tmp_path / "test.duckdb"))
+    store.ingest(str(parquet_path))
+    store.materialize(BatchClassifier(agent.mapper, agent.rulebook), agent.version)
+    decision, _ = store.lookup_decision("d1", agent.version)
+    live = agent.evaluate(store.lookup("d1"))
+    assert decision.evidence == jsonable_encoder(live.evidence)
+    assert decision.evidence["error_code"] == 4012
+    store.close()
+
+
+def test_upsert_merges_by_latest_updated_at(tmp_path):
+    base = tmp_path / "base.csv"
+    base.write_text(
+        "transaction_id,status,updated_at\n"
+        "u1,pending,2026-01-10T10:00:00Z\n"
+        "u2,pending,2026-01-10T10:00:00Z\n"
+        "u3,pending,2026-01-10T10:00:00Z\n",
+        encoding="utf-8",
+    )
+    delta = tmp_path / "delta.csv"
+    delta.write_text(
+        "transaction_id,status,updated_at,provider\n"
+        "u1,success,2026-01-10T11:00:00Z,stripe\n"
+        "u2,failed,2026-01-10T09:00:00Z,stripe\n"
+        "u4,queued,2026-01-10T11:00:00Z,adyen\n"
+        "u4,success,2026-01-10T12:00:00Z,adyen\n",
+        encoding="utf-8",
+    )
+
+    store = TransactionStore(str(tmp_path / "test.duckdb"))
+    assert store.ingest(str(base))["inserted"] == 3
+    result = store.ingest(str(delta), mode="upsert")
+    assert (result["inserted"], result["updated"], result["unchanged"]) == (1, 1, 1)
+
+    assert store.stats()["count"] == 4
+    assert store.generations()[0]["rows"] == 4
+    assert store.lookup("u1")["status"] == "success"
+    assert store.lookup("u1")["provider"] == "stripe"
+    assert store.lookup("u2")["status"] == "pending"
+    assert store.lookup("u4")["status"] == "success"
+    store.close()
+
+
+def test_upsert_orders_versions_like_the_classifier(tmp_path):
+    from datetime import datetime, timezone
+
+    base = tmp_path / "base.csv"
+    base.write_text(
+        "transaction_id,status,updated_at\n"
+        "q1,pending,2026-01-10T10:00:00Z\n"
+        "q2,pending,2026-01-10T10:00:00Z\n"
+        "q3,pending,2026-01-10T10:00:00Z\n"
+        "q4,pending,2026-01-10T12:00:00Z\n",
+        encoding="utf-8",
+    )
+    delta = tmp_path / "delta.csv"
+    delta.write_text(
+        "transaction_id,status,updated_at\n"
+        "q1,success,\n"                          # no version: the incoming row wins
+        "q2,success,2026-01-10T11:45Z\n"         # no seconds, Z suffix
+        "q3,success,2026-01-10T15:30:00+05:00\n"  # 10:30 UTC
+        "q4,success,2026-01-10T16:00+05:00\n",    # 11:00 UTC: older
+        encoding="utf-8",
+    )
+    store = TransactionStore(str(tmp_path / "test.duckdb"))
+    store.ingest(str(base))
+    result = store.ingest(str(delta), mode="upsert")
+    assert (result["updated"], result["unchanged"]) == (3, 1)
+    assert [store.lookup(t)["status"] for t in ("q1", "q2", "q3", "q4")] == ["success"] * 3 + ["pending"]
+    assert store.lookup("q2")["updated_at"] == datetime(2026, 1, 10, 11, 45, tzinfo=timezone.utc)
+    store.close()
+
+
+def test_upsert_refreshes_only_changed_decisions(tmp_path):
+    from app.core.batch import BatchClassifier
+    from app.core.classifier import Agent
+
+    agent = Agent("configs/mappings.yaml", "configs/status_synonyms.yaml", "configs/rules.yaml")
+    engine = BatchClassifier(agent.mapper, agent.rulebook)
+    base = tmp_path / "base.csv"
+    base.write_text("transaction_id,status,updated_at\nu1,pending,2026-01-10T10:00:00Z\nu2,success,2026-01-10T10:00:00Z\n", encoding="utf-8")
+    delta = tmp_path / "delta.csv"
+    delta.write_text("transaction_id,status,updated_at\nu1,declined,2026-01-10T11:00:00Z\n", encoding="utf-8")
+
+    store = TransactionStore(str(tmp_path / "test.duckdb"))
+    store.ingest(str(base))
+    store.materialize(engine, agent.version)
+    store.ingest(str(delta), mode="upsert")
+    assert store.lookup_decision("u1", agent.version) is None
+    assert store.materialize(engine, agent.version, incremental=True) == 1
+    assert store.lookup_decision("u1", agent.version)[0].status == "FAILED"
+    assert store.lookup_decision("u2", agent.version)[0].status == "SUCCESS"
+    store.close()
+
+
+def test_concurrent_batch_lookups(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = TransactionStore(str(tmp_path / "test.duckdb"), read_pool_size=4)
+    store.ingest("sample_data/sample_transactions.csv")
+
+    def batch(i):
+        ids = ["tx_1001", "tx_1002", f"missing_{i}"]
+        with store.reader() as cur:
+            return len(cur.execute(store.ids_query(), [ids]).fetchall())
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        assert set(pool.map(batch, range(64))) == {2}
+    store.close()
+
+
+def test_query_builders_never_borrow_a_second_reader(tmp_path):
+    import threading
+
+    store = TransactionStore(str(tmp_path / "test.duckdb"), read_pool_size=1)
+    store.ingest("sample_data/sample_transactions.csv")
+    result = []
+
+    def batch():
+        # Cold schema caches after the ingest, with the only reader already held.
+        with store.reader() as cur:
+            result.append(len(cur.execute(store.ids_query(), [["tx_1001"]]).fetchall()))
+
+    t = threading.Thread(target=batch, daemon=True)
+    t.start()
+    t.join(10)
+    assert result == [1], "ids_query blocked on the reader pool"
+    store.close()
+
+
+def test_ingest_canonicalizes_key_and_lookup_uses_index(tmp_path):
+    from app.core.mapper import SchemaMapper
+
+    con = duckdb.connect()
+    con.execute("""
+        CREATE TABLE t AS
+        SELECT i AS tx_id, 'success' AS state, 'x' AS extra FROM range(10000) r(i)
+    """)
+    parquet_path = tmp_path / "t.parquet"
+    con.execute(f"COPY t TO '{parquet_path.as_posix()}' (FORMAT PARQUET)")
+    con.close()
+
+    store = TransactionStore(str(tmp_path / "test.duckdb"), mapper=SchemaMapper("configs/mappings.yaml"))
+    store.ingest(str(parquet_path))
+    cols = dict(store.con.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'txns'").fetchall())
+    assert cols == {"transaction_id": "VARCHAR", "status_raw": "VARCHAR", "extra": "VARCHAR"}
+
+    row = store.lookup("42")
+    assert row["transaction_id"] == "42" and row["status_raw"] == "success"
+
+    plan = store.con.execute(
+        "EXPLAIN ANALYZE SELECT * FROM txns WHERE transaction_id = ? LIMIT 1", ["42"]
+    ).fetchall()[0][1]
+    assert "INDEX_SCAN" in plan or "Index Scan" in plan
+    assert "Sequential Scan" not in plan
+    store.close()
+
+
+def test_lookup_reads_only_mapped_columns(tmp_path):
+    from app.core.mapper import SchemaMapper
+
+    path = tmp_path / "wide.csv"
+    path.write_text(
+        "txn_id,state,modified,note,region\n"
+        "w1,pending,2026-01-10T10:00:00Z,first,eu\n",
+        encoding="utf-8",
+    )
+    store = TransactionStore(str(tmp_path / "test.duckdb"), mapper=SchemaMapper("configs/mappings.yaml"))
+    store.ingest(str(path))
+
+    assert store.mapped_columns() == ("transaction_id", "status_raw", "updated_at")
+    row = store.lookup("w1")
+    assert set(row) == {"transaction_id", "status_raw", "updated_at"}
+    assert store.lookup("w1", include_raw=True)["region"] == "eu"
+    with store.reader() as cur:
+        cur.execute(store.ids_query(), [["w1"]])
+        assert [d[0] for d in cur.description] == ["transaction_id", "status_raw", "updated_at"]
+
+    # A re-ingest with another layout re-resolves the projection.
+    path.write_text("id,status,provider\nw2,success,stripe\n", encoding="utf-8")
+    store.ingest(str(path))
+    assert store.lookup("w2") == {"transaction_id": "w2", "status_raw": "success", "provider": "stripe"}
+    store.close()
+
+
+def test_replace_swaps_generations_without_read_errors(tmp_path, monkeypatch):
+    import threading
+    from app.core.errors import NotFoundError
+
+    def write(n, status):
+        path = tmp_path / f"gen{n}.parquet"
+        duckdb.connect().execute(f"""
+            COPY (SELECT 'k' || i AS transaction_id, '{status}' AS status FROM range(200000) r(i))
+            TO '{path.as_posix()}' (FORMAT PARQUET)
+        """)
+        return str(path)
+
+    store = TransactionStore(str(tmp_path / "test.duckdb"), read_pool_size=2, keep_generations=1)
+    store.ingest(write(0, "s0"))
+    files = [write(n, f"s{n}") for n in (1, 2, 3)]
+
+    seen, errors, stop = set(), [], threading.Event()
+
+    def hammer():
+        while not stop.is_set():
+            try:
+                seen.add(store.lookup("k199999")["status"])
+            except Exception as e:  # a miss or a missing table would land here
+                errors.append(e)
+
+    threads = [threading.Thread(target=hammer) for _ in range(2)]
+    for t in threads:
+        t.start()
+    try:
+        for path in files:
+            assert "generation" in store.ingest(path)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+    assert errors == [] and len(seen) > 1
+    assert store.lookup("k199999")["status"] == "s3"
+
+    # The live generation plus keep_generations=1 previous one; older builds are dropped.
+    gens = store.generations()
+    assert [(g["generation"], g["live"]) for g in gens] == [(4, True), (3, False)]
+    assert store.con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name LIKE 'txns__g%'").fetchone()[0] == 2
+
+    assert store.rollback()["generation"] == 3
+    assert store.lookup("k1")["status"] == "s2"
+    assert store.rollback(generation=4)["previous"] == 3
+    assert store.lookup("k1")["status"] == "s3"
+    try:
+        store.rollback(generation=1)
+        assert False, "pruned generation"
+    except NotFoundError:
+        pass
+
+    # A build that fails is dropped and the live generation keeps serving.
+    failing = store.con.sql(
+        "SELECT CASE WHEN i < 1000 THEN 'k' || i ELSE error('disk full') END AS transaction_id FROM range(2000) r(i)"
+    )
+    monkeypatch.setattr(store, "_canonical", lambda files: (failing, {}))
+    try:
+        store.ingest(files[0])
+        assert False, "build should fail"
+    except duckdb.Error:
+        pass
+    assert store.lookup("k1")["status"] == "s3"
+    assert store.con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = 'txns__g5'").fetchone()[0] == 0
+    store.close()
@@ -0,0 +1,86 @@
+import shutil
+from datetime import datetime, timezone
+
+import duckdb
+
+from app.core.batch import BatchClassifier
+from app.core.classifier import Agent, classify_raw
+from app.core.store import TransactionStore
+from app.core.stuck import decode_cursor, encode_cursor
+
+NOW = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+ROWS = [
+    # tx_id, state, last_updated, gateway
+    ("s1", "processing", "2026-01-10T11:00:00Z", "stripe"),    # 60 min, default 30 -> STUCK
+    ("s2", "pending", "2026-01-10T11:45:00Z", "stripe"),       # 15 min -> not yet
+    ("r1", "processing", "2026-01-10T11:00:00Z", "Razorpay"),  # override 120 -> not yet
+    ("r2", "queued", "2026-01-10T09:00:00Z", " razorpay"),     # 180 min -> STUCK
+    ("a1", "pending", "2026-01-10T14:00:00+05:30", "adyen"),   # 08:30 UTC, python fallback -> STUCK
+    ("a2", "pending", "2026-01-10T10:00:00Z", None),           # default threshold -> STUCK
+    ("f1", "success", "2026-01-10T08:00:00Z", "stripe"),
+    ("n1", "pending", None, "stripe"),                         # no updated_at -> never STUCK
+]
+
+
+def _agent(tmp_path):
+    syn, rules = tmp_path / "syn.yaml", tmp_path / "rules.yaml"
+    shutil.copy("configs/status_synonyms.yaml", syn)
+    rules.write_text(open("configs/rules.yaml").read().replace(
+        "stuck_threshold_minutes_by_provider: {}", "stuck_threshold_minutes_by_provider:\n  RazorPay: 120"))
+    return Agent("configs/mappings.yaml", str(syn), str(rules))
+
+
+def _csv(tmp_path):
+    path = tmp_path / "txns.csv"
+    lines = ["tx_id,state,last_updated,gateway"]
+    lines += [",".join("" if v is None else v for v in r) for r in ROWS]
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_provider_thresholds_match_classify_raw(tmp_path):
+    agent = _agent(tmp_path)
+    con = duckdb.connect()
+    con.execute(f"CREATE TABLE t AS SELECT * FROM read_csv_auto('{_csv(tmp_path)}', HEADER=TRUE, ALL_VARCHAR=TRUE)")
+    engine = BatchClassifier(agent.mapper, agent.rulebook)
+    cur = con.execute("SELECT * FROM t")
+    cols = [d[0] for d in cur.description]
+    want = [classify_raw(agent.mapper.map_row(dict(zip(cols, r))), agent.rulebook, now=NOW) for r in cur.fetchall()]
+    got = engine.classify(con, "SELECT * FROM t", now=NOW)
+    assert [d.to_dict() for d in got] == [d.model_dump() for d in want]
+    assert {d.transaction_id for d in got if d.status == "STUCK"} == {"s1", "r2", "a1", "a2"}
+    r1 = next(d for d in want if d.transaction_id == "r1")
+    assert r1.status == "PROCESSING"
+
+
+def test_stuck_index_pages_match_classification(tmp_path):
+    agent = _agent(tmp_path)
+    engine = BatchClassifier(agent.mapper, agent.rulebook)
+    store = TransactionStore(str(tmp_path / "s.duckdb"), mapper=agent.mapper)
+    try:
+        store.ingest(_csv(tmp_path))
+        rows, total = store.stuck(engine, agent.version, NOW)
+        assert total == 4
+        # oldest stuck_at first: a1 09:00, a2 10:30, r2 11:00 (120 min override), s1 11:30
+        assert [r["transaction_id"] for r in rows] == ["a1", "a2", "r2", "s1"]
+        assert [r["threshold_minutes"] for r in rows] == [30, 30, 120, 30]
+
+        seen, after = [], None
+        while True:
+            page, _ = store.stuck(engine, agent.version, NOW, limit=1, after=after)
+            if not page:
+                break
+            seen.append(page[0]["transaction_id"])
+            after = decode_cursor(encode_cursor(page[0]["stuck_at"], page[0]["transaction_id"]))
+        assert seen == [r["transaction_id"] for r in rows]
+
+        only, total = store.stuck(engine, agent.version, NOW, providers=["stripe"])
+        assert [r["transaction_id"] for r in only] == ["s1"] and total == 1
+        only, total = store.stuck(engine, agent.version, NOW, providers=["STRIPE"])
+        assert [r["transaction_id"] for r in only] == ["s1"] and total == 1
+
+        counts = store.stuck_counts(engine, agent.version, NOW, since=datetime(2026, 1, 10, 11, 0, tzinfo=timezone.utc))
+        assert counts["stuck"] == 4 and counts["newly_stuck"] == 2  # r2 at 11:00, s1 at 11:30
+    finally:
+        store.close()
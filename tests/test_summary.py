@@ -0,0 +1,56 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import duckdb
+
+from app.core.batch import BatchClassifier
+from app.core.classifier import Agent
+from app.core.summary import SummaryFilters, summarize
+
+NOW = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def _setup():
+    agent = Agent("configs/mappings.yaml", "configs/status_synonyms.yaml", "configs/rules.yaml")
+    con = duckdb.connect()
+    con.execute("CREATE TABLE txns(tx_id VARCHAR, state VARCHAR, last_updated VARCHAR, err_code VARCHAR, total DOUBLE, curr VARCHAR, gateway VARCHAR)")
+    con.executemany("INSERT INTO txns VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        ("a1", "success", "2026-01-10T11:50:00Z", None, 10.0, "USD", "stripe"),
+        ("a2", "success", "2026-01-10T11:55:00Z", None, 30.0, "USD", "stripe"),
+        ("a3", "processing", "2026-01-10T09:00:00Z", None, 5.0, "USD", "stripe"),
+        ("a4", "pending", "2026-01-10T11:59:00Z", None, 7.0, "EUR", "adyen"),
+        ("a5", "pending", "2026-01-10T11:59:00Z", "E401", 9.0, "EUR", "adyen"),
+        ("a6", "queued", "2026-01-10T16:00:00+05:30", None, 1.0, "EUR", "adyen"),
+    ])
+    return agent, BatchClassifier(agent.mapper, agent.rulebook), con
+
+
+def test_summary_counts_match_row_classification():
+    agent, engine, con = _setup()
+    out = summarize(engine, con, "txns", now=NOW)
+    rows = {d.transaction_id: d.status for d in engine.classify(con, "txns", now=NOW)}
+    assert out["by_status"] == dict(Counter(rows.values()))
+    assert out["total"] == 6 and out["approximate_rows"] == 1
+
+    stripe_ok = [g for g in out["groups"] if g["provider"] == "stripe" and g["status"] == "SUCCESS"]
+    assert stripe_ok == [{
+        "provider": "stripe", "currency": "USD", "status": "SUCCESS", "count": 2,
+        "amount_sum": 40.0, "amount_p50": stripe_ok[0]["amount_p50"],
+        "amount_p90": stripe_ok[0]["amount_p90"], "amount_p99": stripe_ok[0]["amount_p99"],
+    }]
+    assert 10.0 <= stripe_ok[0]["amount_p50"] <= 30.0
+
+
+def test_summary_filters():
+    agent, engine, con = _setup()
+    out = summarize(engine, con, "txns", SummaryFilters(currency=["EUR"]), group_by=["status"], now=NOW)
+    assert out["total"] == 3 and sum(out["by_status"].values()) == 3
+
+    recent = summarize(engine, con, "txns", SummaryFilters(last_minutes=30), group_by=["status"], now=NOW)
+    assert recent["total"] == 4  # a3 and a6 (16:00+05:30) were last updated over 30 minutes ago
+
+    window = SummaryFilters(updated_after=NOW - timedelta(minutes=15), updated_before=NOW, provider=["stripe"])
+    assert summarize(engine, con, "txns", window, group_by=[], now=NOW)["total"] == 2
+
+    mixed_case = SummaryFilters(provider=["Stripe", "ADYEN"], currency=["eur"])
+    assert summarize(engine, con, "txns", mixed_case, group_by=[], now=NOW)["total"] == 3
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+import pandas as pd
+from dateutil.parser import parse
+
+from app.utils.timeparse import parse_dt, parse_dt_column
+
+ISO_VALUES = [
+    "2026-01-10",
+    "2026-01-10 10:00",
+    "2026-01-10T10:00:00Z",
+    "2026-01-10T10:00:00.250+00:00",
+    "2026-01-10T10:00:00.123456-00:00",
+    "2026-01-10T10:00:00+05:30",
+    "2026-01-10T10:00:00-0800",
+]
+
+
+def _dateutil(value):
+    dt = parse(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def test_iso_fast_path_matches_dateutil():
+    for v in ISO_VALUES:
+        got = parse_dt(v)
+        assert got == _dateutil(v) and got.utcoffset() == _dateutil(v).utcoffset(), v
+    assert parse_dt_column(ISO_VALUES) == [_dateutil(v) for v in ISO_VALUES]
+
+
+def test_epoch_seconds_and_millis():
+    want = datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc)
+    for v in (1700000000, 1700000000.0, "1700000000", 1700000000000, "1700000000000"):
+        assert parse_dt(v) == want, v
+    assert parse_dt("1700000000.5") == want.replace(microsecond=500000)
+    assert parse_dt(True) is None
+
+
+def test_passthrough_and_fallback():
+    ts = pd.Timestamp("2026-01-10T10:00:00Z")
+    assert parse_dt(ts) is ts
+    assert parse_dt(datetime(2026, 1, 10)).tzinfo == timezone.utc
+    assert parse_dt("Jan 10 2026 10am") == datetime(2026, 1, 10, 10, tzinfo=timezone.utc)
+    assert parse_dt("20260110") == datetime(2026, 1, 10, tzinfo=timezone.utc)
+    assert parse_dt("2026-13-45T00:00:00Z") is None
+    # An offset with no time is not ISO-8601; fromisoformat would read "+05:00" as 05:00.
+    assert parse_dt("2026-01-10+05:00") is None and parse_dt_column(["2026-01-10+05:00"]) == [None]
+    assert parse_dt("") is None and parse_dt(None) is None
+    assert parse_dt_column([None, "", "nope", ts]) == [None, None, None, ts]
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.workloads import WorkloadPool
+
+
+def _chunks(closed):
+    try:
+        for i in range(100):
+            yield i
+    finally:
+        closed.append(True)
+
+
+def test_stream_frees_its_slot_however_it_ends():
+    pool = WorkloadPool("t", workers=1, queue=0)
+
+    async def main():
+        # Read part-way, then closed (client disconnected mid-body).
+        closed = []
+        it = pool.stream(_chunks(closed))
+        async for i in it:
+            if i == 3:
+                break
+        await it.aclose()
+        await asyncio.sleep(0.05)
+        assert closed == [True] and pool.stats()["running"] == 0
+
+        # Admitted but never iterated (client gone before the body was sent).
+        pool.stream(_chunks([]))
+        assert pool.stats()["running"] == 0
+
+        # Read to the end.
+        it = pool.stream(_chunks([]))
+        assert [i async for i in it][-1] == 99
+        await asyncio.sleep(0.05)
+        assert pool.stats()["running"] == 0
+
+        # Full while a stream holds the only slot.
+        held = pool.stream(_chunks([]))
+        with pytest.raises(HTTPException) as e:
+            pool.stream(_chunks([]))
+        assert e.value.status_code == 503 and e.value.headers["Retry-After"] == "1"
+        del held
+        assert await pool.run(sum, [1, 2]) == 3
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
+    assert pool.stats()["completed"] == 5 and pool.stats()["rejected"] == 1